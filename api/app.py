@@ -1,440 +1,899 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from datetime import datetime
-import zlib
+from datetime import datetime, timezone
+import cProfile
+import functools
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+
+import encoding
+import metrics
+import regions
+import upstream
+from correlate import Correlator
+from delta import DeltaFeed
+from events import EventBus, detect_changes
+from history import HistoryStore
+from scheduler import HEALTH_BLOB, Scheduler
+from shared import SharedSnapshot
+from sources import DISPATCH_FIELDS, FALLBACKS
+from subscriptions import SUBSCRIPTIONS_TOKEN, Notifier, SubscriptionStore
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag', 'Age', 'X-Snapshot-Version', 'X-Snapshot-Stale'])
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+# Seconds between upstream refreshes, per kind of source
+REFRESH_INTERVALS = {
+    'wind': int(os.environ.get('REFRESH_WIND', 300)),
+    'caer': int(os.environ.get('REFRESH_CAER', 60)),
+    'dispatch': int(os.environ.get('REFRESH_DISPATCH', 60)),
+    'tceq-emissions': int(os.environ.get('REFRESH_TCEQ', 900)),
+    'weather-alerts': int(os.environ.get('REFRESH_WEATHER_ALERTS', 120)),
 }
+if upstream.replay is not None:
+    # Poll recorded traffic as often, in recorded time, as it was polled live
+    REFRESH_INTERVALS = {name: seconds / upstream.replay.speed for name, seconds in REFRESH_INTERVALS.items()}
+
+# Set LEAD=0 in web workers that should only follow, leaving the refresh
+# pipeline to a separate refresher.py process on real threads
+LEAD = os.environ.get('LEAD', '1') != '0'
+
+# Set BACKGROUND_REFRESH=0 to refresh only on demand when a snapshot passes its TTL
+BACKGROUND_REFRESH = os.environ.get('BACKGROUND_REFRESH', '1') != '0'
+
+# Set WARMUP=0 to leave the first fetch of each source (and loading its parser)
+# to the first request that needs it, for the quickest possible cold start
+WARMUP = os.environ.get('WARMUP', '1') != '0'
+
+# Set DEBUG_PROFILING=1 to enable /api/debug/profile/<source>
+DEBUG_PROFILING = os.environ.get('DEBUG_PROFILING', '0') == '1'
+
+# Seconds between a follower worker's checks of the leader's event log
+FOLLOW_POLL = float(os.environ.get('FOLLOW_POLL', 0.5))
+
+# Regions served (the default one, behind the unprefixed routes, first) and
+# the feeds polled for them; regions with upstream resources in common share feeds
+REGIONS = regions.load()
+DEFAULT_REGION = next(iter(REGIONS))
+FEEDS = regions.plan(REGIONS)
+
+# Snapshot shared between gunicorn workers; one of them leads and fetches
+shared = SharedSnapshot()
+# Change feed of every dispatch board, by source name
+dispatch_feeds = {name: DeltaFeed() for name, feed in FEEDS.items() if feed.kind == 'dispatch'}
+# Serialized and compressed response bodies, per snapshot and variant
+encoded = encoding.EncodedCache(encoding.ENCODED_CACHE_SIZE * len(REGIONS))
+
+# Bare fetch of every feed, also run by /api/debug/profile
+PIPELINES = {name: feed.pipeline() for name, feed in FEEDS.items()}
+
+
+def refresh_dispatch(name):
+    """Fetch a dispatch board and record what changed since the last refresh"""
+    payload = PIPELINES[name]()
+    if payload is upstream.UNCHANGED:
+        return payload
+    priority = {inc['id'] for inc in payload['incidents']}
+    payload['cursor'] = dispatch_feeds[name].update({
+        inc['id']: {**inc, 'priority': inc['id'] in priority}
+        for inc in payload.get('all_incidents', [])
+    })
+    shared.write_blob(f'{name}-feed', dispatch_feeds[name].export())
+    return payload
+
+
+# Follower copies of the leader's feeds, rebuilt when the leader publishes a new one
+_follower_feeds = {}
+
+
+def delta_feed(name):
+    """A dispatch feed, as kept by this process or published by the leader"""
+    if scheduler.shared is None:
+        return dispatch_feeds[name]
+    state = shared.read_blob(f'{name}-feed')
+    if state is None:
+        return dispatch_feeds[name]
+    cached = _follower_feeds.get(name)
+    if cached is None or cached[0] is not state:
+        cached = _follower_feeds[name] = (state, DeltaFeed.restore(state))
+    return cached[1]
+
+
+scheduler = Scheduler()
+for name, feed in FEEDS.items():
+    fetch = functools.partial(refresh_dispatch, name) if feed.kind == 'dispatch' else PIPELINES[name]
+    # Slow only once past what its requests could take at their timeouts, plus room for parsing
+    scheduler.register(name, fetch, REFRESH_INTERVALS[feed.kind], kind=feed.kind,
+                       slow_seconds=feed.timeout_budget() * 1.5)
+# Seconds between keep-alive comments on idle /api/stream connections
+STREAM_HEARTBEAT = int(os.environ.get('STREAM_HEARTBEAT', 15))
+
+event_bus = EventBus()
+
+
+def publish_changes(name, old, new):
+    """Turn a snapshot update into push events, tagged with their feed and regions"""
+    old_payload = old.payload if old else None
+    feed = FEEDS[name]
+    for type, data in detect_changes(feed.kind, old_payload, new.payload, dispatch_feeds.get(name)):
+        regions = feed.regions_for(data)
+        shared.append_event(event_bus.publish(type, {**data, "feed": name, "regions": regions}, regions))
+
+
+history_store = HistoryStore()
+
+
+def record_history(name, old, new):
+    """Append newly seen records to the history store, with their feed and regions"""
+    history_store.add(FEEDS[name].kind, new.payload, feed=name, regions_for=FEEDS[name].regions_for)
+
+
+subscription_store = SubscriptionStore()
+notifier = Notifier(subscription_store)
+
+
+def notify_subscribers(name, old, new):
+    """Queue webhook deliveries for the records new in a snapshot"""
+    feed = FEEDS[name]
+    notifier.notify(feed.kind, old.payload if old else None, new.payload, name, feed.regions_for)
+
+
+# One correlator per region, so area-wide alerts only join incidents in their own zones
+correlators = {id: Correlator(region.facilities, region.residential_areas) for id, region in REGIONS.items()}
+# Latest export of each region's correlator, swapped whole after every change
+correlated = {id: [] for id in REGIONS}
+
+
+def correlate_records(name, old, new):
+    """Cluster the new records of a snapshot with the other sources' records, in every region it serves"""
+    kind = scheduler.sources[name].kind
+    for region in FEEDS[name].regions:
+        view = region.views.get(kind)
+        payload = view(new.payload) if view else new.payload
+        if correlators[region.id].update(kind, payload):
+            correlated[region.id] = correlators[region.id].export()
+            shared.write_blob(f'correlations-{region.id}', correlated[region.id])
+
+
+def share_entry(name, old, new):
+    """Hand a new snapshot to the follower workers"""
+    shared.write(name, new)
+
+
+def share_health(name, source):
+    """Publish breaker state so any worker can answer /api/health"""
+    shared.write_blob(HEALTH_BLOB, scheduler.health())
+
+
+def share_metrics(name, source):
+    """Publish pipeline metrics so any worker can answer /api/metrics"""
+    shared.write_blob('metrics', metrics.registry.state())
+
+
+def share_freshness(name, source):
+    """Tell followers an unchanged upstream page was confirmed current"""
+    if source.outcome == 'unchanged':
+        shared.touch(name)
+
+
+scheduler.subscribe(share_entry)
+scheduler.watch(share_freshness)
+scheduler.watch(share_health)
+scheduler.watch(share_metrics)
+scheduler.subscribe(publish_changes)
+scheduler.subscribe(record_history)
+scheduler.subscribe(correlate_records)
+scheduler.subscribe(notify_subscribers)
+
+
+def become_leader():
+    """Run the refresh pipeline in this process"""
+    scheduler.lead()
+    for name in dispatch_feeds:
+        state = shared.read_blob(f'{name}-feed')
+        if state is not None:
+            # Carry on from the previous leader so client cursors stay valid
+            dispatch_feeds[name] = DeltaFeed.restore(state)
+    for name, source in scheduler.sources.items():
+        # Snapshots taken over from the previous leader won't reach the listeners until they change
+        if source.entry is not None:
+            correlate_records(name, None, source.entry)
+    history_store.start()
+    notifier.start()
+    if BACKGROUND_REFRESH:
+        scheduler.start(warm=WARMUP)
+    elif WARMUP:
+        scheduler.warm_up()
+
+
+def follow_leader():
+    """Relay the leader's events to local streams; take over if it goes away (unless LEAD=0)"""
+    offset = 0
+    while not (LEAD and shared.try_lead()):
+        events, offset = shared.tail_events(offset)
+        for event in events:
+            event_bus.replay(*event)
+        time.sleep(FOLLOW_POLL)
+    become_leader()
+
+
+if LEAD and shared.try_lead():
+    become_leader()
+else:
+    scheduler.follow(shared)
+    threading.Thread(target=follow_leader, name='follow-leader', daemon=True).start()
+
+
+def error_body(source):
+    """JSON body for a source that has never produced good data"""
+    return json.dumps({
+        "error": source.error or "Data not yet available",
+        **FALLBACKS[source.kind],
+        "timestamp": datetime.utcnow().isoformat()
+    }).encode('utf-8')
+
 
-@app.route('/api/wind', methods=['GET'])
-def get_wind():
-    """Fetch wind data from NWS API"""
+def not_modified(etag):
+    """True if the client already holds the representation tagged etag"""
+    return request.if_none_match.contains(etag)
+
+
+def send(key, render):
+    """Response for representation key, compressed as the client accepts.
+
+    The encoded bytes are cached, so only the first request per snapshot,
+    variant and coding pays for render() and compression.
+    """
+    coding = encoding.negotiate(request.accept_encodings)
+    body, applied = encoded.get(key, coding, render)
+    response = Response(body, mimetype='application/json')
+    if applied:
+        response.headers['Content-Encoding'] = applied
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def serve(name, variant='', render=None):
+    """Answer a route from the in-memory snapshot.
+
+    variant names an alternative representation that render(payload)
+    builds from the snapshot; it gets its own ETag and cache entries.
+    """
+    source = scheduler.get(name)
+    entry = source.entry
+    if entry is None:
+        return Response(error_body(source), status=500, mimetype='application/json')
+    etag = entry.etag
+    if variant:
+        etag += '-' + hashlib.sha1(variant.encode('utf-8')).hexdigest()[:8]
+    if not_modified(etag):
+        response = Response(status=304)
+        response.vary.add('Accept-Encoding')
+    elif render is None:
+        response = send((name, entry.etag, ''), lambda: entry.body)
+    else:
+        response = send((name, entry.etag, variant), lambda: encoding.dumps(render(entry.payload)))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Snapshot-Version'] = str(entry.version)
+    response.headers['Age'] = str(int(time.time() - entry.updated_at))
+    if source.is_stale():
+        response.headers['X-Snapshot-Stale'] = 'true'
+    return response
+
+
+def regional(rule, **options):
+    """Route /api<rule> for the default region and /api/<region><rule> for any region.
+
+    The view is called with the Region as its first argument.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def route(region=DEFAULT_REGION, **kwargs):
+            selected = REGIONS.get(region)
+            if selected is None:
+                return jsonify({"error": f"Unknown region: {region}"}), 404
+            return view(selected, **kwargs)
+        app.add_url_rule('/api' + rule, view_func=route, **options)
+        app.add_url_rule('/api/<region>' + rule, view_func=route, **options)
+        return route
+    return decorate
+
+
+def no_feed(region, kind):
+    return jsonify({"error": f"No {kind} feed for region {region.id}"}), 404
+
+
+def region_variant(region, kind, variant='', render=None):
+    """(variant, render) of a representation, narrowed to region if its feed is shared"""
+    view = region.views.get(kind)
+    if view is None:
+        return variant, render
+    if render is None:
+        return f"{region.id}|{variant}", view
+    return f"{region.id}|{variant}", lambda payload: render(view(payload))
+
+
+def serve_region(region, kind, variant='', render=None):
+    """Answer a route from the snapshot of region's feed of kind"""
+    name = region.feeds.get(kind)
+    if name is None:
+        return no_feed(region, kind)
+    return serve(name, *region_variant(region, kind, variant, render))
+
+
+@app.route('/api/regions', methods=['GET'])
+def get_regions():
+    """Configured regions, and the feeds each one reads"""
+    return jsonify({
+        "default": DEFAULT_REGION,
+        "regions": [region.describe() for region in REGIONS.values()],
+        "feeds": {name: {"kind": feed.kind, "regions": [r.id for r in feed.regions]} for name, feed in FEEDS.items()},
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+@regional('/snapshot', methods=['GET'])
+def get_snapshot(region):
+    """Serve every source of a region in one payload; ?sources=wind,dispatch selects a subset"""
+    selected = request.args.get('sources')
+    kinds = [n.strip() for n in selected.split(',') if n.strip()] if selected else list(region.feeds)
+    unknown = [n for n in kinds if n not in region.feeds]
+    if unknown:
+        return jsonify({"error": f"Unknown sources: {', '.join(unknown)}"}), 400
+
+    # The ETag combines the per-source content hashes, so a 304 costs no
+    # serialization at all
+    entries = {}
+    tags = [region.id]
+    stale = []
+    for kind in kinds:
+        source = scheduler.get(region.feeds[kind])
+        entry = entries[kind] = source.entry
+        tags.append(f"{source.name}:{entry.etag if entry else 'none'}")
+        if source.is_stale():
+            stale.append(kind)
+    etag = hashlib.sha1('|'.join(tags).encode('utf-8')).hexdigest()[:20]
+
+    def body(kind, entry):
+        name = region.feeds[kind]
+        if entry is None:
+            return error_body(scheduler.sources[name])
+        variant, view = region_variant(region, kind)
+        if view is None:
+            return entry.body
+        # Shares the cached region view with the route of the source itself
+        return encoded.get((name, entry.etag, variant), None, lambda: encoding.dumps(view(entry.payload)))[0]
+
+    def render():
+        parts = [json.dumps(kind).encode('utf-8') + b':' + body(kind, entry) for kind, entry in entries.items()]
+        return b'{"etag":%s,"stale":%s,"sources":{%s}}' % (
+            json.dumps(etag).encode('utf-8'), json.dumps(stale).encode('utf-8'), b','.join(parts))
+
+    if not_modified(etag):
+        response = Response(status=304)
+        response.vary.add('Accept-Encoding')
+    else:
+        # Stale flags and error messages are in the body but not the ETag
+        errors = [scheduler.sources[region.feeds[k]].error or '' for k, entry in entries.items() if entry is None]
+        response = send(('snapshot', etag, repr((stale, errors))), render)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    """Server-Sent Events feed of changes, resumable with Last-Event-ID; ?region= keeps one region's"""
+    region = request.args.get('region')
+    if region is not None and region not in REGIONS:
+        return jsonify({"error": f"Unknown region: {region}"}), 404
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    after = event_bus.resume_point(last_id)
+
+    def generate():
+        position = after
+        yield 'retry: 5000\n\n'
+        if position is None:
+            # Unknown or expired resume point: client should reload the snapshot
+            position = event_bus.seq
+            if last_id:
+                yield f'id: {event_bus.last_id()}\nevent: reset\ndata: {{}}\n\n'
+        last_sent = time.time()
+        while True:
+            events = event_bus.wait(position, STREAM_HEARTBEAT)
+            if events:
+                position = int(events[-1].id.rsplit('-', 1)[1])
+            sent = False
+            for event in events:
+                if region is not None and event.regions is not None and region not in event.regions:
+                    continue
+                yield f'id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n'
+                sent = True
+            now = time.time()
+            if sent:
+                last_sent = now
+            elif now - last_sent >= STREAM_HEARTBEAT:
+                # Also while every event belongs to other regions
+                yield ': heartbeat\n\n'
+                last_sent = now
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+def parse_time(value):
+    """Unix seconds or an ISO 8601 timestamp (UTC if no offset given)"""
     try:
-        url = "https://api.weather.gov/gridpoints/HGX/75,98/forecast/hourly"
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        data = r.json()
-        current = data['properties']['periods'][0]
-        direction = current['windDirection']
-        speed_raw = current['windSpeed']
-        
-        # Parse speed (e.g., "10 mph" -> 10)
-        speed_num = int(speed_raw.split()[0]) if speed_raw else 0
-        
-        # Risk assessment: N or E winds push plumes toward residential
-        is_risk = any(x in direction for x in ['N', 'E'])
-        
-        return jsonify({
-            "speed": speed_raw,
-            "speed_numeric": speed_num,
-            "direction": direction,
-            "forecast": current['shortForecast'],
-            "temperature": current['temperature'],
-            "is_risk": is_risk,
-            "timestamp": datetime.utcnow().isoformat()
-        })
-    except Exception as e:
-        return jsonify({
-            "error": str(e),
-            "speed": "OFFLINE",
-            "direction": "OFFLINE",
-            "is_risk": False
-        }), 500
-
-@app.route('/api/caer', methods=['GET'])
-def get_caer():
-    """Scrape CAER community alert messages"""
-    url = "https://www.incident-reporter.net/e-notifycaerfeed/caermessagelive.html"
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+@regional('/correlated', methods=['GET'])
+def get_correlated(region):
+    """Incidents reported by several sources in a region, merged into one record each, newest first.
+
+    Filters: min_sources (default 2), status (open or all), severity
+    (comma-separated), limit.
+    """
+    args = request.args
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        soup = BeautifulSoup(r.text, 'html.parser')
-        messages = []
-        headers = soup.find_all('h5')
-        
-        for header in headers:
-            title = header.get_text(strip=True)
-            body_text = ""
-            curr = header.next_sibling
-            
-            while curr and curr.name != 'h5':
-                if hasattr(curr, 'strip'):
-                    text_part = curr.strip()
-                    if len(text_part) > 1:
-                        body_text += text_part + " "
-                curr = curr.next_sibling
-            
-            # Severity classification
-            text_lower = (title + body_text).lower()
-            severity = "info"
-            if any(x in text_lower for x in ['explosion', 'shelter', 'evacuate', 'emergency']):
-                severity = "critical"
-            elif any(x in text_lower for x in ['flare', 'release', 'incident', 'leak']):
-                severity = "warning"
-            
-            messages.append({
-                "title": title,
-                "body": body_text.strip(),
-                "severity": severity,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
-        return jsonify({
-            "messages": messages,
-            "count": len(messages),
-            "timestamp": datetime.utcnow().isoformat()
-        })
-    except Exception as e:
-        return jsonify({
-            "error": str(e),
-            "messages": [],
-            "count": 0
-        }), 500
-
-@app.route('/api/dispatch', methods=['GET'])
-def get_dispatch():
-    """Scrape Houston active incidents"""
-    url = "https://cohweb.houstontx.gov/ActiveIncidents/Combined.aspx"
+        min_sources = max(1, int(args.get('min_sources', 2)))
+        limit = max(1, min(int(args.get('limit', 50)), 500))
+    except ValueError as e:
+        return jsonify({"error": f"Bad query: {e}"}), 400
+    status = args.get('status', 'all')
+    if status not in ('open', 'all'):
+        return jsonify({"error": "status must be open or all"}), 400
+    severities = [s for s in args.get('severity', '').split(',') if s]
+
+    if scheduler.shared is None:
+        clusters = correlated[region.id]
+    else:
+        clusters = shared.read_blob(f'correlations-{region.id}') or []
+    selected = [
+        c for c in clusters
+        if len(c['sources']) >= min_sources
+        and (status == 'all' or c['status'] == 'open')
+        and (not severities or c['severity'] in severities)
+    ][:limit]
+    return jsonify({
+        "clusters": selected,
+        "count": len(selected),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    """Page through stored records, newest first.
+
+    Filters: source, severity (comma-separated), region, since/until, lat+lon+radius_km.
+    Pass the returned next_cursor as cursor for the next page.
+    """
+    args = request.args
+    region = args.get('region')
+    if region is not None and region not in REGIONS:
+        return jsonify({"error": f"Unknown region: {region}"}), 404
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        
-        # Use pandas - it's better at handling messy tables
-        tables = pd.read_html(r.text)
-        
-        if not tables:
-            return jsonify({
-                "incidents": [],
-                "total_incidents": 0,
-                "priority_count": 0,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
-        # Get the largest table
-        df = max(tables, key=lambda x: len(x))
-        
-        # Clean column names
-        df.columns = df.columns.astype(str)
-        
-        # If first row looks like headers, use it
-        if 'Agency' not in df.columns and len(df) > 0:
-            if 'Agency' in str(df.iloc[0].values):
-                df.columns = df.iloc[0]
-                df = df[1:]
-        
-        # Remove disclaimer rows
-        df = df[~df.astype(str).apply(lambda x: x.str.contains('This page contains|disclaimer', case=False, na=False)).any(axis=1)]
-        
-        # Ensure we have the right columns
-        expected_cols = ['Agency', 'Address', 'Cross Street', 'Key Map', 'Call Time', 'Incident Type', 'Combined Response']
-        
-        # If columns don't match, try to map them
-        if 'Agency' not in df.columns and len(df.columns) >= 7:
-            df.columns = expected_cols[:len(df.columns)]
-        
-        # Convert to dict
-        all_incidents_raw = df.to_dict('records')
-        
-        # Clean ALL incidents first
-        all_incidents_cleaned = []
-        for inc in all_incidents_raw:
-            # Skip if not a valid incident
-            agency = str(inc.get('Agency', ''))
-            if agency not in ['FD', 'PD']:
-                continue
-            
-            cleaned = {
-                'Agency': str(inc.get('Agency', '')),
-                'Address': str(inc.get('Address', '')),
-                'Cross Street': str(inc.get('Cross Street', '')),
-                'Key Map': str(inc.get('Key Map', '')),
-                'Call Time': str(inc.get('Call Time', '') or inc.get('Call Time(Opened)', '')),
-                'Incident Type': str(inc.get('Incident Type', '')),
-                'Combined Response': str(inc.get('Combined Response', 'N'))
-            }
-            
-            # Add geocoding
-            address = cleaned['Address']
-            key_map = cleaned['Key Map']
-            
-            if address and len(address) > 2 and address != 'nan':
-                cleaned['has_location'] = True
-                try:
-                    # Use deterministic hash of address for organic distribution
-                    # This avoids the "vertical lines" artifact of the previous Key Map math
-                    # while ensuring the same address always maps to the same spot.
-                    
-                    # Create a seed from the address string
-                    addr_bytes = (address + cleaned.get('Key Map', '')).encode('utf-8')
-                    seed = zlib.crc32(addr_bytes)
-                    
-                    # Generate pseudo-random float 0-1 from seed
-                    # Separate seeds for lat and lon to avoid diagonal correlation
-                    lat_seed = seed
-                    lon_seed = zlib.crc32(addr_bytes + b'lon')
-                    
-                    lat_norm = (lat_seed % 1000) / 1000.0
-                    lon_norm = (lon_seed % 1000) / 1000.0
-                    
-                    # Map to Houston bounding box
-                    # Lat: ~29.55 (South Belt) to ~29.95 (Bush Airport/Humble)
-                    # Lon: ~-95.6 (West Belt) to ~-95.1 (Channelview/Baytown)
-                    cleaned['lat'] = 29.55 + (lat_norm * 0.40)
-                    cleaned['lon'] = -95.60 + (lon_norm * 0.50)
-                    
-                    # If Key Map is available, we could use it for coarser sectoring, 
-                    # but Hash is safer to avoid grid artifacts.
-                except:
-                    cleaned['lat'] = 29.76
-                    cleaned['lon'] = -95.36
-            else:
-                cleaned['has_location'] = False
-            
-            all_incidents_cleaned.append(cleaned)
-        
-        # Filter high-priority incidents from cleaned list
-        keywords = ['SHELDON', 'BAYWAY', 'DECKER', 'CHANNELVIEW', 'PASADENA', 
-                   'FIRE', 'HAZMAT', 'LYONDELL', 'EXXON', 'INDUSTRIAL', 'CHEMICAL',
-                   'REFINERY', 'PLANT', 'EXPLOSION', 'LEAK', 'SMOKE', 'ODOR', 'APARTMENT',
-                   'HOUSE', 'ALARM', 'CRASH', 'MAJOR']
-        
-        priority_incidents = []
-        for inc in all_incidents_cleaned:
-            text = ' '.join(str(v) for v in inc.values()).upper()
-            if any(kw in text for kw in keywords):
-                priority_incidents.append(inc)
-        
-        return jsonify({
-            "incidents": priority_incidents,
-            "all_incidents": all_incidents_cleaned,
-            "total_incidents": len(all_incidents_cleaned),
-            "priority_count": len(priority_incidents),
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-    except requests.exceptions.RequestException as e:
-        return jsonify({
-            "error": f"Network error: {str(e)}",
-            "incidents": [],
-            "total_incidents": 0,
-            "priority_count": 0,
-            "timestamp": datetime.utcnow().isoformat()
-        }), 500
-    except Exception as e:
-        return jsonify({
-            "error": f"Parse error: {str(e)}",
-            "incidents": [],
-            "total_incidents": 0,
-            "priority_count": 0,
-            "timestamp": datetime.utcnow().isoformat()
-        }), 500
-
-@app.route('/api/facilities', methods=['GET'])
-def get_facilities():
-    """Return facility coordinates for Houston Ship Channel industrial area"""
-    facilities = {
-        "LyondellBasell Channelview": {"lat": 29.8160, "lon": -95.1150, "type": "petrochemical"},
-        "ExxonMobil Baytown Refinery": {"lat": 29.7450, "lon": -95.0120, "type": "refinery"},
-        "ExxonMobil Baytown Chemical": {"lat": 29.7520, "lon": -95.0050, "type": "chemical"},
-        "Chevron Phillips Cedar Bayou": {"lat": 29.7400, "lon": -94.9850, "type": "chemical"},
-        "Shell Deer Park": {"lat": 29.6700, "lon": -95.1280, "type": "refinery"},
-        "Valero Houston Refinery": {"lat": 29.7350, "lon": -95.2450, "type": "refinery"},
-        "Marathon Galveston Bay": {"lat": 29.7180, "lon": -95.0450, "type": "refinery"},
-        "Pasadena Refining": {"lat": 29.6910, "lon": -95.1580, "type": "refinery"},
-        "Air Liquide Channelview": {"lat": 29.8050, "lon": -95.1100, "type": "industrial_gas"},
-        "Arkema Crosby": {"lat": 29.9150, "lon": -95.0620, "type": "chemical"},
-        "Huntsman Petrochemical": {"lat": 29.7280, "lon": -95.0380, "type": "chemical"},
-        "Ineos Chocolate Bayou": {"lat": 29.2450, "lon": -95.2280, "type": "chemical"},
-        "Covestro Baytown": {"lat": 29.7380, "lon": -95.0180, "type": "chemical"},
-        "Enterprise Products": {"lat": 29.7620, "lon": -95.0850, "type": "storage"},
-        "Kinder Morgan Pasadena": {"lat": 29.6850, "lon": -95.1650, "type": "storage"}
-    }
-    return jsonify(facilities)
+        sources = [s for s in args.get('source', '').split(',') if s]
+        severities = [s for s in args.get('severity', '').split(',') if s]
+        since = parse_time(args['since']) if 'since' in args else None
+        until = parse_time(args['until']) if 'until' in args else None
+        near = None
+        if 'lat' in args or 'lon' in args:
+            near = (float(args['lat']), float(args['lon']), float(args.get('radius_km', 5)))
+        limit = max(1, min(int(args.get('limit', 100)), 500))
+        events, next_cursor = history_store.query(
+            sources=sources, severities=severities, since=since, until=until,
+            near=near, limit=limit, cursor=args.get('cursor'), region=region)
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Bad query: {e}"}), 400
 
-@app.route('/api/health', methods=['GET'])
-def health():
-    """Health check endpoint"""
     return jsonify({
-        "status": "operational",
+        "events": events,
+        "count": len(events),
+        "next_cursor": next_cursor,
         "timestamp": datetime.utcnow().isoformat()
     })
 
-@app.route('/api/tceq-emissions', methods=['GET'])
-def get_tceq_emissions():
-    """Fetch TCEQ air emission events for Houston/Harris County area"""
-    url = "https://www2.tceq.texas.gov/oce/eer/index.cfm?fuession=main.getDetails"
+def requires_token(view):
+    """Answer 401 unless the request carries Authorization: Bearer <SUBSCRIPTIONS_TOKEN>"""
+    @functools.wraps(view)
+    def checked(*args, **kwargs):
+        if not SUBSCRIPTIONS_TOKEN:
+            return jsonify({"error": "Subscriptions are disabled; set SUBSCRIPTIONS_TOKEN"}), 404
+        supplied = request.headers.get('Authorization', '').encode('utf-8')
+        if not hmac.compare_digest(supplied, f"Bearer {SUBSCRIPTIONS_TOKEN}".encode('utf-8')):
+            return jsonify({"error": "Missing or wrong subscriptions token"}), 401
+        return view(*args, **kwargs)
+    return checked
+
+@app.route('/api/subscriptions', methods=['POST'])
+@requires_token
+def create_subscription():
+    """Subscribe a webhook url to new records.
+
+    Body: url, and optionally name, sources, regions, min_severity, keywords and a
+    geofence given as lat+lon+radius_km or as facility (of region) + radius_km.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    if data.get('facility') is not None:
+        region = REGIONS.get(data.get('region') or DEFAULT_REGION)
+        if region is None:
+            return jsonify({"error": f"Unknown region: {data['region']}"}), 400
+        facility = region.facilities.get(data['facility'])
+        if facility is None:
+            return jsonify({"error": f"Unknown facility: {data['facility']}"}), 400
+        data = {**data, "lat": facility['lat'], "lon": facility['lon']}
+    try:
+        subscription = subscription_store.create(data, REGIONS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(subscription), 201
+
+@app.route('/api/subscriptions', methods=['GET'])
+@requires_token
+def list_subscriptions():
+    """Page through subscriptions, oldest first"""
     try:
-        # TCEQ emissions search page - scrape recent events
-        search_url = "https://www2.tceq.texas.gov/oce/eer/index.cfm"
-        params = {
-            'fuession': 'main.searchResults',
-            'county': 'HARRIS',
-            'dayRange': '7'
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    subscriptions = subscription_store.list(limit, offset)
+    return jsonify({
+        "subscriptions": subscriptions,
+        "count": len(subscriptions),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+@app.route('/api/subscriptions/<id>', methods=['GET'])
+@requires_token
+def get_subscription(id):
+    subscription = subscription_store.get(id)
+    if subscription is None:
+        return jsonify({"error": f"Unknown subscription: {id}"}), 404
+    return jsonify(subscription)
+
+@app.route('/api/subscriptions/<id>', methods=['DELETE'])
+@requires_token
+def delete_subscription(id):
+    """Unsubscribe; deliveries still pending for it are dropped"""
+    if not subscription_store.delete(id):
+        return jsonify({"error": f"Unknown subscription: {id}"}), 404
+    return '', 204
+
+@app.route('/api/outbox', methods=['GET'])
+@requires_token
+def get_outbox():
+    """Webhook deliveries by status, and the endpoints with the most pending"""
+    statuses, endpoints, count = subscription_store.stats()
+    return jsonify({
+        "subscriptions": count,
+        "deliveries": {
+            status: {"count": s['count'], "oldest": isoformat(s['oldest'])} for status, s in statuses.items()
+        },
+        "pending_by_endpoint": [
+            {"endpoint": endpoint, "pending": pending, "oldest": isoformat(oldest),
+             "max_attempts": attempts, "last_error": error}
+            for endpoint, pending, oldest, attempts, error in endpoints
+        ],
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+@regional('/wind', methods=['GET'])
+def get_wind(region):
+    """Serve the latest NWS wind data"""
+    return serve_region(region, 'wind')
+
+@regional('/caer', methods=['GET'])
+def get_caer(region):
+    """Serve the latest CAER community alert messages"""
+    return serve_region(region, 'caer')
+
+def dispatch_view(args):
+    """(variant, render(payload)) for the dispatch representation args ask for.
+
+    fields=a,b,...      project every incident onto these fields
+    priority=index      send priority incidents as indices into all_incidents
+    format=table        columns + rows instead of one object per incident
+                        (priority is always sent as indices)
+    """
+    fmt = args.get('format', 'json')
+    if fmt not in ('json', 'table'):
+        raise ValueError("format must be json or table")
+    priority = args.get('priority', 'full')
+    if priority not in ('full', 'index'):
+        raise ValueError("priority must be full or index")
+    fields = [f.strip() for f in args.get('fields', '').split(',') if f.strip()]
+    unknown = [f for f in fields if f not in DISPATCH_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if fmt == 'json' and priority == 'full' and not fields:
+        return '', None
+
+    def render(payload):
+        incidents = payload['all_incidents']
+        summary = {
+            "total_incidents": payload['total_incidents'],
+            "priority_count": payload['priority_count'],
+            "timestamp": payload['timestamp'],
         }
-        r = requests.get(search_url, params=params, headers=HEADERS, timeout=15)
-        soup = BeautifulSoup(r.text, 'html.parser')
-        
-        events = []
-        # Look for table rows with emission event data
-        tables = soup.find_all('table')
-        for table in tables:
-            rows = table.find_all('tr')
-            for row in rows[1:]:  # Skip header
-                cols = row.find_all(['td', 'th'])
-                if len(cols) >= 4:
-                    event = {
-                        'incident_number': cols[0].get_text(strip=True) if len(cols) > 0 else '',
-                        'facility': cols[1].get_text(strip=True) if len(cols) > 1 else '',
-                        'date': cols[2].get_text(strip=True) if len(cols) > 2 else '',
-                        'county': cols[3].get_text(strip=True) if len(cols) > 3 else '',
-                        'severity': 'warning'
-                    }
-                    # Filter for Houston area counties
-                    if event['county'].upper() in ['HARRIS', 'CHAMBERS', 'GALVESTON', 'BRAZORIA', 'LIBERTY']:
-                        # Check for critical keywords
-                        text = ' '.join([event['facility'], event.get('description', '')]).lower()
-                        if any(kw in text for kw in ['explosion', 'fire', 'evacuate', 'shelter']):
-                            event['severity'] = 'critical'
-                        events.append(event)
-        
-        return jsonify({
-            "events": events,
-            "count": len(events),
-            "source": "TCEQ Air Emission Event Reports",
-            "timestamp": datetime.utcnow().isoformat()
+        indices = [i for i, inc in enumerate(incidents) if inc['matched_terms']]
+        if fmt == 'table':
+            columns = fields or DISPATCH_FIELDS
+            rows = [[inc.get(c) for c in columns] for inc in incidents]
+            return {"format": "table", "columns": columns, "rows": rows, "priority": indices, **summary}
+        if fields:
+            incidents = [{f: inc[f] for f in fields if f in inc} for inc in incidents]
+        if priority == 'index':
+            return {"priority": indices, "all_incidents": incidents, **summary}
+        return {"incidents": [incidents[i] for i in indices], "all_incidents": incidents, **summary}
+
+    return f"{fmt}|{priority}|{','.join(fields)}", render
+
+
+@regional('/dispatch', methods=['GET'])
+def get_dispatch(region):
+    """Serve the latest active incidents, or only changes with ?since=<cursor>"""
+    name = region.feeds.get('dispatch')
+    if name is None:
+        return no_feed(region, 'dispatch')
+    since = request.args.get('since')
+    if since is None:
+        try:
+            variant, render = dispatch_view(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return serve(name, variant, render)
+
+    source = scheduler.get(name)
+    entry = source.entry
+    if entry is None:
+        return Response(error_body(source), status=500, mimetype='application/json')
+
+    def render():
+        return encoding.dumps({
+            **delta_feed(name).since(since),
+            "total_incidents": entry.payload['total_incidents'],
+            "priority_count": entry.payload['priority_count'],
+            "timestamp": entry.payload['timestamp']
         })
-    except Exception as e:
-        return jsonify({
-            "error": str(e),
-            "events": [],
-            "count": 0,
-            "timestamp": datetime.utcnow().isoformat()
-        }), 500
-
-@app.route('/api/weather-alerts', methods=['GET'])
-def get_weather_alerts():
-    """Fetch NWS active weather alerts for Harris County area"""
-    # TXZ213 = Harris County, TXZ214 = Galveston, TXZ212 = Chambers
-    zones = ['TXZ213', 'TXZ214', 'TXZ212', 'TXZ226', 'TXZ227']
+
+    # Dashboards polling in step hold the same cursor, so they share one encoding
+    return send(('dispatch-delta', entry.etag, since), render)
+
+@regional('/facilities', methods=['GET'])
+def get_facilities(region):
+    """Return facility coordinates for the region's industrial area"""
+    return jsonify(region.facilities)
+
+# Incident index for the current snapshot of each dispatch board, keyed by (name, version, radius)
+_incident_index = {}
+_incident_index_lock = threading.Lock()
+
+
+def incident_index(name, radius_km):
+    """GridIndex over located incidents of the latest snapshot of dispatch board name"""
+    # numpy loads with the first proximity query, not at startup
+    from spatial import GridIndex
+
+    entry = scheduler.get(name).entry
+    if entry is None:
+        return None, []
+    key = (name, entry.version, radius_km)
+    with _incident_index_lock:
+        cached = _incident_index.get(key)
+    if cached is None:
+        # Built outside the lock; requests racing on a new snapshot may each build one
+        located = [inc for inc in entry.payload.get('all_incidents', []) if inc.get('has_location')]
+        index = GridIndex([inc['lat'] for inc in located], [inc['lon'] for inc in located], radius_km)
+        with _incident_index_lock:
+            outdated = [k for k in _incident_index if k[0] == name and k[1] != entry.version]
+            for k in outdated:
+                del _incident_index[k]
+            if len(_incident_index) > 16 * len(dispatch_feeds):
+                _incident_index.clear()
+            cached = _incident_index.setdefault(key, (index, located))
+    return cached
+
+
+def radius_arg():
+    radius_km = float(request.args.get('radius_km', 5))
+    if not 0.1 <= radius_km <= 200:
+        raise ValueError("radius_km must be between 0.1 and 200")
+    return radius_km
+
+@regional('/facilities/nearby', methods=['GET'])
+def get_all_facilities_nearby(region):
+    """Incidents within radius_km of every facility, in one batched query"""
+    name = region.feeds.get('dispatch')
+    if name is None:
+        return no_feed(region, 'dispatch')
     try:
-        all_alerts = []
-        for zone in zones[:2]:  # Limit to reduce API calls
-            url = f"https://api.weather.gov/alerts/active?zone={zone}"
-            r = requests.get(url, headers={**HEADERS, 'Accept': 'application/geo+json'}, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                features = data.get('features', [])
-                for feature in features:
-                    props = feature.get('properties', {})
-                    alert = {
-                        'event': props.get('event', 'Unknown'),
-                        'headline': props.get('headline', ''),
-                        'description': props.get('description', '')[:500],
-                        'severity': props.get('severity', 'Unknown'),
-                        'urgency': props.get('urgency', 'Unknown'),
-                        'areas': props.get('areaDesc', ''),
-                        'effective': props.get('effective', ''),
-                        'expires': props.get('expires', '')
-                    }
-                    # Map NWS severity to our scale
-                    if alert['severity'] in ['Extreme', 'Severe']:
-                        alert['display_severity'] = 'critical'
-                    elif alert['severity'] == 'Moderate':
-                        alert['display_severity'] = 'warning'
-                    else:
-                        alert['display_severity'] = 'info'
-                    all_alerts.append(alert)
-        
-        return jsonify({
-            "alerts": all_alerts,
-            "count": len(all_alerts),
-            "source": "National Weather Service",
-            "timestamp": datetime.utcnow().isoformat()
+        radius_km = radius_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    index, located = incident_index(name, radius_km)
+    if index is None:
+        return Response(error_body(scheduler.sources[name]), status=500, mimetype='application/json')
+
+    q_idx, p_idx, dist = index.pairs(region.facility_lat, region.facility_lon, radius_km)
+    nearby = {facility: [] for facility in region.facility_names}
+    incidents = {}
+    for q, p, d in sorted(zip(q_idx.tolist(), p_idx.tolist(), dist.tolist()), key=lambda t: (t[0], t[2])):
+        inc = located[p]
+        nearby[region.facility_names[q]].append({"id": inc['id'], "distance_km": round(d, 3)})
+        incidents[inc['id']] = inc
+    return jsonify({
+        "radius_km": radius_km,
+        "facilities": nearby,
+        "incidents": incidents,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+@regional('/facilities/<name>/nearby', methods=['GET'])
+def get_facility_nearby(region, name):
+    """Incidents within radius_km of one facility, nearest first"""
+    facility = region.facilities.get(name)
+    if facility is None:
+        return jsonify({"error": f"Unknown facility: {name}"}), 404
+    board = region.feeds.get('dispatch')
+    if board is None:
+        return no_feed(region, 'dispatch')
+    try:
+        radius_km = radius_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    index, located = incident_index(board, radius_km)
+    if index is None:
+        return Response(error_body(scheduler.sources[board]), status=500, mimetype='application/json')
+
+    _, p_idx, dist = index.pairs(facility['lat'], facility['lon'], radius_km)
+    order = dist.argsort()
+    incidents = [{**located[p], "distance_km": round(d, 3)} for p, d in zip(p_idx[order].tolist(), dist[order].tolist())]
+    return jsonify({
+        "facility": name,
+        "radius_km": radius_km,
+        "incidents": incidents,
+        "count": len(incidents),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+# Region id -> plume exposures for its current (wind, dispatch) snapshot pair
+_plume_cache = {}
+_plume_cache_lock = threading.Lock()
+
+@regional('/plume', methods=['GET'])
+def get_plume(region):
+    """Residential areas, incidents and facilities downwind of each facility, per forecast hour"""
+    try:
+        hours = max(1, int(request.args.get('hours', 12)))
+    except ValueError:
+        return jsonify({"error": "hours must be an integer"}), 400
+
+    if 'wind' not in region.feeds:
+        return no_feed(region, 'wind')
+    source = scheduler.get(region.feeds['wind'])
+    wind = source.entry
+    if wind is None:
+        return Response(error_body(source), status=500, mimetype='application/json')
+    dispatch = scheduler.get(region.feeds['dispatch']).entry if 'dispatch' in region.feeds else None
+
+    key = (wind.etag, dispatch.version if dispatch else None)
+    with _plume_cache_lock:
+        cached = _plume_cache.get(region.id)
+    if cached is not None and cached[0] == key:
+        periods = cached[1]
+    else:
+        from plume import exposure
+
+        located = [inc for inc in (dispatch.payload.get('all_incidents', []) if dispatch else []) if inc.get('has_location')]
+        areas = region.residential_areas
+        residential = list(areas)
+        periods = exposure(wind.payload.get('periods', []), region.facilities, {
+            "residential": (residential, [areas[n]['lat'] for n in residential],
+                            [areas[n]['lon'] for n in residential]),
+            "incidents": ([inc['id'] for inc in located], [inc['lat'] for inc in located],
+                          [inc['lon'] for inc in located]),
+            "facilities": (region.facility_names, region.facility_lat, region.facility_lon),
         })
-    except Exception as e:
-        return jsonify({
-            "error": str(e),
-            "alerts": [],
-            "count": 0,
-            "timestamp": datetime.utcnow().isoformat()
-        }), 500
-
-@app.route('/api/radio-feeds', methods=['GET'])
-def get_radio_feeds():
-    """Return available Broadcastify radio scanner feeds for Houston area"""
-    feeds = [
-        {
-            "id": 11690,
-            "name": "Houston Fire - Digital",
-            "type": "fire",
-            "coverage": "HFD Dispatch",
-            "url": "https://www.broadcastify.com/listen/feed/11690",
-            "embed_url": "https://www.broadcastify.com/listen/feed/11690/web",
-            "keywords": ["FIRE", "SMOKE", "HAZMAT", "EXPLOSION", "CHEMICAL", "INDUSTRIAL"]
-        },
-        {
-            "id": 11689,
-            "name": "Houston PD - All Districts",
-            "type": "police",
-            "coverage": "HPD Citywide",
-            "url": "https://www.broadcastify.com/listen/feed/11689",
-            "embed_url": "https://www.broadcastify.com/listen/feed/11689/web",
-            "keywords": ["CRASH", "ROBBERY", "ASSAULT", "PURSUIT"]
-        },
-        {
-            "id": 14299,
-            "name": "HPD + Harris County Constables",
-            "type": "police",
-            "coverage": "HPD + Constables",
-            "url": "https://www.broadcastify.com/listen/feed/14299",
-            "embed_url": "https://www.broadcastify.com/listen/feed/14299/web",
-            "keywords": []
-        },
-        {
-            "id": 17398,
-            "name": "Harris County Sheriff Dispatch",
-            "type": "sheriff",
-            "coverage": "HCSO",
-            "url": "https://www.broadcastify.com/listen/feed/17398",
-            "embed_url": "https://www.broadcastify.com/listen/feed/17398/web",
-            "keywords": []
-        },
-        {
-            "id": 34687,
-            "name": "Harris County North",
-            "type": "multi",
-            "coverage": "Pct 4, Tomball, Humble, DPS",
-            "url": "https://www.broadcastify.com/listen/feed/34687",
-            "embed_url": "https://www.broadcastify.com/listen/feed/34687/web",
-            "keywords": ["CHANNELVIEW", "SHELDON", "CROSBY"]
-        },
-        {
-            "id": 28416,
-            "name": "Houston Fire Dispatch",
-            "type": "fire",
-            "coverage": "HFD Primary",
-            "url": "https://www.broadcastify.com/listen/feed/28416",
-            "embed_url": "https://www.broadcastify.com/listen/feed/28416/web",
-            "keywords": ["FIRE", "EMS", "RESCUE"]
+        with _plume_cache_lock:
+            _plume_cache[region.id] = (key, periods)
+
+    return jsonify({
+        "periods": periods[:hours],
+        "forecast_updated": wind.payload.get('forecast_updated'),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+def isoformat(ts):
+    return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Per-source breaker state, last success and fetch latency"""
+    breakers = scheduler.health() if scheduler.shared is None else (shared.read_blob(HEALTH_BLOB) or {})
+    now = time.time()
+    sources = {}
+    for name, source in scheduler.sources.items():
+        breaker = breakers.get(name, {})
+        entry = scheduler.peek(name)
+        age = now - entry.updated_at if entry else None
+        sources[name] = {
+            "state": breaker.get('state', 'closed'),
+            "failure_rate": breaker.get('failure_rate'),
+            "p50_ms": breaker.get('p50_ms'),
+            "p95_ms": breaker.get('p95_ms'),
+            "last_success": isoformat(entry.updated_at if entry else None),
+            "last_error": breaker.get('error'),
+            "last_error_at": isoformat(breaker.get('error_at')),
+            "age_seconds": None if age is None else round(age),
+            "stale": entry is None or age > source.ttl or breaker.get('state', 'closed') != 'closed',
         }
-    ]
+    degraded = any(s['stale'] for s in sources.values())
+    body = {
+        "status": "degraded" if degraded else "operational",
+        "sources": sources,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if upstream.replay is not None:
+        body["replay"] = {
+            "clock": isoformat(upstream.replay.now()),
+            "speed": upstream.replay.speed,
+            "first": isoformat(upstream.replay.first),
+            "last": isoformat(upstream.replay.last),
+        }
+    return jsonify(body)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Pipeline stage timings, payload sizes, record counts, cache and upstream counters"""
+    state = None if scheduler.shared is None else (shared.read_blob('metrics') or {})
+    return Response(metrics.registry.render(state), mimetype='text/plain; version=0.0.4')
+
+@regional('/tceq-emissions', methods=['GET'])
+def get_tceq_emissions(region):
+    """Serve the latest TCEQ air emission events in the region's counties"""
+    return serve_region(region, 'tceq-emissions')
+
+@regional('/weather-alerts', methods=['GET'])
+def get_weather_alerts(region):
+    """Serve the latest NWS weather alerts for the region's zones"""
+    return serve_region(region, 'weather-alerts')
+
+@regional('/radio-feeds', methods=['GET'])
+def get_radio_feeds(region):
+    """Return available Broadcastify radio scanner feeds for the region"""
     return jsonify({
-        "feeds": feeds,
-        "count": len(feeds),
+        "feeds": region.radio_feeds,
+        "count": len(region.radio_feeds),
         "timestamp": datetime.utcnow().isoformat()
     })
 
 @app.route('/api/debug/dispatch', methods=['GET'])
 def debug_dispatch():
-    """Debug endpoint to see raw dispatch data"""
-    url = "https://cohweb.houstontx.gov/ActiveIncidents/Combined.aspx"
+    """Debug endpoint to see raw dispatch data of the default region's board"""
+    from bs4 import BeautifulSoup
+
+    region = REGIONS[DEFAULT_REGION]
+    if region.dispatch is None:
+        return no_feed(region, 'dispatch')
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = upstream.get(region.dispatch['url'], read_timeout=15)
         soup = BeautifulSoup(r.text, 'html.parser')
         tables = soup.find_all("table")
         
@@ -460,6 +919,52 @@ def debug_dispatch():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def stage_totals(kind):
+    """Seconds recorded so far per stage of one kind of source"""
+    return {key[1]: total for key, _, total, _ in metrics.STAGE_SECONDS.state() if key[0] == kind}
+
+
+@app.route('/api/debug/profile/<name>', methods=['GET'])
+def debug_profile(name):
+    """Run one pass of a source pipeline under cProfile (needs DEBUG_PROFILING=1)"""
+    if not DEBUG_PROFILING:
+        return jsonify({"error": "Profiling is disabled; set DEBUG_PROFILING=1"}), 404
+    # The bare pipeline: dispatch skips the delta feed update
+    pipeline = PIPELINES.get(name)
+    if pipeline is None:
+        return jsonify({"error": f"Unknown source: {name}"}), 404
+    try:
+        limit = max(1, min(int(request.args.get('limit', 40)), 500))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        return jsonify({"error": "sort must be cumulative, tottime or ncalls"}), 400
+
+    kind = FEEDS[name].kind
+    before = stage_totals(kind)
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    error = None
+    try:
+        # Parse even if upstream is unchanged, without touching the scheduler's change state
+        with upstream.unconditional():
+            profiler.runcall(pipeline)
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - started
+    after = stage_totals(kind)
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return jsonify({
+        "source": name,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "stages_ms": {stage: round((total - before.get(stage, 0.0)) * 1000, 2) for stage, total in after.items() if total != before.get(stage)},
+        "error": error,
+        "profile": out.getvalue()
+    })
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=7860)
 
@@ -0,0 +1,101 @@
+"""Throughput of the compiled classifiers vs. the old any(kw in text) loops.
+
+Usage:
+    python bench/bench_classify.py [--records N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import classify  # noqa: E402
+
+LEGACY_DISPATCH = ['SHELDON', 'BAYWAY', 'DECKER', 'CHANNELVIEW', 'PASADENA',
+                   'FIRE', 'HAZMAT', 'LYONDELL', 'EXXON', 'INDUSTRIAL', 'CHEMICAL',
+                   'REFINERY', 'PLANT', 'EXPLOSION', 'LEAK', 'SMOKE', 'ODOR', 'APARTMENT',
+                   'HOUSE', 'ALARM', 'CRASH', 'MAJOR']
+
+
+def legacy_dispatch(text):
+    text = text.upper()
+    return [kw for kw in LEGACY_DISPATCH if kw in text]
+
+
+def legacy_caer(text):
+    text = text.lower()
+    if any(x in text for x in ['explosion', 'shelter', 'evacuate', 'emergency']):
+        return 'critical'
+    if any(x in text for x in ['flare', 'release', 'incident', 'leak']):
+        return 'warning'
+    return 'info'
+
+
+def dispatch_texts(count, seed=1):
+    rnd = random.Random(seed)
+    streets = ['MAIN ST', 'PLANTATION DR', 'MARKET STREET RD', 'SHELDON RD', 'BELTWAY 8', 'WESTHEIMER RD']
+    types = ['FIRE ALARM', 'MAJOR CRASH', 'HAZMAT', 'EMS', 'SMOKE INVESTIGATION', 'BURGLARY', 'CHECK PATIENT']
+    return [f'{rnd.randint(100, 19999)} {rnd.choice(streets)} {rnd.choice(streets)} {rnd.choice(types)}'
+            for _ in range(count)]
+
+
+def caer_texts(count, seed=2):
+    rnd = random.Random(seed)
+    lines = ['Planned maintenance flare at the olefins unit.',
+             'Shelter in place has been issued for residents within one mile.',
+             'Routine testing of the facility warning sirens.',
+             'A small leak has been isolated; no offsite impact is expected.']
+    return [' '.join(rnd.choice(lines) for _ in range(3)) for _ in range(count)]
+
+
+def large_rule_set(count, seed=3):
+    """LEGACY_DISPATCH padded with random street-like words"""
+    rnd = random.Random(seed)
+    extra = [''.join(rnd.choice('ABCDEFGHIKLMNOPRSTUVWY') for _ in range(rnd.randint(5, 10)))
+             for _ in range(count - len(LEGACY_DISPATCH))]
+    return LEGACY_DISPATCH + extra
+
+
+def rate(fn, texts, repeat=5):
+    """Best of repeat passes, so a noisy neighbour doesn't pick the winner"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--terms', type=int, default=300, help='Size of the large rule set')
+    args = parser.parse_args()
+
+    terms = large_rule_set(args.terms)
+    large = classify.Classifier([(t, 'warning', 'prefix') for t in terms])
+
+    def legacy_large(text):
+        text = text.upper()
+        return [kw for kw in terms if kw in text]
+
+    dispatch = dispatch_texts(args.records)
+    caer = caer_texts(args.records)
+    cases = [
+        ('dispatch', 'legacy', legacy_dispatch, dispatch),
+        ('dispatch', 'compiled', classify.DISPATCH.classify, dispatch),
+        (f'{args.terms} terms', 'legacy', legacy_large, dispatch),
+        (f'{args.terms} terms', 'compiled', large.classify, dispatch),
+        ('caer', 'legacy', legacy_caer, caer),
+        ('caer', 'compiled', classify.CAER.classify, caer),
+    ]
+    print(f"{'rules':<12} {'matcher':<10} {'records/s':>12}")
+    for rules, label, fn, texts in cases:
+        print(f"{rules:<12} {label:<10} {rate(fn, texts):>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Per-refresh cost of the correlation engine as history accumulates.
+
+Usage:
+    python bench/bench_correlate.py [--refreshes 500] [--new 20] [--board 400]
+
+Simulates a dispatch board of --board incidents where --new incidents
+arrive (and as many leave) every simulated minute, plus a CAER message per
+refresh, all with hazard terms at random places around the ship channel.
+Reports the time per refresh in buckets of the run: with incremental
+indexes it should stay flat while open and closed clusters pile up.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('STATE_DIR', tempfile.mkdtemp(prefix='bench-state-'))
+
+from correlate import LOCAL_TZ, Correlator  # noqa: E402
+import regions  # noqa: E402
+
+TYPES = ['FIRE', 'HAZMAT', 'SMOKE INVESTIGATION', 'ODOR INVESTIGATION', 'CHEMICAL SPILL', 'FIRE ALARM']
+CAER = ['Flaring is expected during startup.', 'Crews are responding to a small release contained on site.']
+
+
+def local(t):
+    return datetime.fromtimestamp(t, LOCAL_TZ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--refreshes', type=int, default=500)
+    parser.add_argument('--new', type=int, default=20, help='New dispatch incidents per refresh')
+    parser.add_argument('--board', type=int, default=400, help='Incidents on the board at once')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    houston = regions.load(enabled=['houston'], default='houston')['houston']
+    facilities = list(houston.facilities)
+    correlator = Correlator(houston.facilities, houston.residential_areas)
+    board = []
+    start = time.time() - args.refreshes * 60
+    buckets = [[] for _ in range(5)]
+    seq = 0
+    for i in range(args.refreshes):
+        now = start + i * 60
+        for _ in range(args.new):
+            seq += 1
+            lat = 29.70 + rng.random() * 0.2
+            lon = -95.25 + rng.random() * 0.3
+            board.append({
+                'id': f'inc{seq}', 'Agency': 'FD', 'Address': f'{seq} MAIN ST', 'Cross Street': '',
+                'Key Map': '', 'Call Time': local(now).strftime('%m/%d/%Y %H:%M'),
+                'Incident Type': rng.choice(TYPES), 'severity': 'warning', 'has_location': True,
+                'lat': lat, 'lon': lon,
+            })
+        board = board[-args.board:]
+        facility = rng.choice(facilities)
+        caer = {'messages': [{
+            'title': f"{facility} - {local(now).strftime('%m/%d/%Y %I:%M %p')}",
+            'body': rng.choice(CAER), 'severity': 'warning',
+        }]}
+
+        started = time.perf_counter()
+        correlator.update('dispatch', {'all_incidents': board}, now=now)
+        correlator.update('caer', caer, now=now)
+        buckets[i * len(buckets) // args.refreshes].append(time.perf_counter() - started)
+
+    print(f"{args.refreshes} refreshes, {args.new} new incidents each, board of {args.board}\n")
+    print(f"{'refreshes':>12} {'median ms':>10} {'max ms':>8}")
+    size = args.refreshes // len(buckets)
+    for b, times in enumerate(buckets):
+        print(f"{b * size + 1:>5}-{(b + 1) * size:<6} {statistics.median(times) * 1000:>10.2f} "
+              f"{max(times) * 1000:>8.2f}")
+    multi = sum(1 for c in correlator.export() if len(c['sources']) > 1)
+    print(f"\n{len(correlator.open)} open clusters, {len(correlator.closed)} kept closed, "
+          f"{multi} spanning sources, {len(correlator.seen)} records remembered")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Compare the lxml dispatch extractor with the old pandas.read_html path.
+
+Usage:
+    python bench/bench_dispatch_parse.py [page.html ...] [--rows N] [--runs N]
+
+With no pages, a synthetic Combined.aspx-style board is generated. Reports
+median parse time and peak traced memory for each parser.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from parsers import DISPATCH_COLUMNS, iter_dispatch_rows  # noqa: E402
+
+
+def synthetic_page(rows, seed=1):
+    """A board shaped like Combined.aspx: layout tables, header, disclaimer"""
+    rnd = random.Random(seed)
+    types = ['FIRE ALARM', 'MAJOR CRASH', 'HAZMAT', 'EMS', 'SMOKE INVESTIGATION', 'BURGLARY']
+    out = ['<html><body><table><tr><td><h1>Active Incidents</h1></td></tr><tr><td>',
+           '<table id="grid"><tr>' + ''.join(f'<th>{c}</th>' for c in DISPATCH_COLUMNS) + '</tr>']
+    for i in range(rows):
+        out.append('<tr>' + ''.join(f'<td>{v}</td>' for v in [
+            rnd.choice(['FD', 'PD']), f'{rnd.randint(100, 19999)} MAIN ST', f'ELM ST {i}',
+            f'{rnd.randint(400, 700)}{rnd.choice("ABCDEFGHJKLM")}', f'10/17/2026 {i % 24:02d}:{i % 60:02d}',
+            rnd.choice(types), rnd.choice(['Y', 'N'])]) + '</tr>')
+    out.append('<tr><td colspan="7">This page contains information that is subject to change (disclaimer)</td></tr>')
+    out.append('</table></td></tr></table></body></html>')
+    return '\n'.join(out)
+
+
+def pandas_rows(html):
+    """The pre-lxml path from get_dispatch, up to to_dict('records')"""
+    import pandas as pd
+
+    tables = pd.read_html(StringIO(html))
+    if not tables:
+        return []
+    df = max(tables, key=lambda x: len(x))
+    df.columns = df.columns.astype(str)
+    if 'Agency' not in df.columns and len(df) > 0:
+        if 'Agency' in str(df.iloc[0].values):
+            df.columns = df.iloc[0]
+            df = df[1:]
+    df = df[~df.astype(str).apply(lambda x: x.str.contains('This page contains|disclaimer', case=False, na=False)).any(axis=1)]
+    if 'Agency' not in df.columns and len(df.columns) >= 7:
+        df.columns = DISPATCH_COLUMNS[:len(df.columns)]
+    return df.to_dict('records')
+
+
+def lxml_rows(html):
+    return list(iter_dispatch_rows(html))
+
+
+def measure(fn, html, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = fn(html)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pages', nargs='*', help='Recorded Combined.aspx pages')
+    parser.add_argument('--rows', type=int, default=400, help='Rows in the synthetic page')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [(p, open(p, encoding='utf-8', errors='replace').read()) for p in args.pages]
+    if not pages:
+        pages = [(f'synthetic ({args.rows} rows)', synthetic_page(args.rows))]
+
+    parsers = [('lxml', lxml_rows)]
+    try:
+        import pandas  # noqa: F401
+        parsers.append(('pandas', pandas_rows))
+    except ImportError:
+        print('pandas not installed; skipping the pandas baseline')
+
+    print(f"{'page':<32} {'parser':<8} {'rows':>6} {'median ms':>10} {'peak KiB':>10}")
+    for name, html in pages:
+        for label, fn in parsers:
+            rows, median, peak = measure(fn, html, args.runs)
+            print(f"{name[-32:]:<32} {label:<8} {rows:>6} {median * 1000:>10.2f} {peak / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
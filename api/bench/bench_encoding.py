@@ -0,0 +1,93 @@
+"""Bytes on the wire and encode time for each /api/dispatch representation.
+
+Usage:
+    python bench/bench_encoding.py [--runs N]
+
+Parses the recorded Combined.aspx fixture once, then for the old jsonify
+path and every dispatch variant reports the body size per content coding,
+the time to serialize and compress it once, and the time to serve it from
+the encoded cache.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('STATE_DIR', tempfile.mkdtemp(prefix='bench-state-'))
+os.environ.setdefault('SHARED_DIR', os.path.join(os.environ['STATE_DIR'], 'shared'))
+# app is imported for its dispatch variants only; keep it off the network
+os.environ.setdefault('BACKGROUND_REFRESH', '0')
+os.environ.setdefault('WARMUP', '0')
+
+import json  # noqa: E402
+from urllib.parse import parse_qsl  # noqa: E402
+
+import app  # noqa: E402
+import encoding  # noqa: E402
+import sources  # noqa: E402
+from stub_server import load_fixtures  # noqa: E402
+
+VARIANTS = [
+    '',
+    'priority=index',
+    'fields=id,Address,Incident Type,severity,lat,lon',
+    'format=table',
+    'format=table&fields=id,severity,lat,lon',
+]
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    page = next(b for key, (_, b) in load_fixtures().items() if key.startswith('cohweb.houstontx.gov/'))
+    payload = sources.parse_dispatch(page)
+    codings = [None] + encoding.CODINGS
+    print(f"{payload['total_incidents']} incidents, {payload['priority_count']} priority\n")
+    print(f"{'representation':<50} " + ' '.join(f"{c or 'identity':>10}" for c in codings)
+          + f" {'encode ms':>10} {'cached ms':>10}")
+
+    _, old = timed(lambda: json.dumps(payload).encode('utf-8'), args.runs)
+    old_body = json.dumps(payload).encode('utf-8')
+    print(f"{'json.dumps (before)':<50} {len(old_body):>10} " + ' '.join(f"{'-':>10}" for _ in codings[1:])
+          + f" {old * 1000:>10.2f} {old * 1000:>10.2f}")
+
+    for query in VARIANTS:
+        variant, render = app.dispatch_view(dict(parse_qsl(query)))
+        if render is None:
+            def build():
+                return encoding.dumps(payload)
+        else:
+            def build():
+                return encoding.dumps(render(payload))
+        sizes = []
+        encode = 0.0
+        for coding in codings:
+            def once():
+                body = build()
+                return encoding.compress(body, coding) if coding else body
+            body, seconds = timed(once, args.runs)
+            sizes.append(len(body))
+            encode = max(encode, seconds)
+        cache = encoding.EncodedCache()
+        cache.get(('dispatch', 'bench', variant), codings[-1], build)
+        _, cached = timed(lambda: cache.get(('dispatch', 'bench', variant), codings[-1], build), args.runs)
+        print(f"{query or '(default)':<50} " + ' '.join(f"{size:>10}" for size in sizes)
+              + f" {encode * 1000:>10.2f} {cached * 1000:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""End-to-end endpoint latency under concurrent load, against the stub upstream.
+
+Usage:
+    python bench/bench_endpoints.py [--concurrency 16] [--requests 400]
+                                    [--latency 0.2] [--fail-rate 0.0]
+                                    [--endpoints /api/dispatch,/api/snapshot]
+
+Starts bench/stub_server.py and the API (werkzeug, threaded) in this process
+with UPSTREAM_STUB_URL pointing at the stub, then hits each endpoint from
+--concurrency client threads. Reports throughput, latency percentiles, peak
+RSS and how many upstream requests the stub saw.
+"""
+import argparse
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests  # noqa: E402
+
+from stub_server import StubServer  # noqa: E402
+
+DEFAULT_ENDPOINTS = [
+    '/api/health', '/api/wind', '/api/caer', '/api/dispatch', '/api/tceq-emissions',
+    '/api/weather-alerts', '/api/snapshot', '/api/facilities/nearby', '/api/plume',
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def start_api(stub_url):
+    """Import the app against the stub and serve it on a free port"""
+    state = tempfile.mkdtemp(prefix='bench-state-')
+    os.environ['UPSTREAM_STUB_URL'] = stub_url
+    os.environ['STATE_DIR'] = state
+    os.environ['SHARED_DIR'] = os.path.join(state, 'shared')
+    from werkzeug.serving import make_server
+
+    import app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='api-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def load(base, path, total, concurrency):
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        r = session.get(base + path, timeout=60)
+        return time.perf_counter() - start, r.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return elapsed, [t for t, _ in results], sum(1 for _, s in results if s >= 400)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint')
+    parser.add_argument('--latency', type=float, default=0.2, help='Stub upstream latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--endpoints', default=','.join(DEFAULT_ENDPOINTS))
+    args = parser.parse_args()
+
+    stub = StubServer(latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate, seed=1)
+    stub.start()
+    base, server = start_api(stub.url)
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"{'endpoint':<26} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for path in [p for p in args.endpoints.split(',') if p]:
+        # The first request waits for the initial fetch; keep it out of the numbers
+        requests.get(base + path, timeout=60)
+        elapsed, times, errors = load(base, path, args.requests, args.concurrency)
+        print(f"{path:<26} {len(times) / elapsed:>8.0f} {statistics.median(times) * 1000:>8.1f} "
+              f"{percentile(times, 95) * 1000:>8.1f} {percentile(times, 99) * 1000:>8.1f} "
+              f"{max(times) * 1000:>8.1f} {errors:>7}")
+
+    rss_end = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\npeak RSS {rss_end / 1024:.0f} MiB (after startup {rss_start / 1024:.0f} MiB)")
+    print(f"upstream requests: {sum(stub.hits.values())}")
+    for key, count in sorted(stub.hits.items()):
+        print(f"  {count:>5}  {key}")
+    server.shutdown()
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
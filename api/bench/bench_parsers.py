@@ -0,0 +1,75 @@
+"""Throughput and memory of every source parser over the recorded fixtures.
+
+Usage:
+    python bench/bench_parsers.py [--runs N]
+
+No network: each parser gets its fixture from bench/fixtures. Reports the
+median time per page, records per second and peak traced memory.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Keep the geocode cache of a benchmark run out of the real state directory
+os.environ.setdefault('STATE_DIR', tempfile.mkdtemp(prefix='bench-state-'))
+
+import sources  # noqa: E402
+from stub_server import load_fixtures  # noqa: E402
+
+
+def parsers(fixtures):
+    """(name, fn, argument, records(result)) for every source parser"""
+    def body(prefix):
+        return next(b for key, (_, b) in fixtures.items() if key.startswith(prefix))
+
+    tceq = 'www2.tceq.texas.gov/oce/eer/index.cfm?'
+    zones = [json.loads(b).get('features', []) for key, (_, b) in fixtures.items()
+             if key.startswith('api.weather.gov/alerts/')]
+    return [
+        ('dispatch', sources.parse_dispatch, body('cohweb.houstontx.gov/'), lambda p: p['total_incidents']),
+        ('caer', sources.parse_caer, body('www.incident-reporter.net/').decode('utf-8'), lambda p: p['count']),
+        ('tceq-emissions', sources.parse_tceq_emissions, body(tceq + 'fuseaction=main.search').decode('utf-8'),
+         lambda p: p['count']),
+        ('tceq-report', sources.parse_tceq_report, body(tceq + 'fuseaction=main.getDetails').decode('utf-8'),
+         lambda p: len(p['contaminants'])),
+        ('wind', lambda raw: sources.parse_wind(json.loads(raw)), body('api.weather.gov/gridpoints/'),
+         lambda p: len(p['periods'])),
+        ('weather-alerts', sources.parse_weather_alerts, zones, lambda p: p['count']),
+    ]
+
+
+def measure(fn, arg, runs):
+    fn(arg)  # warm caches (geocoder, classifier) like a long-running process
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(arg)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'parser':<16} {'records':>8} {'median ms':>10} {'records/s':>11} {'peak KiB':>10}")
+    for name, fn, arg, count in parsers(load_fixtures()):
+        result, median, peak = measure(fn, arg, args.runs)
+        records = count(result)
+        rate = records / median if median else 0
+        print(f"{name:<16} {records:>8} {median * 1000:>10.2f} {rate:>11.0f} {peak / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
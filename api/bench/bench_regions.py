@@ -0,0 +1,95 @@
+"""Upstream requests per refresh cycle as the number of regions grows.
+
+Usage:
+    python bench/bench_regions.py [--regions 1,5,10,25,50] [--seed 1]
+
+Writes synthetic region configs next to the bundled houston.json: each one
+takes a few NWS zones, a gridpoint and TCEQ counties at random from small
+pools, the way neighbouring metro areas overlap. For every region count it
+plans the shared feeds, runs each feed's fetch once against the stub
+upstream and counts the requests the stub saw, next to what polling every
+region on its own would cost. TCEQ report pages are left out of both
+counts (they are cached per incident either way). Only HGX/75,98 has a
+recorded forecast, so the other gridpoints' feeds fail; their request
+still counts.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('STATE_DIR', tempfile.mkdtemp(prefix='bench-state-'))
+
+from stub_server import StubServer  # noqa: E402
+
+ZONES = [f'TXZ{n}' for n in (163, 164, 176, 177, 178, 195, 196, 197, 198, 199, 200, 210, 211, 212, 213, 214,
+                              226, 227, 235, 236, 237, 238, 300, 313, 335, 336, 337, 338)]
+GRIDPOINTS = ['HGX/75,98', 'HGX/65,97', 'HGX/70,90', 'HGX/88,86', 'HGX/58,104', 'HGX/80,76']
+COUNTIES = ['HARRIS', 'CHAMBERS', 'GALVESTON', 'BRAZORIA', 'LIBERTY', 'FORT BEND', 'MONTGOMERY', 'MATAGORDA']
+
+
+def write_regions(directory, count, rng):
+    """houston.json plus count - 1 synthetic neighbours"""
+    bundled = os.path.join(os.path.dirname(__file__), '..', 'regions', 'houston.json')
+    shutil.copy(bundled, os.path.join(directory, 'houston.json'))
+    for i in range(1, count):
+        counties = rng.sample(COUNTIES, 3)
+        config = {
+            "name": f"Region {i}",
+            "wind": {"gridpoint": rng.choice(GRIDPOINTS)},
+            "weather_alert_zones": rng.sample(ZONES, rng.randint(2, 5)),
+            "tceq": {"counties": counties[:1], "area_counties": counties},
+            "facilities": {},
+        }
+        with open(os.path.join(directory, f'region{i:03d}.json'), 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+
+
+def upstream_calls(region):
+    """Requests one refresh of a region would make if it were polled alone"""
+    calls = len(region.alert_zones) + len(region.tceq_searches)
+    return calls + sum(1 for kind in ('wind', 'caer', 'dispatch') if getattr(region, kind))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--regions', default='1,5,10,25,50')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stub = StubServer()
+    os.environ['UPSTREAM_STUB_URL'] = stub.start()
+    import regions
+    import upstream
+    from reports import report_cache
+
+    print(f"{'regions':>8} {'feeds':>6} {'per region':>11} {'shared':>7} {'failed':>7}")
+    for count in [int(n) for n in args.regions.split(',')]:
+        directory = tempfile.mkdtemp(prefix='bench-regions-')
+        write_regions(directory, count, random.Random(args.seed))
+        loaded = regions.load(directory, enabled=[], default='houston')
+        feeds = regions.plan(loaded)
+
+        stub.hits.clear()
+        upstream._validators.clear()
+        # Every round starts with no reports cached, like a first refresh
+        report_cache.reports.clear()
+        failed = 0
+        for feed in feeds.values():
+            try:
+                feed.pipeline()()
+            except Exception:
+                failed += 1
+        shared = sum(n for key, n in stub.hits.items() if 'fuseaction=main.getDetails' not in key)
+        alone = sum(upstream_calls(region) for region in loaded.values())
+        print(f"{count:>8} {len(feeds):>6} {alone:>11} {shared:>7} {failed:>7}")
+        shutil.rmtree(directory)
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Push a recorded upstream archive through the pipeline as fast as possible.
+
+Usage:
+    python bench/bench_replay.py archive.gz [--repeat N]
+
+Every recorded response goes through the same parser as live traffic, then
+the dispatch delta feed and change detection, in recorded order. Reports
+time per stage and the events the night would have pushed. For a paced
+replay through the running API use UPSTREAM_REPLAY_PATH and REPLAY_SPEED.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('STATE_DIR', tempfile.mkdtemp(prefix='bench-state-'))
+
+import sources  # noqa: E402
+from delta import DeltaFeed  # noqa: E402
+from events import detect_changes  # noqa: E402
+from recorder import make_response, read_archive  # noqa: E402
+
+
+def source_for(url):
+    if 'Combined.aspx' in url:
+        return 'dispatch'
+    if 'caermessagelive' in url:
+        return 'caer'
+    if 'tceq.texas.gov' in url:
+        return 'tceq-report' if 'getDetails' in url else 'tceq-emissions'
+    if '/forecast/hourly' in url:
+        return 'wind'
+    if '/alerts/active' in url:
+        return 'weather-alerts'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('archive')
+    parser.add_argument('--repeat', type=int, default=1, help='Replay the archive this many times')
+    args = parser.parse_args()
+
+    records = list(read_archive(args.archive))
+    if not records:
+        sys.exit(f"{args.archive} holds no recordings")
+
+    feed = DeltaFeed()
+    payloads = {}
+    zone_features = {}
+    reports = {}
+    stage_seconds = defaultdict(float)
+    responses = Counter()
+    events = Counter()
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for t, url, status, headers, body in records:
+            name = source_for(url)
+            if name is None or status != 200:
+                continue
+            responses[name] += 1
+            r = make_response(url, status, headers, body)
+
+            start = time.perf_counter()
+            if name == 'dispatch':
+                payload = sources.parse_dispatch(r.content)
+            elif name == 'caer':
+                payload = sources.parse_caer(r.text)
+            elif name == 'tceq-emissions':
+                payload = sources.parse_tceq_emissions(r.text, reports)
+            elif name == 'tceq-report':
+                payload = reports[r.url.rsplit('=', 1)[1]] = sources.parse_tceq_report(r.text)
+            elif name == 'wind':
+                payload = sources.parse_wind(r.json())
+            else:
+                zone_features[url] = r.json().get('features', [])
+                payload = sources.parse_weather_alerts(list(zone_features.values()),
+                                                       [u.rsplit('=', 1)[1] for u in zone_features])
+            stage_seconds[f'{name} parse'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            if name == 'dispatch':
+                priority = {inc['id'] for inc in payload['incidents']}
+                payload['cursor'] = feed.update({
+                    inc['id']: {**inc, 'priority': inc['id'] in priority}
+                    for inc in payload['all_incidents']
+                })
+            stage_seconds['delta feed'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for type, data in detect_changes(name, payloads.get(name), payload, feed):
+                events[type] += 1
+                json.dumps(data)
+            stage_seconds['change detection'] += time.perf_counter() - start
+            payloads[name] = payload
+    elapsed = time.perf_counter() - started
+
+    span = records[-1][0] - records[0][0]
+    total = sum(responses.values())
+    print(f"{len(records)} records covering {span / 3600:.1f} h, replayed {args.repeat}x "
+          f"in {elapsed:.2f} s ({total / elapsed:.0f} responses/s)")
+    print("\nresponses:")
+    for name, count in responses.most_common():
+        print(f"  {count:>7}  {name}")
+    print("\nstage time:")
+    for stage, seconds in sorted(stage_seconds.items(), key=lambda kv: -kv[1]):
+        print(f"  {seconds * 1000:>9.1f} ms  {stage}")
+    print("\nevents pushed:")
+    for type, count in events.most_common():
+        print(f"  {count:>7}  {type}")
+
+
+if __name__ == '__main__':
+    main()
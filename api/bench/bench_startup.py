@@ -0,0 +1,121 @@
+"""Cold start of the API: time to first /api/health response and idle RSS.
+
+Usage:
+    python bench/bench_startup.py [--runs 5] [--warmup 0|1] [--background 0|1]
+                                  [--idle 2] [--first /api/dispatch]
+
+Each run starts the API in a fresh interpreter (werkzeug, against the stub
+upstream from bench/stub_server.py) and polls /api/health until it answers.
+Reports time to the first health response, RSS once the process has been
+idle for --idle seconds, and the latency and RSS of the first data request.
+WARMUP and BACKGROUND_REFRESH are passed through to the app.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests  # noqa: E402
+
+from stub_server import StubServer  # noqa: E402
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SERVE = """
+import logging, sys
+from werkzeug.serving import make_server
+import app
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+make_server('127.0.0.1', int(sys.argv[1]), app.app, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_mib(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def loaded(pid, modules):
+    """Which of modules the process has mapped (by shared library or package path)"""
+    with open(f'/proc/{pid}/maps') as f:
+        maps = f.read()
+    return [m for m in modules if f'/{m}/' in maps]
+
+
+def one_run(stub_url, args):
+    state = tempfile.mkdtemp(prefix='bench-state-')
+    env = dict(os.environ, UPSTREAM_STUB_URL=stub_url, STATE_DIR=state,
+               SHARED_DIR=os.path.join(state, 'shared'), WARMUP=args.warmup,
+               BACKGROUND_REFRESH=args.background)
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', SERVE, str(port)], cwd=API_DIR, env=env)
+    try:
+        while True:
+            if proc.poll() is not None:
+                sys.exit(f"API exited with status {proc.returncode}")
+            try:
+                if requests.get(base + '/api/health', timeout=5).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                time.sleep(0.01)
+        first_health = time.perf_counter() - started
+
+        time.sleep(args.idle)
+        idle_rss = rss_mib(proc.pid)
+        libraries = loaded(proc.pid, ['numpy', 'lxml'])
+
+        start = time.perf_counter()
+        requests.get(base + args.first, timeout=60)
+        first_data = time.perf_counter() - start
+        return first_health, idle_rss, libraries, first_data, rss_mib(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--warmup', default='1', choices=['0', '1'], help='WARMUP for the app')
+    parser.add_argument('--background', default='1', choices=['0', '1'], help='BACKGROUND_REFRESH for the app')
+    parser.add_argument('--idle', type=float, default=2.0, help='Seconds to sit idle before reading RSS')
+    parser.add_argument('--first', default='/api/dispatch', help='First data request after idle')
+    parser.add_argument('--latency', type=float, default=0.2, help='Stub upstream latency (s)')
+    args = parser.parse_args()
+
+    stub = StubServer(latency=args.latency, seed=1)
+    stub.start()
+    print(f"WARMUP={args.warmup} BACKGROUND_REFRESH={args.background}, {args.runs} runs\n")
+    print(f"{'run':>3} {'health ms':>10} {'idle MiB':>9} {'first data ms':>14} {'after MiB':>10}  loaded at idle")
+    results = []
+    for run in range(1, args.runs + 1):
+        health, idle, libraries, data, after = one_run(stub.url, args)
+        results.append((health, idle, data, after))
+        print(f"{run:>3} {health * 1000:>10.0f} {idle:>9.1f} {data * 1000:>14.0f} {after:>10.1f}  "
+              f"{', '.join(libraries) or '-'}")
+    stub.stop()
+
+    health, idle, data, after = (statistics.median(column) for column in zip(*results))
+    print(f"\nmedian: first health {health * 1000:.0f} ms, idle RSS {idle:.1f} MiB, "
+          f"first {args.first} {data * 1000:.0f} ms, then RSS {after:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Subscription matching cost, and webhook delivery throughput.
+
+Usage:
+    python bench/bench_subscriptions.py [--subscriptions 1000,10000,50000] [--records 2000]
+                                        [--endpoints 20] [--deliveries 5000] [--rate 20]
+                                        [--latency 0.02] [--fail-rate 0.1]
+
+Matching: random subscriptions (nine in ten geofenced around the metro
+area, the others by keyword; some with sources and severities) are
+indexed, and --records random dispatch incidents and CAER messages are
+matched against them by the index and by testing every subscription in
+turn. Both must agree; the index should grow with the matches, not with
+the subscriptions.
+
+Delivery: --deliveries matches for --endpoints endpoints of the local
+webhook receiver go through the outbox, with --fail-rate of the batches
+failing. Reports deliveries a second, retries, duplicates and the busiest
+second of any endpoint against the --rate limit.
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('STATE_DIR', tempfile.mkdtemp(prefix='bench-state-'))
+os.environ.setdefault('WEBHOOK_RETRY_BASE', '0.2')
+# The receiver listens on loopback
+os.environ.setdefault('WEBHOOK_ALLOW_PRIVATE', '1')
+
+from webhook_receiver import WebhookReceiver  # noqa: E402
+import subscriptions  # noqa: E402
+from classify import SEVERITY_RANK  # noqa: E402
+from spatial import haversine_km  # noqa: E402
+from subscriptions import Notifier, SubscriptionIndex, SubscriptionStore, validate  # noqa: E402
+
+TYPES = ['FIRE', 'HAZMAT', 'SMOKE INVESTIGATION', 'ODOR INVESTIGATION', 'CHEMICAL SPILL', 'FIRE ALARM', 'MVA']
+CAER = ['Flaring is expected during startup.', 'Crews are responding to a small release contained on site.',
+        'Residents near the plant should shelter-in-place until further notice.']
+KEYWORDS = ['hazmat', 'chemical', 'smoke', 'odor', 'shelter', 'shelter-in-place', 'release', 'flaring', 'fire']
+SEVERITIES = ['info', 'warning', 'critical']
+
+
+def random_subscription(rng, i):
+    """Mostly small geofences around the metro area; the rest follow keywords"""
+    data = {"url": f"http://127.0.0.1/hook/{i % 200}"}
+    fenced = rng.random() < 0.9
+    if fenced:
+        data.update(lat=29.45 + rng.random() * 0.6, lon=-95.75 + rng.random() * 0.8,
+                    radius_km=rng.choice([1, 2, 5, 10]))
+    if rng.random() < 0.5:
+        data['sources'] = rng.sample(['dispatch', 'caer', 'weather-alerts', 'tceq-emissions'], rng.randint(1, 2))
+    if rng.random() < 0.5:
+        data['min_severity'] = rng.choice(SEVERITIES)
+    if not fenced or rng.random() < 0.3:
+        data['keywords'] = rng.sample(KEYWORDS, rng.randint(1, 3))
+    return {"id": f"s{i}", **validate(data)}
+
+
+def random_record(rng):
+    """(source, severity, lat, lon, text) as the notifier matches them"""
+    if rng.random() < 0.8:
+        return ('dispatch', rng.choice(SEVERITIES), 29.45 + rng.random() * 0.6, -95.75 + rng.random() * 0.8,
+                f"{rng.choice(TYPES)} {rng.randint(1, 9999)} MAIN ST")
+    return 'caer', rng.choice(SEVERITIES), None, None, rng.choice(CAER)
+
+
+def matches_linear(subscriptions, source, severity, lat, lon, text, regions=()):
+    """Reference matcher: every subscription tested in turn"""
+    lowered = (text or '').lower()
+    matched = []
+    for sub in subscriptions:
+        if sub['sources'] and source not in sub['sources']:
+            continue
+        if sub.get('regions') and not set(sub['regions']).intersection(regions):
+            continue
+        if SEVERITY_RANK.get(severity or 'info', 0) < SEVERITY_RANK[sub['min_severity'] or 'info']:
+            continue
+        if sub['keywords'] and not any(re.search(r'\b' + re.escape(k.lower()), lowered) for k in sub['keywords']):
+            continue
+        if sub['radius_km'] is not None and (
+                lat is None or lon is None or haversine_km(sub['lat'], sub['lon'], lat, lon) > sub['radius_km']):
+            continue
+        matched.append(sub['id'])
+    return matched
+
+
+def bench_matching(counts, records):
+    rng = random.Random(1)
+    sample = [random_record(rng) for _ in range(records)]
+    print(f"{'subscriptions':>14} {'build ms':>9} {'index us':>9} {'linear us':>10} {'matches':>8}")
+    for count in counts:
+        subs = [random_subscription(rng, i) for i in range(count)]
+        started = time.perf_counter()
+        index = SubscriptionIndex(subs)
+        index.keywords.pattern
+        build = time.perf_counter() - started
+
+        indexed, matched = [], 0
+        for record in sample:
+            started = time.perf_counter()
+            ids = index.match(*record)
+            indexed.append(time.perf_counter() - started)
+            matched += len(ids)
+        # The linear scan is slow; time a slice of the records
+        linear = []
+        for record in sample[:max(20, records * 1000 // count)]:
+            started = time.perf_counter()
+            expected = matches_linear(subs, *record)
+            linear.append(time.perf_counter() - started)
+            if sorted(expected) != sorted(index.match(*record)):
+                raise SystemExit(f"Index and linear scan disagree on {record}")
+        print(f"{count:>14} {build * 1000:>9.1f} {statistics.mean(indexed) * 1e6:>9.1f} "
+              f"{statistics.mean(linear) * 1e6:>10.1f} {matched / records:>8.1f}")
+
+
+def bench_delivery(args):
+    # Failed batches are expected here
+    logging.getLogger('subscriptions').setLevel(logging.ERROR)
+    receiver = WebhookReceiver(latency=args.latency, fail_rate=args.fail_rate, seed=1)
+    url = receiver.start()
+    store = SubscriptionStore(os.path.join(tempfile.mkdtemp(prefix='bench-outbox-'), 'subscriptions.sqlite3'))
+    notifier = Notifier(store, rate=args.rate, burst=args.rate)
+    rows = [(f"s{i % (args.endpoints * 5)}", f"{url}/hook/{i % args.endpoints}", 'dispatch', f"inc{i}",
+             '{"source": "dispatch", "key": "inc%d"}' % i) for i in range(args.deliveries)]
+
+    started = time.perf_counter()
+    store.enqueue(rows)
+    notifier.start()
+    while receiver.delivered < args.deliveries:
+        pending = store.stats()[0].get('pending', {}).get('count', 0)
+        if not pending and receiver.delivered < args.deliveries:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    receiver.stop()
+
+    busiest = 0
+    for times in receiver.arrivals.values():
+        j = 0
+        for i, t in enumerate(times):
+            while times[j] < t - 1:
+                j += 1
+            busiest = max(busiest, i - j + 1)
+    statuses = {status: s['count'] for status, s in store.stats()[0].items()}
+    print(f"\n{args.deliveries} deliveries to {args.endpoints} endpoints, batches of {subscriptions.WEBHOOK_BATCH}, "
+          f"{args.rate:g} batches/s per endpoint, {args.fail_rate:.0%} of batches failing\n")
+    print(f"  {receiver.delivered} delivered in {elapsed:.2f}s ({receiver.delivered / elapsed:.0f}/s)")
+    print(f"  {sum(receiver.batches.values())} batches accepted, {sum(receiver.failed.values())} failed and retried")
+    print(f"  {receiver.duplicates} duplicates, outbox {statuses}")
+    print(f"  busiest second of one endpoint: {busiest} batches (limit {args.rate:g}, burst {args.rate:g})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscriptions', default='1000,10000,50000')
+    parser.add_argument('--records', type=int, default=2000)
+    parser.add_argument('--endpoints', type=int, default=20)
+    parser.add_argument('--deliveries', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=20, help='Batches per second per endpoint')
+    parser.add_argument('--latency', type=float, default=0.02, help='Receiver seconds per batch')
+    parser.add_argument('--fail-rate', type=float, default=0.1, help='Fraction of batches that fail')
+    args = parser.parse_args()
+
+    bench_matching([int(n) for n in args.subscriptions.split(',')], args.records)
+    bench_delivery(args)
+
+
+if __name__ == '__main__':
+    main()
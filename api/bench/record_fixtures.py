@@ -0,0 +1,49 @@
+"""Re-record the upstream fixtures from the live sites.
+
+Usage:
+    python bench/record_fixtures.py [key-substring ...]
+
+Fetches every URL in bench/fixtures/manifest.json (or only those whose key
+contains one of the given substrings) and overwrites its fixture file. Keys
+ending in * are recorded from the URL with the entry's "example" appended.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import upstream  # noqa: E402
+from stub_server import FIXTURES_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('only', nargs='*', help='Only record keys containing these substrings')
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    failed = 0
+    for key, spec in manifest.items():
+        if args.only and not any(s in key for s in args.only):
+            continue
+        url = f"https://{key[:-1]}{spec['example']}" if key.endswith('*') else f"https://{key}"
+        headers = {'Accept': 'application/geo+json'} if spec['content_type'] == 'application/geo+json' else None
+        try:
+            r = upstream.get(url, headers=headers, read_timeout=30)
+            r.raise_for_status()
+        except Exception as e:
+            print(f"FAILED {key}: {e}")
+            failed += 1
+            continue
+        with open(os.path.join(FIXTURES_DIR, spec['file']), 'wb') as f:
+            f.write(r.content)
+        print(f"{len(r.content):>9} bytes  {spec['file']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Local HTTP server that replays the recorded upstream fixtures.
+
+Point the API at it with UPSTREAM_STUB_URL=http://127.0.0.1:<port>; every
+upstream request then arrives as /<host>/<path>?<query> and is answered from
+bench/fixtures/manifest.json: exact query first, then the longest key ending
+in * that prefixes it (one fixture for every TCEQ report), then the path alone.
+
+Usage:
+    python bench/stub_server.py [--port 8765] [--latency 0.2] [--jitter 0.1]
+                                [--fail-rate 0.1] [--fail-status 503] [--no-etag]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """{"host/path?query": (content_type, body bytes)} from the manifest"""
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    fixtures = {}
+    for key, spec in manifest.items():
+        with open(os.path.join(directory, spec['file']), 'rb') as f:
+            fixtures[key] = (spec['content_type'], f.read())
+    return fixtures
+
+
+class StubServer:
+    """Threaded fixture server with injectable latency and failures"""
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, fail_rate=0.0, fail_status=503,
+                 seed=None, fixtures_dir=FIXTURES_DIR, etag=True):
+        self.fixtures = load_fixtures(fixtures_dir)
+        self.prefixes = sorted(((key[:-1], value) for key, value in self.fixtures.items() if key.endswith('*')),
+                               key=lambda kv: -len(kv[0]))
+        self.by_path = {key.split('?', 1)[0]: value for key, value in self.fixtures.items() if not key.endswith('*')}
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        # Send ETags and answer If-None-Match with 304, like a cache-friendly host
+        self.etag = etag
+        self.random = random.Random(seed)
+        # Requests served per fixture key, to check upstream load stays flat
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def lookup(self, key):
+        """(content_type, body) for a /<host>/<path>?<query> key, or None"""
+        if key in self.fixtures:
+            return self.fixtures[key]
+        for prefix, value in self.prefixes:
+            if key.startswith(prefix):
+                return value
+        return self.by_path.get(key.split('?', 1)[0])
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                key = self.path.lstrip('/')
+                with stub._lock:
+                    stub.hits[key] += 1
+                    delay = stub.latency + stub.random.uniform(0, stub.jitter)
+                    fail = stub.random.random() < stub.fail_rate
+                if delay:
+                    time.sleep(delay)
+
+                fixture = stub.lookup(key)
+                if fail or fixture is None:
+                    status = stub.fail_status if fail else 404
+                    body = f"stub: {status} for {key}".encode('utf-8')
+                    content_type = 'text/plain'
+                else:
+                    status = 200
+                    content_type, body = fixture
+                tag = f'"{hashlib.sha1(body).hexdigest()[:16]}"' if status == 200 and stub.etag else None
+                if tag and self.headers.get('If-None-Match') == tag:
+                    status, body = 304, b''
+                self.send_response(status)
+                if tag:
+                    self.send_header('ETag', tag)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra random seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--fail-status', type=int, default=503)
+    parser.add_argument('--no-etag', action='store_true', help="Don't send ETags or answer 304")
+    args = parser.parse_args()
+
+    stub = StubServer(args.port, args.latency, args.jitter, args.fail_rate, args.fail_status, etag=not args.no_etag)
+    print(f"Serving {len(stub.fixtures)} fixtures on {stub.url}")
+    print(f"Run the API with UPSTREAM_STUB_URL={stub.url}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Local webhook endpoint that counts the batches it receives.
+
+Every POST to /<anything> is one endpoint's batch: {"deliveries": [...]}.
+It is answered 200 after --latency (+ --jitter) seconds, or --fail-status for
+a --fail-rate fraction of batches. Per path it records batches, deliveries,
+duplicate delivery ids and arrival times, to check delivery throughput and
+the per-endpoint rate limit.
+
+Usage:
+    python bench/webhook_receiver.py [--port 8766] [--latency 0.05] [--jitter 0.0]
+                                     [--fail-rate 0.1] [--fail-status 503]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WebhookReceiver:
+    """Threaded webhook sink with injectable latency and failures"""
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, fail_rate=0.0, fail_status=503, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.random = random.Random(seed)
+        self.batches = Counter()
+        self.failed = Counter()
+        self.deliveries = Counter()
+        self.duplicates = 0
+        # path -> monotonic arrival time of every accepted batch
+        self.arrivals = defaultdict(list)
+        self._ids = set()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def delivered(self):
+        return sum(self.deliveries.values())
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with receiver._lock:
+                    delay = receiver.latency + receiver.random.uniform(0, receiver.jitter)
+                    fail = receiver.random.random() < receiver.fail_rate
+                if delay:
+                    time.sleep(delay)
+
+                if fail:
+                    status = receiver.fail_status
+                    with receiver._lock:
+                        receiver.failed[self.path] += 1
+                else:
+                    status = 200
+                    deliveries = json.loads(body)['deliveries']
+                    with receiver._lock:
+                        receiver.batches[self.path] += 1
+                        receiver.arrivals[self.path].append(time.monotonic())
+                        receiver.deliveries[self.path] += len(deliveries)
+                        for delivery in deliveries:
+                            key = (delivery['subscription'], delivery['source'], delivery['key'])
+                            if key in receiver._ids:
+                                receiver.duplicates += 1
+                            receiver._ids.add(key)
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='webhook-receiver', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra random seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of batches that fail')
+    parser.add_argument('--fail-status', type=int, default=503)
+    args = parser.parse_args()
+
+    receiver = WebhookReceiver(args.port, args.latency, args.jitter, args.fail_rate, args.fail_status)
+    print(f"Receiving webhooks on {receiver.url}/<endpoint>")
+    try:
+        receiver.start()
+        while True:
+            time.sleep(10)
+            print(f"{sum(receiver.batches.values())} batches, {receiver.delivered} deliveries, "
+                  f"{sum(receiver.failed.values())} failed, {receiver.duplicates} duplicates")
+    except KeyboardInterrupt:
+        receiver.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Per-source circuit breaker.
+
+The breaker looks at the last BREAKER_WINDOW fetches of a source. Once at
+least BREAKER_MIN_CALLS have been made and BREAKER_FAILURE_RATE of them
+failed or took longer than the source's slow threshold, it opens and fetches are
+skipped for BREAKER_OPEN_SECONDS. After that one probe is let through
+(half-open): success closes the breaker, failure opens it again.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', 10))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 3))
+BREAKER_FAILURE_RATE = float(os.environ.get('BREAKER_FAILURE_RATE', 0.5))
+# Slow threshold for every source, overriding the ones derived from their timeouts
+BREAKER_SLOW_SECONDS = float(os.environ.get('BREAKER_SLOW_SECONDS', 0)) or None
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 60))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Latency samples kept for the percentiles
+LATENCY_SAMPLES = 100
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values, or None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class CircuitBreaker:
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 failure_rate=BREAKER_FAILURE_RATE, slow_seconds=BREAKER_SLOW_SECONDS,
+                 open_seconds=BREAKER_OPEN_SECONDS):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = None
+        # True for each failed or slow call in the window
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.last_success = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def ready(self):
+        """True if allow() could let a fetch through, without claiming the probe"""
+        state = self.state
+        if state == OPEN:
+            return time.time() - self.opened_at >= self.open_seconds
+        return state == CLOSED or not self.probing
+
+    def allow(self):
+        """True if a fetch may go ahead now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, ok, elapsed):
+        """Account for one finished fetch"""
+        with self._lock:
+            self.latencies.append(elapsed)
+            bad = not ok or (self.slow_seconds is not None and elapsed > self.slow_seconds)
+            if ok:
+                self.last_success = time.time()
+
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if bad:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                return
+
+            self.outcomes.append(bad)
+            if len(self.outcomes) >= self.min_calls and \
+                    sum(self.outcomes) / len(self.outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+
+    def is_open(self):
+        return self.state != CLOSED
+
+    def status(self):
+        """State, error rate and latency summary for /api/health"""
+        with self._lock:
+            latencies = list(self.latencies)
+            outcomes = list(self.outcomes)
+            return {
+                "state": self.state,
+                "opened_at": self.opened_at if self.state != CLOSED else None,
+                "failure_rate": round(sum(outcomes) / len(outcomes), 3) if outcomes else 0.0,
+                "last_success": self.last_success,
+                "p50_ms": None if not latencies else round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": None if not latencies else round(percentile(latencies, 95) * 1000, 1),
+            }
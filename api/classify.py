@@ -0,0 +1,190 @@
+"""Keyword classification shared by every source.
+
+Each rule table compiles into one case-insensitive regex, so a record is
+scanned once no matter how many terms there are. Rules are
+(term, severity, mode) where mode is:
+
+    'substring' - match anywhere ("leak" matches "leaking")
+    'prefix'    - match at the start of a word ("EXXON" matches "EXXONMOBIL")
+    'word'      - match a whole word only ("PLANT" does not match "PLANTATION")
+
+Small tables of substring terms skip the regex: a few str `in` checks run
+at C speed and find the same terms, unless two found terms could overlap.
+"""
+import re
+from itertools import combinations
+
+SEVERITY_RANK = {'info': 0, 'warning': 1, 'critical': 2}
+
+# Past this many terms one regex pass beats a scan per term
+SCAN_MAX_TERMS = 16
+
+_BOUNDARIES = {
+    'substring': ('', ''),
+    'prefix': (r'\b', ''),
+    'word': (r'\b', r'\b'),
+}
+
+
+def _word(ch):
+    return ch.isalnum() or ch == '_'
+
+
+def _overlap(a, b):
+    """Whether a and b can share characters somewhere in a text"""
+    if a in b or b in a:
+        return True
+    return any(a.endswith(b[:n]) or b.endswith(a[:n]) for n in range(1, min(len(a), len(b))))
+
+
+def _trie_pattern(terms):
+    """Regex for [(term, end_boundary)] shaped as a character trie.
+
+    Python's re tries alternatives one by one, so a flat "a|b|c" costs one
+    attempt per term at every position. Sharing prefixes means each position
+    only explores the branch for its next character.
+    """
+    trie = {}
+    for term, after in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = after
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    end = node.get('')
+    branches = [re.escape(ch) + _node_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return end
+    alternation = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if end is None:
+        return alternation
+    # Prefer the longer term ("plants") before ending here ("plant")
+    return '(?:' + alternation + '|' + end + ')'
+
+
+class Classifier:
+    def __init__(self, rules, default='info'):
+        self.default = default
+        # lowercased term -> (term as written, severity)
+        self.rules = {term.lower(): (term, severity) for term, severity, _ in rules}
+        self.modes = [(term, mode) for term, _, mode in rules]
+        self._scan = None
+        if len(self.rules) <= SCAN_MAX_TERMS and all(mode == 'substring' for _, mode in self.modes):
+            self._scan = list(self.rules)
+            self._clashes = {(a, b) for a, b in combinations(self._scan, 2) if _overlap(a, b)}
+        self._pattern = None
+        self._overlapping = None
+
+    @property
+    def pattern(self):
+        # Compiled on first use so importing the rule sets stays cheap at startup
+        if self._pattern is None:
+            # Terms that must start on a word boundary share one leading \b
+            groups = {}
+            for term, mode in self.modes:
+                before, after = _BOUNDARIES[mode]
+                groups.setdefault(before, []).append((term.lower(), after))
+            alternatives = [before + _trie_pattern(terms) for before, terms in groups.items()]
+            self._pattern = re.compile('|'.join(alternatives))
+        return self._pattern
+
+    def _found(self, text):
+        """Lowercased matched terms in order of appearance, repeats included"""
+        lowered = text.lower()
+        if self._scan is None:
+            return self.pattern.findall(lowered)
+        found = [term for term in self._scan if term in lowered]
+        if len(found) > 1:
+            if self._clashes and any(pair in self._clashes for pair in combinations(found, 2)):
+                # The regex skips a term that overlaps an earlier match
+                return self.pattern.findall(lowered)
+            found.sort(key=lowered.find)
+        return found
+
+    def matches(self, text):
+        """Matched terms in text, in order of first appearance"""
+        terms = []
+        for found in self._found(text):
+            term = self.rules[found][0]
+            if term not in terms:
+                terms.append(term)
+        return terms
+
+    def matches_all(self, text):
+        """Like matches(), but also terms overlapping or inside a longer match"""
+        if self._overlapping is None:
+            self._overlapping = re.compile('(?=(' + self.pattern.pattern + '))')
+            self._ends = {term.lower(): _BOUNDARIES[mode][1] for term, mode in self.modes}
+        found = {}
+        for match in self._overlapping.findall(text.lower()):
+            # The regex keeps the longest term at each position; shorter ones it passed over still count
+            for end in range(1, len(match) + 1):
+                after = self._ends.get(match[:end])
+                if after is None or (after and end < len(match) and _word(match[end - 1]) == _word(match[end])):
+                    continue
+                found.setdefault(self.rules[match[:end]][0], None)
+        return list(found)
+
+    def classify(self, text):
+        """(severity, matched_terms) for text"""
+        severity = self.default
+        terms = []
+        for found in self._found(text):
+            term, candidate = self.rules[found]
+            if term not in terms:
+                terms.append(term)
+                if SEVERITY_RANK[candidate] > SEVERITY_RANK[severity]:
+                    severity = candidate
+        return severity, terms
+
+
+CAER = Classifier([
+    ('explosion', 'critical', 'substring'),
+    ('shelter', 'critical', 'substring'),
+    ('evacuate', 'critical', 'substring'),
+    ('emergency', 'critical', 'substring'),
+    ('flare', 'warning', 'substring'),
+    ('release', 'warning', 'substring'),
+    ('incident', 'warning', 'substring'),
+    ('leak', 'warning', 'substring'),
+])
+
+# Any match makes a dispatch incident high priority
+DISPATCH = Classifier([
+    # Areas near the ship channel plants
+    ('SHELDON', 'info', 'prefix'),
+    ('BAYWAY', 'info', 'prefix'),
+    ('DECKER', 'info', 'prefix'),
+    ('CHANNELVIEW', 'info', 'prefix'),
+    ('PASADENA', 'info', 'prefix'),
+    ('LYONDELL', 'info', 'prefix'),
+    ('EXXON', 'info', 'prefix'),
+    # Industrial hazards
+    ('HAZMAT', 'critical', 'prefix'),
+    ('EXPLOSION', 'critical', 'prefix'),
+    ('CHEMICAL', 'critical', 'prefix'),
+    ('REFINERY', 'critical', 'word'),
+    ('INDUSTRIAL', 'critical', 'word'),
+    ('PLANT', 'critical', 'word'),
+    ('PLANTS', 'critical', 'word'),
+    ('LEAK', 'critical', 'prefix'),
+    # Other notable calls
+    ('FIRE', 'warning', 'prefix'),
+    ('SMOKE', 'warning', 'prefix'),
+    ('ODOR', 'warning', 'prefix'),
+    ('APARTMENT', 'warning', 'prefix'),
+    ('HOUSE', 'warning', 'word'),
+    ('ALARM', 'warning', 'prefix'),
+    ('CRASH', 'warning', 'prefix'),
+    ('MAJOR', 'warning', 'word'),
+])
+
+TCEQ = Classifier([
+    ('explosion', 'critical', 'substring'),
+    ('fire', 'critical', 'word'),
+    ('evacuate', 'critical', 'substring'),
+    ('shelter', 'critical', 'substring'),
+], default='warning')
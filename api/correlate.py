@@ -0,0 +1,337 @@
+"""Cross-source correlation of dispatch calls, CAER messages, TCEQ reports and NWS alerts.
+
+One real incident (a Channelview flare, say) tends to show up as a dispatch
+call, a CAER message and later a TCEQ report. Records are clustered when
+they fall within CORRELATE_WINDOW of each other, are within
+CORRELATE_RADIUS_KM (or name the same facility) and describe the same kind
+of hazard. NWS alerts cover the whole area, so for
+them place is not checked; each region gets a Correlator of its own, fed
+only the alerts of its zones.
+
+The engine is incremental: each refresh only looks at records it has not
+seen, and only matches them against open clusters found through a grid,
+facility and hazard index. A cluster closes once the newest event time seen
+has moved CORRELATE_WINDOW + CORRELATE_LATENESS past it, so the work per
+refresh grows with the number of new records, not with history.
+"""
+import heapq
+import itertools
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from classify import SEVERITY_RANK, Classifier
+from history import records_for
+from spatial import haversine_km
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    LOCAL_TZ = ZoneInfo(os.environ.get('LOCAL_TIMEZONE', 'America/Chicago'))
+except (ImportError, ZoneInfoNotFoundError):
+    # No tz database in the image: Houston standard time
+    LOCAL_TZ = timezone(timedelta(hours=-6))
+
+# Seconds between two events for them to be considered the same incident
+CORRELATE_WINDOW = float(os.environ.get('CORRELATE_WINDOW', 3 * 3600))
+# Extra seconds a cluster stays open for late reports (TCEQ files days later)
+CORRELATE_LATENESS = float(os.environ.get('CORRELATE_LATENESS', 24 * 3600))
+CORRELATE_RADIUS_KM = float(os.environ.get('CORRELATE_RADIUS_KM', 5))
+# Closed clusters kept for /api/correlated
+CORRELATE_KEEP_CLOSED = int(os.environ.get('CORRELATE_KEEP_CLOSED', 200))
+
+# Hazard terms, by the kind of incident they point to
+HAZARDS = Classifier([
+    ('fire', 'info', 'word'),
+    ('flare', 'info', 'prefix'),
+    ('flaring', 'info', 'word'),
+    ('smoke', 'info', 'prefix'),
+    ('explosion', 'info', 'prefix'),
+    ('blast', 'info', 'word'),
+    ('release', 'info', 'prefix'),
+    ('leak', 'info', 'prefix'),
+    ('vapor', 'info', 'prefix'),
+    ('odor', 'info', 'prefix'),
+    ('hazmat', 'info', 'word'),
+    ('chemical', 'info', 'prefix'),
+    ('emission', 'info', 'prefix'),
+    ('shelter', 'info', 'prefix'),
+    ('evacuat', 'info', 'prefix'),
+    ('air quality', 'info', 'substring'),
+])
+HAZARD_KINDS = {
+    'fire': 'fire', 'flare': 'fire', 'flaring': 'fire', 'smoke': 'fire', 'explosion': 'fire', 'blast': 'fire',
+    'release': 'release', 'leak': 'release', 'vapor': 'release', 'odor': 'release', 'hazmat': 'release',
+    'chemical': 'release', 'emission': 'release', 'air quality': 'release',
+    'shelter': 'protective action', 'evacuat': 'protective action',
+}
+
+LOCAL_TIME_RE = re.compile(r'(\d{1,2}/\d{1,2}/\d{4}) (\d{1,2}:\d{2}(?::\d{2})?) ?([AP]M)?', re.IGNORECASE)
+
+
+def parse_local_time(text):
+    """Unix time of the first "MM/DD/YYYY HH:MM[:SS][ AM]" in text (Houston time), or None"""
+    m = LOCAL_TIME_RE.search(text or '')
+    if not m:
+        return None
+    date, clock, meridiem = m.groups()
+    seconds = ':%S' if clock.count(':') == 2 else ''
+    try:
+        if meridiem:
+            parsed = datetime.strptime(f"{date} {clock} {meridiem.upper()}", f'%m/%d/%Y %I:%M{seconds} %p')
+        else:
+            parsed = datetime.strptime(f"{date} {clock}", f'%m/%d/%Y %H:%M{seconds}')
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=LOCAL_TZ).timestamp()
+
+
+def event_time(name, record):
+    """When a source record's event happened, or None if it doesn't say"""
+    if name == 'dispatch':
+        return parse_local_time(record.get('Call Time'))
+    if name == 'caer':
+        return parse_local_time(record.get('title'))
+    if name == 'tceq-emissions':
+        return parse_local_time(record.get('date'))
+    if name == 'weather-alerts':
+        try:
+            return datetime.fromisoformat(record.get('effective', '')).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def record_text(name, record):
+    if name == 'dispatch':
+        return ' '.join([record['Incident Type'], record['Address'], record['Cross Street']])
+    if name == 'caer':
+        return ' '.join([record['title'], record['body']])
+    if name == 'tceq-emissions':
+        return ' '.join([record['facility'], record.get('type', ''), record.get('description', '')])
+    if name == 'weather-alerts':
+        return ' '.join([record['event'], record['headline']])
+    return ''
+
+
+class Cluster:
+    """Records believed to describe one incident"""
+
+    __slots__ = ('id', 'records', 'first', 'last', 'anchor', 'points', 'cells', 'places', 'facilities', 'hazards',
+                 'severity')
+
+    def __init__(self, id):
+        self.id = id
+        self.records = []
+        self.first = self.last = None
+        # Location of the first located record; distances are measured from it
+        self.anchor = None
+        self.points = []
+        self.cells = set()
+        self.places = set()
+        self.facilities = set()
+        self.hazards = set()
+        self.severity = 'info'
+
+    def to_dict(self, status):
+        sources = sorted({r['source'] for r in self.records})
+        lat = lon = None
+        if self.points:
+            lat = round(sum(p[0] for p in self.points) / len(self.points), 5)
+            lon = round(sum(p[1] for p in self.points) / len(self.points), 5)
+        return {
+            "id": self.id,
+            "status": status,
+            "first_event": datetime.utcfromtimestamp(self.first).isoformat(),
+            "last_event": datetime.utcfromtimestamp(self.last).isoformat(),
+            "sources": sources,
+            "severity": self.severity,
+            "hazards": sorted(self.hazards),
+            "places": sorted(self.places),
+            "lat": lat,
+            "lon": lon,
+            "records": self.records,
+        }
+
+
+class Correlator:
+    """Clusters the records of one region, whose facilities and communities a record may name"""
+
+    def __init__(self, facilities, residential_areas, window=CORRELATE_WINDOW, lateness=CORRELATE_LATENESS,
+                 radius_km=CORRELATE_RADIUS_KM, keep_closed=CORRELATE_KEEP_CLOSED):
+        self.facilities = facilities
+        # Communities and facilities a record can name instead of carrying coordinates
+        self.places = {**residential_areas, **facilities}
+        self.place_names = Classifier([(name, 'info', 'word') for name in self.places])
+        self.window = window
+        self.lateness = lateness
+        self.radius_km = radius_km
+        self.cell_deg = radius_km / 111.0
+        self.open = {}
+        self.closed = deque(maxlen=keep_closed)
+        # Indexes over open clusters only
+        self.by_cell = {}
+        self.by_facility = {}
+        self.by_hazard = {}
+        # (close at, cluster id) for every open cluster; stale rows are skipped
+        self.expiry = []
+        # (source, key) of every record already considered, and a heap of them by event time
+        self.seen = set()
+        self.seen_by_time = []
+        # Newest event time seen; drives closing, so replays close like live runs
+        self.watermark = 0.0
+        self.version = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _near_cells(self, lat, lon):
+        row, col = self._cell(lat, lon)
+        # Cells are a radius tall; at this latitude they are narrower than that, so look two wide
+        return [(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-2, -1, 0, 1, 2)]
+
+    def update(self, name, payload, now=None):
+        """Correlate the records of payload not seen before; True if any cluster changed"""
+        now = now or time.time()
+        changed = False
+        with self._lock:
+            for key, severity, lat, lon, title, record in records_for(name, payload):
+                if (name, key) in self.seen:
+                    continue
+                if name == 'tceq-emissions' and record.get('report') is None:
+                    # Wait for the report: its cause says what happened
+                    continue
+                t = event_time(name, record) or now
+                self.seen.add((name, key))
+                heapq.heappush(self.seen_by_time, (t, name, key))
+                if t < self.watermark - self.window - self.lateness:
+                    continue
+                text = record_text(name, record)
+                hazards = {HAZARD_KINDS[term] for term in HAZARDS.matches(text)}
+                if not hazards:
+                    continue
+                places = set(self.place_names.matches(text)) if name != 'weather-alerts' else set()
+                facilities = {p for p in places if p in self.facilities}
+                if lat is None and places:
+                    # A named facility is more precise than a community
+                    place = self.places[sorted(facilities or places)[0]]
+                    lat, lon = place['lat'], place['lon']
+                if lat is None and name != 'weather-alerts':
+                    # Nowhere to put it; only area-wide alerts may lack a place
+                    continue
+                entry = {
+                    "source": name, "key": key, "title": title, "severity": severity,
+                    "time": datetime.utcfromtimestamp(t).isoformat(), "lat": lat, "lon": lon,
+                }
+                self._add(name, entry, t, lat, lon, places, facilities, hazards)
+                self.watermark = max(self.watermark, t)
+                changed = True
+            changed = self._close() or changed
+            if changed:
+                self.version += 1
+        return changed
+
+    def _match(self, name, t, lat, lon, facilities, hazards):
+        """Best open cluster for the record, or None.
+
+        Clusters are compared by their anchor (first location) and whole time
+        span, not by their nearest member, so they can't creep across the map
+        or the day one record at a time.
+        """
+        ids = set()
+        for hazard in hazards:
+            ids |= self.by_hazard.get(hazard, set())
+        if name != 'weather-alerts':
+            # Located records only reach clusters near them, at the same facility, or area-wide ones
+            near = set()
+            for cell in self._near_cells(lat, lon):
+                near |= self.by_cell.get(cell, set())
+            for facility in facilities:
+                near |= self.by_facility.get(facility, set())
+            ids = {i for i in ids if i in near or self.open[i].anchor is None}
+
+        best = None
+        for i in ids:
+            cluster = self.open[i]
+            if t < cluster.last - self.window or t > cluster.first + self.window:
+                continue
+            same_facility = bool(facilities & cluster.facilities)
+            distance = 0.0
+            if name != 'weather-alerts' and cluster.anchor is not None and not same_facility:
+                distance = haversine_km(lat, lon, *cluster.anchor)
+                if distance > self.radius_km:
+                    continue
+            rank = (same_facility, -distance, len(cluster.records))
+            if best is None or rank > best[0]:
+                best = (rank, cluster)
+        return best[1] if best else None
+
+    def _add(self, name, entry, t, lat, lon, places, facilities, hazards):
+        cluster = self._match(name, t, lat, lon, facilities, hazards)
+        if cluster is None:
+            cluster = Cluster(next(self._ids))
+            self.open[cluster.id] = cluster
+        cluster.records.append(entry)
+        cluster.first = t if cluster.first is None else min(cluster.first, t)
+        cluster.last = t if cluster.last is None else max(cluster.last, t)
+        if SEVERITY_RANK.get(entry['severity'], 0) > SEVERITY_RANK[cluster.severity]:
+            cluster.severity = entry['severity']
+        if lat is not None:
+            cluster.points.append((lat, lon))
+            if cluster.anchor is None:
+                cluster.anchor = (lat, lon)
+                self._index(self.by_cell, [self._cell(lat, lon)], cluster, cluster.cells)
+        cluster.places |= places
+        self._index(self.by_facility, facilities, cluster, cluster.facilities)
+        self._index(self.by_hazard, hazards, cluster, cluster.hazards)
+        heapq.heappush(self.expiry, (cluster.last + self.window + self.lateness, cluster.id))
+
+    @staticmethod
+    def _index(index, keys, cluster, owned):
+        for key in keys:
+            index.setdefault(key, set()).add(cluster.id)
+            owned.add(key)
+
+    def _unindex(self, cluster):
+        for index, keys in ((self.by_cell, cluster.cells), (self.by_facility, cluster.facilities),
+                            (self.by_hazard, cluster.hazards)):
+            for key in keys:
+                ids = index[key]
+                ids.discard(cluster.id)
+                if not ids:
+                    del index[key]
+
+    def _close(self):
+        """Close clusters the watermark has left behind; True if any closed"""
+        horizon = self.watermark
+        closed = False
+        while self.expiry and self.expiry[0][0] < horizon:
+            close_at, cluster_id = heapq.heappop(self.expiry)
+            cluster = self.open.get(cluster_id)
+            if cluster is None or cluster.last + self.window + self.lateness > close_at:
+                # Already closed, or extended since this row was pushed
+                continue
+            self._unindex(cluster)
+            del self.open[cluster_id]
+            self.closed.append(cluster)
+            closed = True
+        # Records older than anything still open can't be correlated any more
+        cutoff = horizon - self.window - self.lateness
+        # Records arrive out of time order, so the oldest is found by time, not by arrival
+        while self.seen_by_time and self.seen_by_time[0][0] < cutoff:
+            _, name, key = heapq.heappop(self.seen_by_time)
+            self.seen.discard((name, key))
+        return closed
+
+    def export(self):
+        """Every open and recently closed cluster, newest event first"""
+        with self._lock:
+            clusters = [c.to_dict('open') for c in self.open.values()]
+            clusters += [c.to_dict('closed') for c in self.closed]
+        clusters.sort(key=lambda c: c['last_event'], reverse=True)
+        return clusters
@@ -0,0 +1,127 @@
+"""Change tracking for the dispatch board.
+
+Every incident gets a stable id, and each refresh that changes the board bumps
+a sequence number. Clients hold an opaque cursor ("<epoch>-<seq>") and ask
+only for what was added, updated or cleared since then.
+"""
+import hashlib
+import threading
+import time
+
+ID_FIELDS = ['Agency', 'Address', 'Call Time', 'Incident Type']
+
+
+def incident_id(incident):
+    """Stable id for a dispatch incident"""
+    key = '|'.join(str(incident.get(f, '')) for f in ID_FIELDS)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+class DeltaFeed:
+    """Tracks the current set of records and when each one last changed"""
+
+    def __init__(self, max_tombstones=2000):
+        # Cursors from a previous process are meaningless; the epoch lets us
+        # detect them and send a full reset instead
+        self.epoch = format(int(time.time()), 'x')
+        self.seq = 0
+        self.max_tombstones = max_tombstones
+        # id -> [added_seq, changed_seq, record]
+        self.items = {}
+        # id -> (added_seq, cleared_seq), oldest first
+        self.cleared = {}
+        # Oldest cursor we can still answer exactly
+        self.floor = 0
+        self._lock = threading.Lock()
+
+    def cursor(self):
+        return f"{self.epoch}-{self.seq}"
+
+    def export(self):
+        """Plain-JSON copy of the feed state, for other worker processes"""
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "seq": self.seq,
+                "floor": self.floor,
+                "items": self.items,
+                "cleared": self.cleared,
+            }
+
+    @classmethod
+    def restore(cls, state):
+        """Feed continuing from an exported state, with the same cursors"""
+        feed = cls()
+        feed.epoch = state['epoch']
+        feed.seq = state['seq']
+        feed.floor = state['floor']
+        feed.items = state['items']
+        feed.cleared = {rid: tuple(seqs) for rid, seqs in state['cleared'].items()}
+        return feed
+
+    def update(self, records):
+        """Replace the current set with records ({id: record}); returns the new cursor"""
+        with self._lock:
+            seq = self.seq + 1
+            changed = False
+
+            for rid, record in records.items():
+                item = self.items.get(rid)
+                if item is None:
+                    self.cleared.pop(rid, None)
+                    self.items[rid] = [seq, seq, record]
+                    changed = True
+                elif item[2] != record:
+                    item[1] = seq
+                    item[2] = record
+                    changed = True
+
+            for rid in [rid for rid in self.items if rid not in records]:
+                added_seq = self.items.pop(rid)[0]
+                self.cleared[rid] = (added_seq, seq)
+                changed = True
+
+            while len(self.cleared) > self.max_tombstones:
+                oldest = next(iter(self.cleared))
+                self.floor = max(self.floor, self.cleared.pop(oldest)[1])
+
+            if changed:
+                self.seq = seq
+            return self.cursor()
+
+    def since(self, cursor):
+        """Changes after cursor, or a full reset if it cannot be answered exactly"""
+        with self._lock:
+            epoch, _, seq = (cursor or '').partition('-')
+            try:
+                seq = int(seq)
+            except ValueError:
+                seq = None
+
+            if epoch != self.epoch or seq is None or seq < self.floor or seq > self.seq:
+                return {
+                    "cursor": self.cursor(),
+                    "reset": True,
+                    "added": [item[2] for item in self.items.values()],
+                    "updated": [],
+                    "cleared": [],
+                }
+
+            added = []
+            updated = []
+            for added_seq, changed_seq, record in self.items.values():
+                if added_seq > seq:
+                    added.append(record)
+                elif changed_seq > seq:
+                    updated.append(record)
+            # Records that came and went inside the window never reached the client
+            cleared = [rid for rid, (added_seq, cleared_seq) in self.cleared.items()
+                       if cleared_seq > seq and added_seq <= seq]
+
+            return {
+                "cursor": self.cursor(),
+                "reset": False,
+                "added": added,
+                "updated": updated,
+                "cleared": cleared,
+            }
@@ -0,0 +1,99 @@
+"""Response encoding: fast JSON and gzip/brotli, cached per representation.
+
+Snapshots change at most once per refresh but are read by every dashboard,
+so each representation (route variant x content coding) is serialized and
+compressed once and then served as stored bytes until the snapshot changes.
+orjson and brotli are used when installed; without them bodies fall back to
+the json module and only gzip is offered.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this go out uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 8))
+# Encoded bodies kept in memory, across routes, variants and codings
+ENCODED_CACHE_SIZE = int(os.environ.get('ENCODED_CACHE_SIZE', 64))
+
+CODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def dumps(obj):
+    """Compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def negotiate(accept_encodings):
+    """Best coding we offer from a werkzeug Accept-Encoding header, or None"""
+    offered = [c for c in CODINGS if accept_encodings[c]]
+    if not offered:
+        return None
+    # Highest client q-value wins; ties go to our order (brotli first)
+    return max(offered, key=lambda c: (accept_encodings[c], -CODINGS.index(c)))
+
+
+def compress(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the bytes identical across workers and restarts
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class EncodedCache:
+    """LRU of encoded bodies keyed by (representation key, coding)"""
+
+    def __init__(self, size=ENCODED_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, coding, render):
+        """(body, coding actually applied) for key, rendering it with render() on a miss"""
+        with self._lock:
+            cached = self.entries.get((key, coding))
+            if cached is not None:
+                self.entries.move_to_end((key, coding))
+        if cached is not None:
+            metrics.CACHE_REQUESTS.inc(cache='encoded', result='hit')
+            return cached
+        metrics.CACHE_REQUESTS.inc(cache='encoded', result='miss')
+
+        if coding is None:
+            body = render()
+            applied = None
+        else:
+            body, _ = self.get(key, None, render)
+            applied = coding if len(body) >= COMPRESS_MIN_BYTES else None
+            if applied:
+                body = compress(body, coding)
+                metrics.PAYLOAD_BYTES.observe(len(body), source=key[0], kind=coding)
+        with self._lock:
+            self.entries[(key, coding)] = (body, applied)
+            self.entries.move_to_end((key, coding))
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return body, applied
@@ -0,0 +1,124 @@
+"""Change events for the /api/stream push feed.
+
+When the scheduler publishes a new snapshot, detect_changes() compares it
+with the previous one and the resulting typed events go onto an EventBus.
+The bus keeps a bounded backlog so reconnecting clients can resume from
+their Last-Event-ID.
+"""
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+# regions: ids of the regions an event concerns, or None for all of them
+Event = namedtuple('Event', ['id', 'type', 'data', 'regions'], defaults=(None,))
+
+
+class EventBus:
+    """Bounded, ordered backlog of events that readers can block on"""
+
+    def __init__(self, backlog=500):
+        self.epoch = format(int(time.time()), 'x')
+        self.seq = 0
+        self.events = deque(maxlen=backlog)
+        self._cond = threading.Condition()
+
+    def last_id(self):
+        return f"{self.epoch}-{self.seq}"
+
+    def publish(self, type, data, regions=None):
+        with self._cond:
+            self.seq += 1
+            event = Event(f"{self.epoch}-{self.seq}", type, json.dumps(data), regions)
+            self.events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def replay(self, id, type, data, regions=None):
+        """Append an event published by another process, keeping its id"""
+        epoch, _, seq = id.partition('-')
+        with self._cond:
+            if epoch != self.epoch:
+                # A new leader: its sequence numbers start over
+                self.epoch = epoch
+                self.events.clear()
+            self.seq = int(seq)
+            self.events.append(Event(id, type, data, regions))
+            self._cond.notify_all()
+
+    def resume_point(self, last_id):
+        """Sequence number to resume after, or None if last_id can't be resumed"""
+        epoch, _, seq = (last_id or '').partition('-')
+        try:
+            seq = int(seq)
+        except ValueError:
+            return None
+        with self._cond:
+            oldest = self.seq - len(self.events)
+            if epoch != self.epoch or seq < oldest or seq > self.seq:
+                return None
+            return seq
+
+    def wait(self, after, timeout):
+        """Events with sequence > after, blocking up to timeout for the first one"""
+        with self._cond:
+            if self.seq <= after:
+                self._cond.wait(timeout)
+            count = self.seq - after
+            if count <= 0:
+                return []
+            if count > len(self.events):
+                # The reader fell behind the backlog; tell it to resync
+                return [Event(self.last_id(), 'reset', '{}')]
+            return list(self.events)[-count:]
+
+
+def _new_items(old, new, key, field):
+    seen = {key(item) for item in old.get(field, [])}
+    return [item for item in new.get(field, []) if key(item) not in seen]
+
+
+def wind_changes(old, new, feed):
+    fields = ['speed', 'direction', 'is_risk', 'risk_areas']
+    if any(old.get(f) != new.get(f) for f in fields):
+        return [('wind.update', new)]
+    return []
+
+
+def caer_changes(old, new, feed):
+    key = lambda m: (m.get('title'), m.get('body'))
+    return [('caer.new', m) for m in _new_items(old, new, key, 'messages')]
+
+
+def dispatch_changes(old, new, feed):
+    delta = feed.since(old.get('cursor'))
+    if delta['reset'] or delta['added'] or delta['updated'] or delta['cleared']:
+        return [('dispatch.delta', delta)]
+    return []
+
+
+def nws_changes(old, new, feed):
+    key = lambda a: a.get('id')
+    return [('nws.alert', a) for a in _new_items(old, new, key, 'alerts')]
+
+
+def tceq_changes(old, new, feed):
+    key = lambda e: e.get('incident_number')
+    return [('tceq.event', e) for e in _new_items(old, new, key, 'events')]
+
+
+DETECTORS = {
+    'wind': wind_changes,
+    'caer': caer_changes,
+    'dispatch': dispatch_changes,
+    'weather-alerts': nws_changes,
+    'tceq-emissions': tceq_changes,
+}
+
+
+def detect_changes(name, old, new, feed=None):
+    """(type, data) events describing how payload new differs from old"""
+    detector = DETECTORS.get(name)
+    if detector is None or old is None:
+        return []
+    return detector(old, new, feed)
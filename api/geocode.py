@@ -0,0 +1,105 @@
+"""Offline geocoding for dispatch incidents.
+
+Incidents on the Houston board carry a Key Map reference such as "493L"
+(page 493, cell L). The bundled data/keymap_pages.json gives each page's
+bounds; the cell's centroid is used as the incident location. A region
+whose board uses other map books names its own pages file, and gets a
+Geocoder of its own from geocoder_for().
+
+Resolved addresses are kept in an LRU cache that is persisted to disk, so
+an address is resolved once and every later lookup is a dict hit.
+"""
+import json
+import os
+import re
+import threading
+
+import metrics
+from lru import MISSING, PersistentLRU
+from shared import STATE_DIR
+
+KEYMAP_PATH = os.path.join(os.path.dirname(__file__), 'data', 'keymap_pages.json')
+
+CACHE_PATH = os.environ.get('GEOCODE_CACHE_PATH', os.path.join(STATE_DIR, 'geocode_cache.json'))
+CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', 20000))
+
+KEYMAP_RE = re.compile(r'^\s*(\d{3,4})\s*-?\s*([A-Z])\s*$', re.IGNORECASE)
+
+
+class KeyMap:
+    """Key Map page/cell -> coordinate lookup"""
+
+    def __init__(self, path=KEYMAP_PATH):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.pages = data['pages']
+        self.rows = len(data['cell_rows'])
+        self.cols = len(data['cell_rows'][0])
+        # cell letter -> (row, col), row 0 at the top (north)
+        self.cells = {
+            letter: (r, c)
+            for r, letters in enumerate(data['cell_rows'])
+            for c, letter in enumerate(letters)
+        }
+
+    def locate(self, key_map):
+        """(lat, lon) centroid of a Key Map cell, or None"""
+        m = KEYMAP_RE.match(key_map or '')
+        if not m:
+            return None
+        bounds = self.pages.get(m.group(1))
+        cell = self.cells.get(m.group(2).upper())
+        if bounds is None or cell is None:
+            return None
+        south, west, north, east = bounds
+        row, col = cell
+        lat = north - (row + 0.5) * (north - south) / self.rows
+        lon = west + (col + 0.5) * (east - west) / self.cols
+        return round(lat, 5), round(lon, 5)
+
+
+class Geocoder:
+    """Address -> coordinate resolver with a persistent LRU cache"""
+
+    def __init__(self, path=CACHE_PATH, size=CACHE_SIZE, keymap_path=KEYMAP_PATH):
+        self.keymap_path = keymap_path
+        self.keymap = None
+        # Unplaceable addresses are cached too, as None
+        self.cache = PersistentLRU(path, size, decode=lambda location: tuple(location) if location else None)
+
+    def locate(self, address, key_map):
+        """(lat, lon) for an incident, or None if it can't be placed"""
+        key = f"{address.strip().upper()}|{key_map.strip().upper()}"
+        location = self.cache.get(key, MISSING)
+        if location is not MISSING:
+            metrics.CACHE_REQUESTS.inc(cache='geocode', result='hit')
+            return location
+        metrics.CACHE_REQUESTS.inc(cache='geocode', result='miss')
+
+        if self.keymap is None:
+            self.keymap = KeyMap(self.keymap_path)
+        location = self.keymap.locate(key_map)
+        self.cache.put(key, location)
+        return location
+
+    def flush(self):
+        """Write the cache to disk if it changed"""
+        self.cache.flush()
+
+
+geocoder = Geocoder()
+# Key Map pages file -> Geocoder, for boards other than Houston's
+_geocoders = {KEYMAP_PATH: geocoder}
+_geocoders_lock = threading.Lock()
+
+
+def geocoder_for(keymap_path=None):
+    """The Geocoder placing incidents with keymap_path (the bundled pages if None)"""
+    keymap_path = keymap_path or KEYMAP_PATH
+    with _geocoders_lock:
+        found = _geocoders.get(keymap_path)
+        if found is None:
+            name = os.path.splitext(os.path.basename(keymap_path))[0]
+            root, ext = os.path.splitext(CACHE_PATH)
+            found = _geocoders[keymap_path] = Geocoder(f"{root}-{name}{ext}", keymap_path=keymap_path)
+    return found
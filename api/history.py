@@ -0,0 +1,260 @@
+"""Append-only history of every record the refresh pipeline has seen.
+
+Records go into a SQLite database in WAL mode. Each (source, key) is stored
+once, when first seen; writes are queued and committed in batches by a
+background thread so refreshes never wait on the disk.
+
+Queries page newest-first with an opaque (observed_at, seq) keyset cursor,
+so deep pages cost the same as the first one.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from shared import STATE_DIR
+from spatial import haversine_km
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get('HISTORY_DB_PATH', os.path.join(STATE_DIR, 'history.sqlite3'))
+# Seconds the writer waits to gather a batch
+FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', 1.0))
+
+# Coarse spatial grid used for area queries (~5 km cells)
+CELL_DEG = 0.05
+MAX_CELLS = 400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    severity TEXT,
+    cell INTEGER,
+    lat REAL,
+    lon REAL,
+    title TEXT,
+    data TEXT NOT NULL,
+    feed TEXT,
+    UNIQUE (source, key)
+);
+CREATE TABLE IF NOT EXISTS event_regions (
+    region TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (region, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (observed_at);
+CREATE INDEX IF NOT EXISTS idx_events_source_time ON events (source, observed_at);
+CREATE INDEX IF NOT EXISTS idx_events_severity_time ON events (severity, observed_at);
+CREATE INDEX IF NOT EXISTS idx_events_cell_time ON events (cell, observed_at);
+"""
+
+
+def cell_for(lat, lon):
+    """Integer id of the grid cell containing (lat, lon)"""
+    if lat is None or lon is None:
+        return None
+    return math.floor((lat + 90) / CELL_DEG) * 100000 + math.floor((lon + 180) / CELL_DEG)
+
+
+def cells_near(lat, lon, radius_km):
+    """Cell ids covering a circle, or None if there are too many to list"""
+    dlat = radius_km / 111.0
+    dlon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    rows = range(math.floor((lat - dlat + 90) / CELL_DEG), math.floor((lat + dlat + 90) / CELL_DEG) + 1)
+    cols = range(math.floor((lon - dlon + 180) / CELL_DEG), math.floor((lon + dlon + 180) / CELL_DEG) + 1)
+    if len(rows) * len(cols) > MAX_CELLS:
+        return None
+    return [r * 100000 + c for r in rows for c in cols]
+
+
+def _digest(*parts):
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def records_for(name, payload):
+    """(key, severity, lat, lon, title, record) rows for a source payload"""
+    if name == 'dispatch':
+        return [(inc['id'], inc.get('severity'), inc.get('lat'), inc.get('lon'),
+                 f"{inc['Incident Type']} @ {inc['Address']}", inc)
+                for inc in payload.get('all_incidents', [])]
+    if name == 'caer':
+        return [(_digest(m['title'], m['body']), m['severity'], None, None, m['title'], m)
+                for m in payload.get('messages', [])]
+    if name == 'tceq-emissions':
+        return [(e['incident_number'], e['severity'], e.get('lat'), e.get('lon'), e['facility'], e)
+                for e in payload.get('events', []) if e.get('incident_number')]
+    if name == 'weather-alerts':
+        return [(a['id'], a['display_severity'], None, None, a['event'], a)
+                for a in payload.get('alerts', []) if a.get('id')]
+    return []
+
+
+def encode_cursor(observed_at, seq):
+    return f"{observed_at!r}:{seq}"
+
+
+def decode_cursor(cursor):
+    observed_at, _, seq = cursor.partition(':')
+    return float(observed_at), int(seq)
+
+
+class HistoryStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._writer = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        # Databases from before regions have no feed column
+        if 'feed' not in [row[1] for row in conn.execute('PRAGMA table_info(events)')]:
+            conn.execute('ALTER TABLE events ADD COLUMN feed TEXT')
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._writer.start()
+
+    def add(self, name, payload, feed=None, regions_for=None):
+        """Queue every record of a source payload; existing ones are ignored.
+
+        feed names the feed it came from; regions_for(record) gives the ids
+        of the regions it concerns. A record seen by several feeds is stored
+        once, under every region of each of them.
+        """
+        observed_at = time.time()
+        rows = [
+            (name, key, observed_at, severity, cell_for(lat, lon), lat, lon, title, json.dumps(record), feed,
+             regions_for(record) if regions_for else [])
+            for key, severity, lat, lon, title, record in records_for(name, payload)
+        ]
+        if rows:
+            self._queue.put(rows)
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            deadline = time.time() + FLUSH_INTERVAL
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.extend(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, rows):
+        """Insert rows in one transaction"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO events '
+                    '(source, key, observed_at, severity, cell, lat, lon, title, data, feed) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [row[:10] for row in rows])
+                conn.executemany(
+                    'INSERT OR IGNORE INTO event_regions (region, seq) '
+                    'SELECT ?, seq FROM events WHERE source = ? AND key = ?',
+                    [(region, row[0], row[1]) for row in rows for region in row[10]])
+        except sqlite3.Error:
+            logger.exception("History write of %d rows failed", len(rows))
+
+    def query(self, sources=None, severities=None, since=None, until=None, near=None, limit=100, cursor=None,
+              region=None):
+        """Newest-first page of events and the cursor for the next page.
+
+        near is (lat, lon, radius_km); since/until are unix times.
+        """
+        clauses = []
+        params = []
+        if region:
+            clauses.append('seq IN (SELECT seq FROM event_regions WHERE region = ?)')
+            params.append(region)
+        if sources:
+            clauses.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        if severities:
+            clauses.append(f"severity IN ({','.join('?' * len(severities))})")
+            params.extend(severities)
+        if since is not None:
+            clauses.append('observed_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('observed_at < ?')
+            params.append(until)
+        if near:
+            lat, lon, radius_km = near
+            cells = cells_near(lat, lon, radius_km)
+            if cells is not None:
+                clauses.append(f"cell IN ({','.join('?' * len(cells))})")
+                params.extend(cells)
+            # Bounding box of the circle, so few rows fail the exact distance check below
+            dlat = radius_km / 111.0
+            dlon = radius_km / (111.0 * max(math.cos(math.radians(min(abs(lat) + dlat, 89.0))), 0.01))
+            clauses.append('lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?')
+            params.extend([lat - dlat, lat + dlat, lon - dlon, lon + dlon])
+
+        conn = self._connect()
+        position = decode_cursor(cursor) if cursor else None
+        rows = []
+        # Rows in the box but outside the circle are dropped, so fetch on until the page is full
+        while len(rows) < limit:
+            where = clauses + (['(observed_at, seq) < (?, ?)'] if position else [])
+            sql = (f"SELECT seq, source, observed_at, severity, lat, lon, title, data, feed FROM events "
+                   f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+                   f"ORDER BY observed_at DESC, seq DESC LIMIT ?")
+            chunk = conn.execute(sql, params + list(position or ()) + [limit]).fetchall()
+            for row in chunk:
+                if near and haversine_km(near[0], near[1], row[4], row[5]) > near[2]:
+                    continue
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+            if len(chunk) < limit:
+                break
+            position = (chunk[-1][2], chunk[-1][0])
+
+        regions = {}
+        if rows:
+            for seq, id in conn.execute(
+                    f"SELECT seq, region FROM event_regions WHERE seq IN ({','.join('?' * len(rows))})",
+                    [row[0] for row in rows]):
+                regions.setdefault(seq, []).append(id)
+
+        events = []
+        for seq, source, observed_at, severity, lat, lon, title, data, feed in rows:
+            events.append({
+                "source": source,
+                "feed": feed,
+                "regions": regions.get(seq, []),
+                "observed_at": observed_at,
+                "severity": severity,
+                "lat": lat,
+                "lon": lon,
+                "title": title,
+                "record": json.loads(data),
+            })
+
+        next_cursor = encode_cursor(rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+        return events, next_cursor
@@ -0,0 +1,84 @@
+"""Bounded LRU mapping persisted to a JSON file.
+
+The file is read on first use, not at import, so startup skips it. flush()
+writes it back only when something changed, to a temporary file that then
+replaces the old one, so a crash never leaves half a cache behind.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Returned by get() for a key that is not cached
+MISSING = object()
+
+
+class PersistentLRU:
+    """key -> JSON-able value; past size entries the least recently used is dropped"""
+
+    def __init__(self, path, size, decode=None):
+        self.path = path
+        self.size = size
+        # Turns a value read back from JSON into what put() was given
+        self.decode = decode or (lambda value: value)
+        self.entries = None
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self.entries = OrderedDict()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+            for key, value in stored[-self.size:]:
+                self.entries[key] = self.decode(value)
+        except (OSError, ValueError, TypeError):
+            # Missing, unreadable or from an older format: start over
+            self.entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            if self.entries is None:
+                self._load()
+            return len(self.entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if self.entries is None:
+                self._load()
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            if self.entries is None:
+                self._load()
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def clear(self):
+        """Forget every entry, in memory only"""
+        with self._lock:
+            self.entries = OrderedDict()
+
+    def flush(self):
+        """Write the entries to disk if they changed"""
+        with self._lock:
+            if not self.dirty:
+                return
+            stored = list(self.entries.items())
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except OSError:
+            # A read-only disk only costs the warm start
+            pass
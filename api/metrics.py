@@ -0,0 +1,187 @@
+"""Counters and histograms for the refresh pipeline, in the Prometheus text format.
+
+Every source pipeline times its stages (fetch, parse, clean, classify,
+geocode, serialize) with Stages; upstream.py counts responses by status and
+the caches count hits and misses. Only the leader worker runs the pipeline,
+so it publishes registry.state() for the followers to render.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def state(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self.values.items()]
+
+    def render(self, values):
+        return [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in values]
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts, sum, count]
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def state(self):
+        with self._lock:
+            return [[list(k), list(counts), total, count] for k, (counts, total, count) in self.values.items()]
+
+    def render(self, values):
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help, labels=()):
+        return self.metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def state(self):
+        """Plain-JSON copy of every series, for other worker processes"""
+        return {name: metric.state() for name, metric in self.metrics.items()}
+
+    def render(self, state=None):
+        """Prometheus exposition text for state (default: this process)"""
+        state = self.state() if state is None else state
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            lines.extend(metric.render(state.get(name, [])))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'monitor_stage_seconds', 'Time spent in each stage of a source pipeline', ['source', 'stage'])
+PAYLOAD_BYTES = registry.histogram(
+    'monitor_payload_bytes', 'Size of upstream responses and serialized snapshots', ['source', 'kind'],
+    buckets=BYTES_BUCKETS)
+RECORDS_PARSED = registry.counter(
+    'monitor_records_parsed_total', 'Records produced by source pipelines', ['source'])
+CACHE_REQUESTS = registry.counter(
+    'monitor_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+UPSTREAM_RESPONSES = registry.counter(
+    'monitor_upstream_responses_total', 'Upstream responses by host and status code', ['host', 'status'])
+REFRESHES = registry.counter(
+    'monitor_refreshes_total', 'Refresh attempts by outcome', ['source', 'outcome'])
+WEBHOOK_DELIVERIES = registry.counter(
+    'monitor_webhook_deliveries_total', 'Webhook deliveries by result', ['result'])
+
+
+@contextmanager
+def stage(source, name):
+    """Time one stage of a source pipeline"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, source=source, stage=name)
+
+
+class Stages:
+    """Time stages that interleave (e.g. per row) and report each total once
+
+        with Stages('dispatch') as timer:
+            for row in timer.iterate('parse', rows):
+                with timer('classify'):
+                    ...
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.totals = {}
+
+    @contextmanager
+    def __call__(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - started
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, counting the time spent producing items as stage name"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - started
+                return
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - started
+            yield item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for name, seconds in self.totals.items():
+            STAGE_SECONDS.observe(seconds, source=self.source, stage=name)
+        return False
@@ -0,0 +1,78 @@
+"""Lightweight HTML extractors for upstream pages."""
+from io import BytesIO
+
+from lxml import etree
+
+DISPATCH_COLUMNS = ['Agency', 'Address', 'Cross Street', 'Key Map', 'Call Time', 'Incident Type', 'Combined Response']
+
+DISCLAIMER_MARKERS = ('this page contains', 'disclaimer')
+
+
+def _cell_text(cell):
+    if len(cell) == 0:
+        # Common case: a plain text cell
+        return ' '.join((cell.text or '').split())
+    return ' '.join(''.join(cell.itertext()).split())
+
+
+def _enclosing_table(row):
+    parent = row.getparent()
+    while parent is not None and parent.tag != 'table':
+        parent = parent.getparent()
+    return parent
+
+
+def _is_disclaimer(cells):
+    text = ' '.join(cells).lower()
+    return any(marker in text for marker in DISCLAIMER_MARKERS)
+
+
+def _record(columns, cells):
+    return {name: cells[i] if i < len(cells) else '' for i, name in enumerate(columns)}
+
+
+def iter_dispatch_rows(html):
+    """Yield one {column: text} dict per incident row of the Combined.aspx board.
+
+    Walks the page once with iterparse. Once the header row (the one with an
+    "Agency" cell) is seen, every later row of that table is mapped and
+    yielded immediately; rows are freed as soon as they have been read.
+    Without a header row, falls back to the table with the most rows and
+    the standard column order.
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+
+    target = None
+    columns = None
+    # Rows seen before a header is found, per table, for the fallback
+    pending = {}
+
+    for _, row in etree.iterparse(BytesIO(html), events=('end',), tag='tr', html=True, recover=True):
+        cells = [_cell_text(c) for c in row if c.tag in ('td', 'th')]
+        table = _enclosing_table(row)
+
+        # Free the row and anything before it; we never look back
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+
+        if not cells:
+            continue
+        if target is None:
+            if 'Agency' in cells:
+                target = table
+                columns = cells
+                pending = None
+            else:
+                pending.setdefault(table, []).append(cells)
+            continue
+        if table is target and not _is_disclaimer(cells):
+            yield _record(columns, cells)
+
+    if target is None and pending:
+        rows = max(pending.values(), key=len)
+        if len(rows[0]) >= len(DISPATCH_COLUMNS):
+            for cells in rows:
+                if not _is_disclaimer(cells):
+                    yield _record(DISPATCH_COLUMNS, cells)
@@ -0,0 +1,90 @@
+"""Downwind exposure from each facility over the hourly wind forecast.
+
+A facility's plume for one forecast hour is modelled as a sector centred on
+the direction the wind blows toward, PLUME_HALF_ANGLE degrees either side,
+reaching PLUME_REACH_KM. Distances and bearings from every facility to
+every target are computed once as arrays; each hour is then a single
+broadcast comparison over (hour, facility, target).
+"""
+import os
+
+import numpy as np
+
+from spatial import EARTH_RADIUS_KM
+
+PLUME_HALF_ANGLE = float(os.environ.get('PLUME_HALF_ANGLE', 20))
+PLUME_REACH_KM = float(os.environ.get('PLUME_REACH_KM', 10))
+# Below this speed the direction is meaningless and no sector is drawn
+CALM_MPH = 2
+
+COMPASS = {
+    'N': 0, 'NNE': 22.5, 'NE': 45, 'ENE': 67.5,
+    'E': 90, 'ESE': 112.5, 'SE': 135, 'SSE': 157.5,
+    'S': 180, 'SSW': 202.5, 'SW': 225, 'WSW': 247.5,
+    'W': 270, 'WNW': 292.5, 'NW': 315, 'NNW': 337.5,
+}
+
+
+def distance_bearing(lat1, lon1, lat2, lon2):
+    """(km, initial bearing in degrees) between every point 1 and every point 2"""
+    lat1, lon1 = np.radians(np.asarray(lat1, dtype=float))[:, None], np.radians(np.asarray(lon1, dtype=float))[:, None]
+    lat2, lon2 = np.radians(np.asarray(lat2, dtype=float))[None, :], np.radians(np.asarray(lon2, dtype=float))[None, :]
+    dlon = lon2 - lon1
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    bearing = (np.degrees(np.arctan2(y, x)) + 360) % 360
+    return dist, bearing
+
+
+def plume_headings(periods):
+    """Direction each period's wind blows toward (NaN when calm/unknown)"""
+    headings = []
+    for period in periods:
+        wind_from = COMPASS.get((period.get('direction') or '').upper())
+        if wind_from is None or period.get('speed_numeric', 0) < CALM_MPH:
+            headings.append(np.nan)
+        else:
+            headings.append((wind_from + 180) % 360)
+    return np.array(headings, dtype=float)
+
+
+def exposure(periods, facilities, targets, half_angle=PLUME_HALF_ANGLE, reach_km=PLUME_REACH_KM):
+    """Which targets sit inside each facility's plume, per forecast period.
+
+    facilities: {name: {"lat", "lon"}}
+    targets: {kind: (labels, lats, lons)}, e.g. residential areas or incidents
+    Returns one dict per period listing only facilities with exposures.
+    """
+    names = list(facilities)
+    flat = [facilities[n]['lat'] for n in names]
+    flon = [facilities[n]['lon'] for n in names]
+    headings = plume_headings(periods)
+
+    # inside[kind] has shape (periods, facilities, targets)
+    inside = {}
+    for kind, (labels, lats, lons) in targets.items():
+        if not len(labels):
+            inside[kind] = np.zeros((len(periods), len(names), 0), dtype=bool)
+            continue
+        dist, bearing = distance_bearing(flat, flon, lats, lons)
+        off = np.abs((bearing[None, :, :] - headings[:, None, None] + 180) % 360 - 180)
+        # A target at the facility itself (distance ~0) is not "downwind"
+        inside[kind] = (off <= half_angle) & (dist[None] <= reach_km) & (dist[None] > 0.05)
+
+    results = []
+    for p, period in enumerate(periods):
+        exposed = []
+        for f, name in enumerate(names):
+            hits = {kind: [targets[kind][0][t] for t in np.nonzero(inside[kind][p, f])[0]] for kind in targets}
+            if any(hits.values()):
+                exposed.append({"facility": name, **hits})
+        results.append({
+            "start": period.get('start'),
+            "direction": period.get('direction'),
+            "speed_numeric": period.get('speed_numeric'),
+            "heading": None if np.isnan(headings[p]) else float(headings[p]),
+            "exposures": exposed,
+        })
+    return results
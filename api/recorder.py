@@ -0,0 +1,159 @@
+"""Append-only archive of raw upstream responses, and replay from it.
+
+Each response is appended as its own gzip member holding one JSON header
+line, followed by the body when this process has not written that body
+before. Repeated bodies (unchanged polls) are stored as a sha1 reference
+only. Concatenated gzip members read back as one stream, and a member torn
+by a crash only loses the last record.
+
+Replay answers upstream.get() from an archive on a clock that starts at
+REPLAY_START (default: the first record) and runs REPLAY_SPEED times faster
+than real time, so the scheduler, parsers, delta feed and classifiers run
+on recorded traffic exactly as they did live. A recorded 304 replays as
+the latest 200 before it for the same URL, so a replay may start anywhere.
+"""
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+# Response headers worth keeping with a recording
+KEPT_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Cache-Control']
+
+
+class ArchiveWriter:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Bodies already in the archive from this process
+        self.written = set()
+        self._lock = threading.Lock()
+
+    def write(self, url, response, at=None):
+        """Append one response for url"""
+        body = response.content
+        sha = hashlib.sha1(body).hexdigest()
+        header = {
+            "t": at or time.time(),
+            "url": url,
+            "status": response.status_code,
+            "headers": {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers},
+            "sha": sha,
+            "size": len(body),
+        }
+        with self._lock:
+            inline = sha not in self.written
+            header['inline'] = inline
+            record = json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n'
+            if inline:
+                record += body
+            # One write() per member, so appends from several processes never interleave
+            member = gzip.compress(record, compresslevel=6)
+            with open(self.path, 'ab') as f:
+                f.write(member)
+            self.written.add(sha)
+
+
+def read_archive(path):
+    """Yield (t, url, status, headers, body) for every complete record in order"""
+    bodies = {}
+    with gzip.open(path, 'rb') as f:
+        while True:
+            try:
+                line = f.readline()
+                if not line:
+                    return
+                header = json.loads(line)
+                if header['inline']:
+                    body = f.read(header['size'])
+                    if len(body) != header['size']:
+                        return
+                    bodies[header['sha']] = body
+            except (EOFError, OSError, zlib.error, ValueError):
+                # Torn last record
+                return
+            body = bodies.get(header['sha'])
+            if body is None:
+                # Body written by an earlier process into a truncated archive
+                continue
+            yield header['t'], header['url'], header['status'], header['headers'], body
+
+
+def make_response(url, status, headers, body):
+    """A requests.Response carrying a recorded answer"""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.url = url
+    response.encoding = get_encoding_from_headers(response.headers)
+    return response
+
+
+def parse_start(value):
+    """Unix seconds or an ISO 8601 timestamp (UTC if no offset given)"""
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+class Replay:
+    """Serves recorded responses as of a replay clock"""
+
+    def __init__(self, path, speed=1.0, start=None):
+        self.speed = speed
+        # url -> ([recorded times], [(status, headers, body)])
+        self.recordings = {}
+        # url -> (headers, body) of its latest recorded 200
+        full = {}
+        first = last = None
+        for t, url, status, headers, body in read_archive(path):
+            if status == 304:
+                # A conditional GET's empty answer stands for the body it confirmed
+                if url not in full:
+                    continue
+                kept, body = full[url]
+                status, headers = 200, {**kept, **headers}
+            elif status == 200:
+                full[url] = (headers, body)
+            times, answers = self.recordings.setdefault(url, ([], []))
+            times.append(t)
+            answers.append((status, headers, body))
+            first = t if first is None else min(first, t)
+            last = t if last is None else max(last, t)
+        if first is None:
+            raise ValueError(f"{path} holds no recordings")
+        self.first = first
+        self.last = last
+        self.start = parse_start(start) if start else first
+        self.started_at = time.time()
+
+    def now(self):
+        """Recorded time the replay has reached"""
+        return self.start + (time.time() - self.started_at) * self.speed
+
+    def get(self, url):
+        """The latest recording of url at the replay clock"""
+        import requests
+
+        recorded = self.recordings.get(url)
+        if recorded is None:
+            raise requests.ConnectionError(f"No recording of {url}")
+        times, answers = recorded
+        i = bisect.bisect_right(times, self.now()) - 1
+        if i < 0:
+            raise requests.ConnectionError(f"No recording of {url} yet at the replay clock")
+        return make_response(url, *answers[i])
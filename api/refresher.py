@@ -0,0 +1,29 @@
+"""Refresh pipeline in a process of its own, beside the web workers.
+
+gevent workers run every thread as a greenlet on the same hub as their
+requests, so a leader worker parsing a large page would stall its open
+streams. In the container the web workers run with LEAD=0 and only
+follow; this process, on real threads, takes the leader lock and runs the
+scheduler, history writer, correlation and webhook delivery. If it exits
+it is restarted and picks up from the published state.
+
+Usage:
+    python refresher.py
+"""
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+import app  # noqa: E402
+
+
+def main():
+    if not app.LEAD:
+        raise SystemExit("refresher.py must lead; unset LEAD=0 for it")
+    # Importing app took the leader lock, or waits for it in the background
+    threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
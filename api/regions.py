@@ -0,0 +1,210 @@
+"""Region definitions, and the upstream feeds that serve them.
+
+Each regions/<id>.json describes one metro area: its NWS gridpoint and
+alert zones, TCEQ searches and counties, dispatch board (with the Key Map
+pages that place its incidents), CAER feed, facilities, residential areas
+and radio feeds. Any of the feeds may be left out.
+
+Regions don't get feeds of their own. plan() gives the scheduler one feed
+per distinct upstream resource: every region with the same gridpoint,
+dispatch board or CAER page shares one feed, and the NWS alert zones and
+TCEQ searches of all regions are polled by a single feed each. A region's
+view of those two is its own zones' alerts and its own counties' events,
+so upstream traffic grows with the distinct zones and searches, not with
+the number of regions.
+"""
+import functools
+import json
+import os
+from collections import OrderedDict
+
+from sources import (
+    TCEQ_COUNTIES, TCEQ_DAY_RANGES, fetch_caer, fetch_dispatch, fetch_tceq_emissions, fetch_weather_alerts,
+    fetch_wind, timeout_budget,
+)
+
+REGIONS_DIR = os.environ.get('REGIONS_DIR', os.path.join(os.path.dirname(__file__), 'regions'))
+# Comma-separated region ids to serve; every file in REGIONS_DIR by default
+ENABLED = [r.strip() for r in os.environ.get('REGIONS', '').split(',') if r.strip()]
+# Region served by the unprefixed /api/... routes
+DEFAULT_REGION = os.environ.get('DEFAULT_REGION', 'houston')
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+# Feeds polled once for all regions, each region seeing a filtered view
+MERGED_KINDS = ('weather-alerts', 'tceq-emissions')
+# Feeds shared only by regions with the same upstream configuration
+KEYED_KINDS = ('wind', 'caer', 'dispatch')
+
+
+class Region:
+    """One metro area and the feeds its routes read"""
+
+    def __init__(self, id, config):
+        self.id = id
+        self.name = config.get('name', id)
+        self.wind = config.get('wind')
+        self.alert_zones = list(config.get('weather_alert_zones', []))
+        tceq = config.get('tceq')
+        if tceq:
+            self.tceq_searches = [
+                (county, str(days))
+                for county in tceq.get('counties', TCEQ_COUNTIES)
+                for days in tceq.get('day_ranges', TCEQ_DAY_RANGES)
+            ]
+            self.tceq_counties = [c.upper() for c in tceq.get('area_counties', tceq.get('counties', TCEQ_COUNTIES))]
+        else:
+            self.tceq_searches = []
+            self.tceq_counties = []
+        self.dispatch = config.get('dispatch')
+        if self.dispatch and self.dispatch.get('keymap'):
+            self.dispatch = {**self.dispatch, 'keymap': os.path.join(DATA_DIR, self.dispatch['keymap'])}
+        self.caer = config.get('caer')
+        self.facilities = config.get('facilities', {})
+        self.residential_areas = config.get('residential_areas', {})
+        self.radio_feeds = config.get('radio_feeds', [])
+
+        self.facility_names = list(self.facilities)
+        self.facility_lat = [self.facilities[n]['lat'] for n in self.facility_names]
+        self.facility_lon = [self.facilities[n]['lon'] for n in self.facility_names]
+        # kind -> name of the scheduler feed serving it, filled in by plan()
+        self.feeds = OrderedDict()
+        # kind -> render(payload) narrowing a merged feed to this region
+        self.views = {}
+
+    def upstream(self, kind):
+        """This region's configuration for a feed kind, or None"""
+        if kind == 'weather-alerts':
+            return self.alert_zones or None
+        if kind == 'tceq-emissions':
+            return self.tceq_searches or None
+        return getattr(self, kind)
+
+    def describe(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "feeds": dict(self.feeds),
+            "facilities": len(self.facilities),
+            "radio_feeds": len(self.radio_feeds),
+        }
+
+
+class Feed:
+    """One upstream resource polled for one or more regions"""
+
+    def __init__(self, name, kind, config):
+        self.name = name
+        self.kind = kind
+        self.config = config
+        self.regions = []
+
+    def pipeline(self):
+        """fetch() for this feed, without any post-processing"""
+        if self.kind == 'wind':
+            areas = [(r.facilities, r.residential_areas) for r in self.regions]
+            return functools.partial(fetch_wind, self.config['gridpoint'], areas)
+        if self.kind == 'caer':
+            return functools.partial(fetch_caer, self.config['url'])
+        if self.kind == 'dispatch':
+            return functools.partial(fetch_dispatch, self.config['url'], self.config.get('keymap'))
+        if self.kind == 'tceq-emissions':
+            return functools.partial(fetch_tceq_emissions, *self.config)
+        return functools.partial(fetch_weather_alerts, self.config)
+
+    def timeout_budget(self):
+        """Seconds a refresh may take with every request running to its timeouts"""
+        return timeout_budget(self.kind, self.config)
+
+    def regions_for(self, record):
+        """Ids of the regions whose view of this feed includes record"""
+        if self.kind == 'weather-alerts':
+            zones = set(record.get('zones', ()))
+            return [r.id for r in self.regions if zones.intersection(r.alert_zones)]
+        if self.kind == 'tceq-emissions':
+            county = (record.get('county') or '').upper()
+            return [r.id for r in self.regions if county in r.tceq_counties]
+        return [r.id for r in self.regions]
+
+
+def load(directory=REGIONS_DIR, enabled=ENABLED, default=DEFAULT_REGION):
+    """id -> Region for every config file, the default region first"""
+    found = {}
+    for filename in sorted(os.listdir(directory)):
+        id, ext = os.path.splitext(filename)
+        if ext != '.json' or (enabled and id not in enabled):
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            found[id] = Region(id, json.load(f))
+    missing = [r for r in enabled if r not in found]
+    if missing:
+        raise ValueError(f"No region config for {', '.join(missing)} in {directory}")
+    if default not in found:
+        raise ValueError(f"Default region {default} is not configured in {directory}")
+    regions = OrderedDict([(default, found.pop(default))])
+    regions.update(found)
+    return regions
+
+
+def _unique(items):
+    return list(OrderedDict.fromkeys(items))
+
+
+def plan(regions):
+    """name -> Feed covering every region's upstream needs.
+
+    A keyed feed is named after its kind for the first region that needs
+    it (the default region comes first), and <kind>:<region> after the
+    first region needing each other configuration.
+    """
+    feeds = OrderedDict()
+    keyed = {}
+    for region in regions.values():
+        for kind in MERGED_KINDS + KEYED_KINDS:
+            config = region.upstream(kind)
+            if config is None:
+                continue
+            if kind in MERGED_KINDS:
+                feed = feeds.get(kind)
+                if feed is None:
+                    feed = feeds[kind] = Feed(kind, kind, [])
+                feed.config = _unique(feed.config + config)
+            else:
+                key = (kind, json.dumps(config, sort_keys=True))
+                feed = keyed.get(key)
+                if feed is None:
+                    name = kind if kind not in feeds else f"{kind}:{region.id}"
+                    feed = keyed[key] = feeds[name] = Feed(name, kind, config)
+            feed.regions.append(region)
+            region.feeds[kind] = feed.name
+
+    if 'tceq-emissions' in feeds:
+        feed = feeds['tceq-emissions']
+        # (searches, counties kept) of the merged feed
+        feed.config = (feed.config, _unique(c for r in feed.regions for c in r.tceq_counties))
+    for region in regions.values():
+        if 'weather-alerts' in region.feeds and set(region.alert_zones) != set(feeds['weather-alerts'].config):
+            region.views['weather-alerts'] = alerts_view(region.alert_zones)
+        if 'tceq-emissions' in region.feeds and set(region.tceq_counties) != set(feeds['tceq-emissions'].config[1]):
+            region.views['tceq-emissions'] = tceq_view(region.tceq_counties)
+    return feeds
+
+
+def alerts_view(zones):
+    """render(payload) keeping the alerts listed under any of zones"""
+    wanted = set(zones)
+
+    def render(payload):
+        alerts = [a for a in payload['alerts'] if wanted.intersection(a.get('zones', ()))]
+        return {**payload, "alerts": alerts, "count": len(alerts), "zones": zones}
+    return render
+
+
+def tceq_view(counties):
+    """render(payload) keeping the events in any of counties"""
+    wanted = set(counties)
+
+    def render(payload):
+        events = [e for e in payload['events'] if e['county'].upper() in wanted]
+        return {**payload, "events": events, "count": len(events)}
+    return render
@@ -0,0 +1,57 @@
+"""Persistent cache of parsed TCEQ emission event reports.
+
+A report's detail page (contaminants, amounts released, cause) is fetched
+once per incident_number and kept on disk, so a refresh only fetches the
+reports of events it has not seen before. Final reports never change and
+are kept until evicted; preliminary ones are fetched again once they are
+older than REPORT_MAX_AGE, to pick up the final figures.
+"""
+import os
+import time
+
+import metrics
+from lru import PersistentLRU
+from shared import STATE_DIR
+
+CACHE_PATH = os.environ.get('TCEQ_REPORT_CACHE_PATH', os.path.join(STATE_DIR, 'tceq_reports.json'))
+CACHE_SIZE = int(os.environ.get('TCEQ_REPORT_CACHE_SIZE', 5000))
+# Seconds before a preliminary report is fetched again
+REPORT_MAX_AGE = float(os.environ.get('TCEQ_REPORT_MAX_AGE', 6 * 3600))
+
+
+class ReportCache:
+    """incident_number -> parsed report, persisted as JSON"""
+
+    def __init__(self, path=CACHE_PATH, size=CACHE_SIZE, max_age=REPORT_MAX_AGE):
+        self.max_age = max_age
+        # incident_number -> (fetched_at, report)
+        self.reports = PersistentLRU(path, size, decode=tuple)
+
+    def _fresh(self, cached, now):
+        if cached is None:
+            return False
+        fetched_at, report = cached
+        return report.get('final') or now - fetched_at < self.max_age
+
+    def get(self, number):
+        """The cached report for number, or None"""
+        cached = self.reports.get(number)
+        return cached[1] if cached else None
+
+    def missing(self, numbers):
+        """Those of numbers with no report, or only a preliminary one past its age"""
+        now = time.time()
+        missing = [n for n in numbers if not self._fresh(self.reports.get(n), now)]
+        metrics.CACHE_REQUESTS.inc(len(numbers) - len(missing), cache='tceq_report', result='hit')
+        metrics.CACHE_REQUESTS.inc(len(missing), cache='tceq_report', result='miss')
+        return missing
+
+    def put(self, number, report):
+        self.reports.put(number, (time.time(), report))
+
+    def flush(self):
+        """Write the cache to disk if it changed"""
+        self.reports.flush()
+
+
+report_cache = ReportCache()
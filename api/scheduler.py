@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import encoding
+import metrics
+import upstream
+from breaker import BREAKER_SLOW_SECONDS, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Seconds a follower waits for the leader's first snapshot of a source
+FOLLOWER_WAIT = float(os.environ.get('FOLLOWER_WAIT', 20))
+# Shared blob the leader publishes health() under
+HEALTH_BLOB = 'health'
+
+
+class Entry:
+    """One published snapshot of a source.
+
+    Replaced as a whole, never mutated, so readers can grab it without
+    locking and always see a consistent body/etag. Entries read from another
+    process carry only the serialized body; the payload is parsed on first use.
+    """
+    __slots__ = ('_payload', 'body', 'etag', 'version', 'updated_at')
+
+    def __init__(self, payload, body, etag, version, updated_at):
+        self._payload = payload
+        self.body = body
+        self.etag = etag
+        self.version = version
+        self.updated_at = updated_at
+
+    @property
+    def payload(self):
+        if self._payload is None:
+            self._payload = encoding.loads(self.body)
+        return self._payload
+
+    def touched(self, updated_at):
+        """The same snapshot, confirmed current at updated_at"""
+        return Entry(self._payload, self.body, self.etag, self.version, updated_at)
+
+
+class Source:
+    """One upstream feed and the last payload it produced"""
+
+    def __init__(self, name, fetch, interval, ttl=None, kind=None, slow_seconds=None):
+        self.name = name
+        # What the payload is (wind, dispatch, ...); several sources may share a kind
+        self.kind = kind or name
+        self.fetch = fetch
+        self.interval = interval
+        self.ttl = ttl or interval
+        self.entry = None
+        self.error = None
+        self.error_at = None
+        # Result of the last attempt: changed, unchanged, error or breaker_open
+        self.outcome = None
+        # Event for the fetch currently running, shared by every waiter
+        self.inflight = None
+        self.lock = threading.Lock()
+        self.breaker = CircuitBreaker(slow_seconds=BREAKER_SLOW_SECONDS or slow_seconds)
+        # Breaker state published by the leader while this process follows
+        self.leader_state = None
+
+    def age(self):
+        entry = self.entry
+        if entry is None:
+            return None
+        return time.time() - entry.updated_at
+
+    def is_stale(self):
+        """Past its TTL, or held over because upstream is failing"""
+        age = self.age()
+        return age is not None and (age > self.ttl or self.breaker_open())
+
+    def breaker_open(self):
+        if self.leader_state is not None:
+            return self.leader_state != 'closed'
+        return self.breaker.is_open()
+
+
+class Scheduler:
+    """Refreshes every registered source on its own interval in the background.
+
+    Routes never talk to upstream; they read the latest snapshot, which is
+    swapped in atomically after each successful refresh. Refreshes are
+    single-flight: concurrent callers for the same source share one fetch.
+
+    In a multi-worker deployment only the leader fetches; followers read the
+    leader's entries from a SharedSnapshot instead (see follow()).
+    """
+
+    def __init__(self):
+        self.sources = {}
+        self.version = 0
+        self.shared = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._listeners = []
+        self._watchers = []
+
+    def register(self, name, fetch, interval, ttl=None, kind=None, slow_seconds=None):
+        """Add a source; a fetch taking over slow_seconds counts against its breaker"""
+        self.sources[name] = Source(name, fetch, interval, ttl, kind, slow_seconds)
+
+    def subscribe(self, callback):
+        """Call callback(name, old_entry, new_entry) after every publish"""
+        self._listeners.append(callback)
+
+    def watch(self, callback):
+        """Call callback(name, source) after every fetch attempt, failed or not"""
+        self._watchers.append(callback)
+
+    def follow(self, shared):
+        """Stop fetching and serve the entries another process publishes"""
+        self.shared = shared
+
+    def lead(self):
+        """Take over fetching, starting from the entries last published"""
+        shared, self.shared = self.shared, None
+        if shared is None:
+            return
+        for name, source in self.sources.items():
+            source.leader_state = None
+            entry = shared.read(name)
+            if entry is not None:
+                source.entry = entry
+                # Keep versions increasing across a change of leader
+                self.version = max(self.version, entry.version)
+
+    def start(self, warm=True):
+        """Refresh every source on its interval, starting now unless warm is False"""
+        if self._threads:
+            return
+        for source in self.sources.values():
+            t = threading.Thread(target=self._run, args=(source, warm), name=f"refresh-{source.name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def warm_up(self):
+        """Fetch every source once in the background"""
+        for name in self.sources:
+            self.refresh_async(name)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, source, warm):
+        if not warm:
+            self._stop.wait(source.interval)
+        while not self._stop.is_set():
+            self.refresh(source.name)
+            self._stop.wait(source.interval)
+
+    def refresh(self, name, wait=True):
+        """Fetch one source now and publish the result.
+
+        If a fetch for the source is already running, join it instead of
+        starting another (or return immediately when wait is False).
+        """
+        source = self.sources[name]
+        with source.lock:
+            flight = source.inflight
+            leader = flight is None
+            if leader:
+                flight = source.inflight = threading.Event()
+        if not leader:
+            if wait:
+                flight.wait()
+            return source.error is None
+
+        try:
+            return self._fetch(source)
+        finally:
+            with source.lock:
+                source.inflight = None
+            flight.set()
+
+    def refresh_async(self, name):
+        """Start a background refresh unless one is already in flight"""
+        if self.sources[name].inflight is not None:
+            return
+        threading.Thread(target=self.refresh, args=(name, False), name=f"revalidate-{name}", daemon=True).start()
+
+    def _fetch(self, source):
+        # While the breaker is open the last good entry keeps being served
+        if not source.breaker.allow():
+            source.outcome = 'breaker_open'
+            metrics.REFRESHES.inc(source=source.name, outcome=source.outcome)
+            return False
+        started = time.time()
+        try:
+            payload = source.fetch()
+            if payload is upstream.UNCHANGED and source.entry is None:
+                raise RuntimeError("Upstream reported no change but no snapshot is held")
+        except Exception as e:
+            source.breaker.record(False, time.time() - started)
+            source.outcome = 'error'
+            metrics.REFRESHES.inc(source=source.name, outcome=source.outcome)
+            source.error = str(e)
+            source.error_at = time.time()
+            self._notify_watchers(source)
+            return False
+        source.breaker.record(True, time.time() - started)
+
+        if payload is upstream.UNCHANGED:
+            # Nothing to parse, serialize or tell listeners; just fresh again
+            source.outcome = 'unchanged'
+            metrics.REFRESHES.inc(source=source.name, outcome=source.outcome)
+            source.entry = source.entry.touched(time.time())
+            source.error = None
+            self._notify_watchers(source)
+            return True
+        source.outcome = 'changed'
+        metrics.REFRESHES.inc(source=source.name, outcome=source.outcome)
+
+        # Serialize and hash once per refresh so readers only copy bytes
+        with metrics.stage(source.name, 'serialize'):
+            body = encoding.dumps(payload)
+            etag = hashlib.sha1(body).hexdigest()[:20]
+        metrics.PAYLOAD_BYTES.observe(len(body), source=source.name, kind='serialized')
+        with self._lock:
+            self.version += 1
+            old = source.entry
+            source.entry = Entry(payload, body, etag, self.version, time.time())
+            source.error = None
+
+        for callback in self._listeners:
+            try:
+                callback(source.name, old, source.entry)
+            except Exception:
+                logger.exception("Listener failed for %s", source.name)
+        self._notify_watchers(source)
+        return True
+
+    def _notify_watchers(self, source):
+        for callback in self._watchers:
+            try:
+                callback(source.name, source)
+            except Exception:
+                logger.exception("Watcher failed for %s", source.name)
+
+    def get(self, name):
+        """Return the source, stale-while-revalidate.
+
+        With no data yet the caller waits on the (shared) first fetch. Past
+        the TTL the last good payload is returned at once and a single
+        background refresh is kicked off.
+        """
+        source = self.sources[name]
+        if self.shared is not None:
+            return self._follow(source)
+        if source.entry is None:
+            self.refresh(name)
+        elif source.is_stale() and source.breaker.ready():
+            self.refresh_async(name)
+        return source
+
+    def peek(self, name):
+        """Current entry of a source without fetching or waiting"""
+        if self.shared is not None:
+            return self.shared.read(name)
+        return self.sources[name].entry
+
+    def _follow(self, source):
+        """Pick up the leader's latest entry for source (a stat when unchanged)"""
+        entry = self.shared.read(source.name)
+        deadline = time.time() + FOLLOWER_WAIT
+        while entry is None and source.entry is None and time.time() < deadline:
+            time.sleep(0.2)
+            entry = self.shared.read(source.name)
+        if entry is not None and entry is not source.entry:
+            source.entry = entry
+            self.version = max(self.version, entry.version)
+        # This process's breaker never sees a fetch; the leader's decides staleness
+        health = self.shared.read_blob(HEALTH_BLOB) or {}
+        source.leader_state = health.get(source.name, {}).get('state', 'closed')
+        return source
+
+    def health(self):
+        """Breaker state, last error and fetch latency of every source"""
+        return {
+            name: {
+                **source.breaker.status(),
+                "error": source.error,
+                "error_at": source.error_at,
+            }
+            for name, source in self.sources.items()
+        }
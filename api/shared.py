@@ -0,0 +1,159 @@
+"""Cross-process snapshot sharing for multi-worker deployments.
+
+One gunicorn worker holds an exclusive flock on SHARED_DIR/leader.lock and
+runs the scheduler; the others follow. The leader writes every published
+entry to SHARED_DIR/<name>.snap (a JSON header line followed by the body,
+replaced atomically). Followers stat the file on each read and only when
+it changed do they mmap it and take the new body: no upstream traffic, no
+JSON parsing of the body unless a route needs the payload.
+
+SSE events are mirrored into an append-only SHARED_DIR/events.log that
+followers tail.
+"""
+import fcntl
+import json
+import mmap
+import os
+import tempfile
+import threading
+
+from scheduler import Entry
+
+STATE_DIR = os.environ.get('STATE_DIR', os.path.join(tempfile.gettempdir(), 'industrial-monitor'))
+_DEFAULT_SHARED = '/dev/shm/industrial-monitor' if os.path.isdir('/dev/shm') else os.path.join(STATE_DIR, 'shared')
+SHARED_DIR = os.environ.get('SHARED_DIR', _DEFAULT_SHARED)
+
+# The event log is truncated once it grows past this many bytes
+EVENT_LOG_MAX = 4 * 1024 * 1024
+
+
+class SharedSnapshot:
+    def __init__(self, directory=SHARED_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = None
+        # name -> ((inode, mtime_ns, size), entry) last loaded by this process
+        self._loaded = {}
+        self._read_lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.snap")
+
+    def try_lead(self):
+        """Become the leader if nobody else is; True when this process leads"""
+        if self._lock_file is not None:
+            return True
+        f = open(os.path.join(self.directory, 'leader.lock'), 'a+')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def write(self, name, entry, **extra):
+        """Publish an entry for followers (leader only)"""
+        header = {"version": entry.version, "etag": entry.etag, "updated_at": entry.updated_at, **extra}
+        path = self._path(name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(entry.body)
+        os.replace(tmp, path)
+
+    def touch(self, name):
+        """Mark name's published entry as confirmed current without rewriting it"""
+        try:
+            os.utime(self._path(name))
+        except OSError:
+            pass
+
+    def write_blob(self, name, data):
+        """Publish arbitrary JSON state, e.g. the dispatch delta feed"""
+        path = os.path.join(self.directory, f"{name}.json")
+        # Refresh threads of different sources may publish the same blob at once
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    def read_blob(self, name):
+        """Latest blob published under name, re-parsed only if it changed"""
+        path = os.path.join(self.directory, f"{name}.json")
+        try:
+            st = os.stat(path)
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+            loaded = self._loaded.get(path)
+            if loaded and loaded[0] == stamp:
+                return loaded[1]
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._loaded[path] = (stamp, data)
+        return data
+
+    def read(self, name):
+        """Latest entry for name, re-read only if the file changed"""
+        try:
+            st = os.stat(self._path(name))
+        except OSError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        loaded = self._loaded.get(name)
+        if loaded and loaded[0] == stamp:
+            return loaded[1]
+
+        with self._read_lock:
+            try:
+                with open(self._path(name), 'rb') as f:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        split = mm.find(b'\n')
+                        header = json.loads(mm[:split])
+                        # A touch() only moves the mtime; keep the body already read
+                        same = loaded and loaded[1].version == header['version']
+                        body = loaded[1].body if same else mm[split + 1:]
+            except (OSError, ValueError):
+                return loaded[1] if loaded else None
+            updated_at = max(header['updated_at'], st.st_mtime)
+            if same:
+                entry = loaded[1].touched(updated_at)
+            else:
+                entry = Entry(None, body, header['etag'], header['version'], updated_at)
+            self._loaded[name] = (stamp, entry)
+            return entry
+
+    # --- Event log -------------------------------------------------------
+
+    def _event_log(self):
+        return os.path.join(self.directory, 'events.log')
+
+    def append_event(self, event):
+        """Mirror one EventBus event for followers (leader only)"""
+        path = self._event_log()
+        line = json.dumps(list(event)).encode('utf-8') + b'\n'
+        mode = 'ab'
+        try:
+            if os.path.getsize(path) > EVENT_LOG_MAX:
+                mode = 'wb'
+        except OSError:
+            pass
+        with open(path, mode) as f:
+            f.write(line)
+
+    def tail_events(self, offset):
+        """(events, new_offset) appended after offset; restarts if the log was truncated"""
+        try:
+            with open(self._event_log(), 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < offset:
+                    offset = 0
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return [], offset
+        # Only consume complete lines
+        end = data.rfind(b'\n') + 1
+        events = [json.loads(line) for line in data[:end].splitlines() if line]
+        return events, offset + end
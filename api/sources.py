@@ -0,0 +1,586 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import math
+import os
+import re
+
+import classify
+import metrics
+import upstream
+from delta import incident_id
+from geocode import geocoder, geocoder_for
+from reports import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Hourly forecast periods kept with the wind payload
+WIND_FORECAST_HOURS = int(os.environ.get('WIND_FORECAST_HOURS', 24))
+
+TCEQ_URL = "https://www2.tceq.texas.gov/oce/eer/index.cfm"
+# Searched in every combination by regions whose config doesn't list its own
+TCEQ_COUNTIES = os.environ.get('TCEQ_COUNTIES', 'HARRIS').split(',')
+TCEQ_DAY_RANGES = os.environ.get('TCEQ_DAY_RANGES', '7').split(',')
+# Upper bound on simultaneous requests to www2.tceq.texas.gov
+TCEQ_MAX_CONCURRENCY = int(os.environ.get('TCEQ_MAX_CONCURRENCY', 4))
+# Most report pages fetched per refresh; the rest wait for the next one
+TCEQ_REPORT_BATCH = int(os.environ.get('TCEQ_REPORT_BATCH', 100))
+# Report page label -> report field
+TCEQ_REPORT_FIELDS = {
+    'cause': 'cause',
+    'action taken': 'action_taken',
+    'event began': 'began',
+    'event ended': 'ended',
+    'type(s) of air emissions event': 'event_type',
+    'emissions estimation method': 'estimation_method',
+}
+AMOUNT_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?|\.\d+)\s*([A-Za-z][A-Za-z/]*)?')
+
+# Parsed rows of the last good response to each TCEQ search, reused while it is unchanged
+_tceq_searches = {}
+# NWS zone -> alert features of its last good response, reused while it is unchanged
+_zone_alerts = {}
+
+# Upper bound on simultaneous requests to api.weather.gov
+NWS_MAX_CONCURRENCY = int(os.environ.get('NWS_MAX_CONCURRENCY', 5))
+
+# Read timeout of each kind of source's upstream requests
+READ_TIMEOUTS = {'wind': 10, 'caer': 15, 'dispatch': 15, 'tceq-emissions': 15, 'weather-alerts': 10}
+
+# Generation time of an NWS alert list, new on every poll even when no alert changed
+NWS_UPDATED_RE = re.compile(rb'"updated"\s*:\s*"[^"]*"')
+# Generation time of an NWS forecast, new on every regeneration even when the forecast is the same
+NWS_GENERATED_RE = re.compile(rb'"generatedAt"\s*:\s*"[^"]*"')
+# ASP.NET form state that changes on every request even when the board does not
+ASPNET_STATE_RE = re.compile(
+    rb'<input[^>]+name="__(?:VIEWSTATE|VIEWSTATEGENERATOR|EVENTVALIDATION|EVENTTARGET|EVENTARGUMENT)"[^>]*>',
+    re.IGNORECASE)
+
+# Payload served when a source has never produced good data
+FALLBACKS = {
+    'wind': {"speed": "OFFLINE", "direction": "OFFLINE", "is_risk": False},
+    'caer': {"messages": [], "count": 0},
+    'dispatch': {"incidents": [], "total_incidents": 0, "priority_count": 0},
+    'tceq-emissions': {"events": [], "count": 0},
+    'weather-alerts': {"alerts": [], "count": 0},
+}
+
+
+def timeout_budget(kind, config):
+    """Seconds a refresh may take with every request running to its timeouts"""
+    request = upstream.CONNECT_TIMEOUT + READ_TIMEOUTS[kind]
+    if kind == 'weather-alerts':
+        rounds = math.ceil(len(config) / NWS_MAX_CONCURRENCY)
+    elif kind == 'tceq-emissions':
+        # The searches, then a batch of report pages
+        rounds = math.ceil(len(config[0]) / TCEQ_MAX_CONCURRENCY) + math.ceil(TCEQ_REPORT_BATCH / TCEQ_MAX_CONCURRENCY)
+    else:
+        rounds = 1
+    return rounds * request
+
+
+def parse_speed(speed_raw):
+    """Highest number in an NWS speed string ("5 to 10 mph" -> 10)"""
+    numbers = [int(n) for n in re.findall(r'\d+', speed_raw or '')]
+    return max(numbers) if numbers else 0
+
+
+def normalize_forecast(body):
+    """NWS forecast without its generation time, for change detection"""
+    return NWS_GENERATED_RE.sub(b'', body)
+
+
+def fetch_wind(gridpoint, areas=()):
+    """Fetch wind data from NWS API for a gridpoint such as HGX/75,98"""
+    url = f"https://api.weather.gov/gridpoints/{gridpoint}/forecast/hourly"
+    with metrics.stage('wind', 'fetch'):
+        r = upstream.get_changed(url, read_timeout=READ_TIMEOUTS['wind'], normalize=normalize_forecast)
+    if r is None:
+        return upstream.UNCHANGED
+    metrics.PAYLOAD_BYTES.observe(len(r.content), source='wind', kind='upstream')
+    with metrics.stage('wind', 'parse'):
+        payload = parse_wind(r.json(), areas)
+    upstream.commit(r)
+    return payload
+
+
+def exposed_areas(period, areas):
+    """Residential areas inside any facility's plume for period.
+
+    areas is [(facilities, residential_areas)], one pair per region.
+    """
+    if not areas:
+        return []
+    from plume import exposure
+
+    exposed = set()
+    for facilities, residential in areas:
+        names = list(residential)
+        targets = {"residential": (names, [residential[n]['lat'] for n in names],
+                                   [residential[n]['lon'] for n in names])}
+        for hit in exposure([period], facilities, targets)[0]['exposures']:
+            exposed.update(hit['residential'])
+    return sorted(exposed)
+
+
+def _wind_period(p):
+    return {
+        "start": p['startTime'],
+        "direction": p['windDirection'],
+        "speed": p['windSpeed'],
+        "speed_numeric": parse_speed(p['windSpeed']),
+    }
+
+
+def parse_wind(data, areas=()):
+    """Build the wind payload from an NWS hourly forecast"""
+    periods = data['properties']['periods']
+    current = periods[0]
+    now = _wind_period(current)
+    exposed = exposed_areas(now, areas)
+
+    return {
+        "speed": now['speed'],
+        "speed_numeric": now['speed_numeric'],
+        "direction": now['direction'],
+        "forecast": current['shortForecast'],
+        "temperature": current['temperature'],
+        # The current hour's plumes reach a residential area
+        "is_risk": bool(exposed),
+        "risk_areas": exposed,
+        # Upcoming hours, used by the plume exposure model
+        "periods": [_wind_period(p) for p in periods[:WIND_FORECAST_HOURS]],
+        "forecast_updated": data['properties'].get('updateTime'),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def fetch_caer(url):
+    """Scrape CAER community alert messages"""
+    with metrics.stage('caer', 'fetch'):
+        r = upstream.get_changed(url, read_timeout=READ_TIMEOUTS['caer'])
+    if r is None:
+        return upstream.UNCHANGED
+    r.raise_for_status()
+    metrics.PAYLOAD_BYTES.observe(len(r.content), source='caer', kind='upstream')
+    payload = parse_caer(r.text)
+    upstream.commit(r)
+    return payload
+
+
+def parse_caer(html):
+    """Build the CAER payload from the live message page"""
+    # Parser libraries load with the first parse, not at startup
+    from bs4 import BeautifulSoup, NavigableString
+
+    messages = []
+    with metrics.Stages('caer') as timer:
+        with timer('parse'):
+            soup = BeautifulSoup(html, 'html.parser')
+            headers = soup.find_all('h5')
+
+        for header in headers:
+            with timer('clean'):
+                title = header.get_text(strip=True)
+                parts = []
+                curr = header.next_sibling
+
+                while curr and curr.name != 'h5':
+                    # Tags answer hasattr() for any name (bs4 treats it as find), so test the type
+                    if isinstance(curr, NavigableString):
+                        text_part = curr.strip()
+                    else:
+                        text_part = curr.get_text(' ', strip=True)
+                    if len(text_part) > 1:
+                        parts.append(text_part)
+                    curr = curr.next_sibling
+                body_text = ' '.join(parts)
+
+            # Severity classification
+            with timer('classify'):
+                severity, terms = classify.CAER.classify(title + ' ' + body_text)
+
+            messages.append({
+                "title": title,
+                "body": body_text,
+                "severity": severity,
+                "matched_terms": terms,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+    metrics.RECORDS_PARSED.inc(len(messages), source='caer')
+
+    return {
+        "messages": messages,
+        "count": len(messages),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def fetch_dispatch(url, keymap=None):
+    """Scrape a Combined.aspx active incidents board, placing incidents with keymap"""
+    with metrics.stage('dispatch', 'fetch'):
+        r = upstream.get_changed(url, read_timeout=READ_TIMEOUTS['dispatch'], normalize=normalize_aspnet)
+    if r is None:
+        return upstream.UNCHANGED
+    r.raise_for_status()
+    metrics.PAYLOAD_BYTES.observe(len(r.content), source='dispatch', kind='upstream')
+    payload = parse_dispatch(r.content, geocoder_for(keymap))
+    upstream.commit(r)
+    return payload
+
+
+def normalize_aspnet(body):
+    """Page body without the per-request ASP.NET form state, for change detection"""
+    return ASPNET_STATE_RE.sub(b'', body)
+
+
+# Fields of a dispatch incident, in the order of the table format
+DISPATCH_FIELDS = [
+    'id', 'Agency', 'Address', 'Cross Street', 'Key Map', 'Call Time', 'Incident Type',
+    'Combined Response', 'severity', 'matched_terms', 'has_location', 'lat', 'lon',
+]
+
+
+def parse_dispatch(html, geocoder=geocoder):
+    """Build the dispatch payload from a Combined.aspx page"""
+    from parsers import iter_dispatch_rows
+
+    # Clean ALL incidents first
+    all_incidents_cleaned = []
+    with metrics.Stages('dispatch') as timer:
+        for inc in timer.iterate('parse', iter_dispatch_rows(html)):
+            with timer('clean'):
+                # Skip if not a valid incident
+                agency = str(inc.get('Agency', ''))
+                if agency not in ['FD', 'PD']:
+                    continue
+
+                cleaned = {
+                    'Agency': str(inc.get('Agency', '')),
+                    'Address': str(inc.get('Address', '')),
+                    'Cross Street': str(inc.get('Cross Street', '')),
+                    'Key Map': str(inc.get('Key Map', '')),
+                    'Call Time': str(inc.get('Call Time', '') or inc.get('Call Time(Opened)', '')),
+                    'Incident Type': str(inc.get('Incident Type', '')),
+                    'Combined Response': str(inc.get('Combined Response', 'N'))
+                }
+                cleaned['id'] = incident_id(cleaned)
+
+            # Keyword classification over the text fields
+            with timer('classify'):
+                text = ' '.join([cleaned['Address'], cleaned['Cross Street'], cleaned['Incident Type']])
+                cleaned['severity'], cleaned['matched_terms'] = classify.DISPATCH.classify(text)
+
+            # Add geocoding from the Key Map cell
+            with timer('geocode'):
+                location = geocoder.locate(cleaned['Address'], cleaned['Key Map'])
+            if location:
+                cleaned['has_location'] = True
+                cleaned['lat'], cleaned['lon'] = location
+            else:
+                cleaned['has_location'] = False
+
+            all_incidents_cleaned.append(cleaned)
+
+        with timer('geocode'):
+            geocoder.flush()
+    metrics.RECORDS_PARSED.inc(len(all_incidents_cleaned), source='dispatch')
+
+    # Any keyword match makes an incident high priority
+    priority_incidents = [inc for inc in all_incidents_cleaned if inc['matched_terms']]
+
+    return {
+        "incidents": priority_incidents,
+        "all_incidents": all_incidents_cleaned,
+        "total_incidents": len(all_incidents_cleaned),
+        "priority_count": len(priority_incidents),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def fetch_tceq_search(params):
+    """One TCEQ search results page, or None if unchanged since it was last parsed"""
+    r = upstream.get_changed(TCEQ_URL, params=params, read_timeout=READ_TIMEOUTS['tceq-emissions'])
+    if r is None:
+        return None
+    r.raise_for_status()
+    metrics.PAYLOAD_BYTES.observe(len(r.content), source='tceq-emissions', kind='upstream')
+    return r
+
+
+def fetch_tceq_report(incident_number):
+    """Parsed detail page of one emission event report"""
+    r = upstream.get(TCEQ_URL, params={'fuseaction': 'main.getDetails', 'target': incident_number},
+                     read_timeout=READ_TIMEOUTS['tceq-emissions'])
+    r.raise_for_status()
+    metrics.PAYLOAD_BYTES.observe(len(r.content), source='tceq-emissions', kind='upstream')
+    return parse_tceq_report(r.text)
+
+
+def fetch_tceq_emissions(searches, counties):
+    """Fetch TCEQ air emission events in counties, with their reports.
+
+    searches are the (county, dayRange) pairs to search.
+    """
+    searches = [
+        {'fuseaction': 'main.searchResults', 'county': county, 'dayRange': days}
+        for county, days in searches
+    ]
+    counties = {c.upper() for c in counties}
+    # All searches at once; a failed or unchanged one keeps its last parsed rows
+    with metrics.stage('tceq-emissions', 'fetch'):
+        results = fan_out(fetch_tceq_search, searches, TCEQ_MAX_CONCURRENCY)
+    if results and all(error for _, _, error in results):
+        raise results[0][2]
+    parsed = {}
+    for params, r, error in results:
+        if error is not None:
+            logger.warning("TCEQ search %s: %s", params, error)
+        elif r is not None:
+            parsed[tuple(params.items())] = (r, parse_tceq_search(r.text, counties))
+
+    rows = {}
+    for params in searches:
+        key = tuple(params.items())
+        events = parsed[key][1] if key in parsed else _tceq_searches.get(key, [])
+        for event in events:
+            rows.setdefault(event['incident_number'], event)
+
+    # Reports are fetched once per event; only new (or still preliminary) ones go out
+    missing = report_cache.missing(list(rows))[:TCEQ_REPORT_BATCH]
+    with metrics.stage('tceq-emissions', 'reports'):
+        fetched = fan_out(fetch_tceq_report, missing, TCEQ_MAX_CONCURRENCY)
+    for number, report, error in fetched:
+        if error is None:
+            report_cache.put(number, report)
+        else:
+            logger.warning("TCEQ report %s: %s", number, error)
+    report_cache.flush()
+
+    if results and not parsed and not any(error is None for _, _, error in fetched):
+        return upstream.UNCHANGED
+    payload = build_tceq_payload(list(rows.values()), report_cache)
+    for key, (r, events) in parsed.items():
+        _tceq_searches[key] = events
+        upstream.commit(r)
+    return payload
+
+
+def parse_tceq_search(html, counties=None):
+    """Events listed on one TCEQ search results page, only those in counties if given"""
+    from bs4 import BeautifulSoup
+
+    events = []
+    with metrics.Stages('tceq-emissions') as timer:
+        with timer('parse'):
+            soup = BeautifulSoup(html, 'html.parser')
+            # Look for table rows with emission event data
+            tables = soup.find_all('table')
+        for table in tables:
+            with timer('parse'):
+                rows = table.find_all('tr')
+            for row in rows[1:]:  # Skip header
+                with timer('clean'):
+                    cols = row.find_all(['td', 'th'])
+                    if len(cols) < 4:
+                        continue
+                    event = {
+                        'incident_number': cols[0].get_text(strip=True),
+                        'facility': cols[1].get_text(strip=True),
+                        'date': cols[2].get_text(strip=True),
+                        'county': cols[3].get_text(strip=True),
+                        'type': cols[4].get_text(strip=True) if len(cols) > 4 else '',
+                    }
+                if event['incident_number'] and (counties is None or event['county'].upper() in counties):
+                    events.append(event)
+    return events
+
+
+def parse_tceq_report(html):
+    """Cause, contaminants and amounts released from an emission event report page"""
+    from bs4 import BeautifulSoup
+
+    with metrics.stage('tceq-emissions', 'parse'):
+        soup = BeautifulSoup(html, 'html.parser')
+        fields = {}
+        contaminants = []
+        for table in soup.find_all('table'):
+            rows = table.find_all('tr')
+            header = [c.get_text(' ', strip=True).lower() for c in rows[0].find_all(['th', 'td'])] if rows else []
+            if 'contaminant' in header:
+                for row in rows[1:]:
+                    cells = [c.get_text(' ', strip=True) for c in row.find_all(['td', 'th'])]
+                    if len(cells) != len(header):
+                        continue
+                    record = dict(zip(header, cells))
+                    amount, units = parse_amount(record.get('amount released', ''))
+                    contaminants.append({
+                        'contaminant': record['contaminant'],
+                        'source': record.get('source name', ''),
+                        'amount': amount,
+                        'units': units,
+                        'limit': record.get('limit', ''),
+                    })
+                continue
+            # Everything else is label/value rows
+            for row in rows:
+                cells = row.find_all(['th', 'td'])
+                if len(cells) == 2:
+                    fields[cells[0].get_text(' ', strip=True).rstrip(':').lower()] = cells[1].get_text(' ', strip=True)
+
+    released = {}
+    for c in contaminants:
+        if c['amount'] is not None:
+            released[c['units']] = round(released.get(c['units'], 0) + c['amount'], 3)
+    report = {key: fields.get(label, '') for label, key in TCEQ_REPORT_FIELDS.items()}
+    report['final'] = any('based on' in label and 'FINAL' in value.upper() for label, value in fields.items())
+    report['contaminants'] = contaminants
+    report['total_released'] = released
+    return report
+
+
+def parse_amount(text):
+    """(amount, units) from text like "1,204.75 lbs (est.)"; (None, '') if there is no number"""
+    m = AMOUNT_RE.search(text)
+    if not m:
+        return None, ''
+    return float(m.group(1).replace(',', '')), (m.group(2) or '').lower()
+
+
+def build_tceq_payload(events, reports):
+    """Classify search rows with their reports (None until fetched) into the TCEQ payload"""
+    classified = []
+    with metrics.stage('tceq-emissions', 'classify'):
+        for row in events:
+            report = reports.get(row['incident_number'])
+            # Rows are kept between refreshes, so each payload gets its own copies
+            event = {**row, 'description': report['cause'] if report else '', 'report': report}
+            # Check for critical keywords in what happened, not just who reported it
+            text = ' '.join([event['facility'], event['type'], event['description']])
+            event['severity'], event['matched_terms'] = classify.TCEQ.classify(text)
+            classified.append(event)
+    metrics.RECORDS_PARSED.inc(len(classified), source='tceq-emissions')
+
+    return {
+        "events": classified,
+        "count": len(classified),
+        "source": "TCEQ Air Emission Event Reports",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def parse_tceq_emissions(html, reports=None, counties=None):
+    """Build the TCEQ payload from one emission event search results page"""
+    return build_tceq_payload(parse_tceq_search(html, counties), reports or {})
+
+
+def fan_out(fn, items, max_workers):
+    """Call fn(item) for every item concurrently, at most max_workers at a time.
+
+    Returns (item, result, error) tuples in the order of items. Workers
+    inherit the caller's upstream.unconditional() state.
+    """
+    unconditional = upstream.is_unconditional()
+
+    def run(item):
+        try:
+            with upstream.unconditional(unconditional):
+                return item, fn(item), None
+        except Exception as e:
+            return item, None, e
+
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(run, items))
+
+
+def normalize_nws(body):
+    """NWS alert list without its generation time, for change detection"""
+    return NWS_UPDATED_RE.sub(b'', body)
+
+
+def fetch_zone_alerts(zone):
+    """One NWS forecast zone's alerts response, or None if unchanged since it was last parsed"""
+    url = f"https://api.weather.gov/alerts/active?zone={zone}"
+    r = upstream.get_changed(url, headers={'Accept': 'application/geo+json'}, read_timeout=READ_TIMEOUTS['weather-alerts'],
+                             normalize=normalize_nws)
+    if r is None:
+        return None
+    r.raise_for_status()
+    metrics.PAYLOAD_BYTES.observe(len(r.content), source='weather-alerts', kind='upstream')
+    return r
+
+
+def fetch_weather_alerts(zones):
+    """Fetch NWS active weather alerts for every zone in zones"""
+    # Query all zones at once; latency tracks the slowest zone, not the sum
+    with metrics.stage('weather-alerts', 'fetch'):
+        results = fan_out(fetch_zone_alerts, zones, NWS_MAX_CONCURRENCY)
+    if results and all(error for _, _, error in results):
+        raise results[0][2]
+    changed = {}
+    for zone, r, error in results:
+        if error is not None:
+            logger.warning("NWS alerts %s: %s", zone, error)
+        elif r is not None:
+            changed[zone] = (r, r.json().get('features', []))
+    if not changed:
+        return upstream.UNCHANGED
+    # A failed or unchanged zone keeps its last alerts
+    payload = parse_weather_alerts(
+        [changed[zone][1] if zone in changed else _zone_alerts.get(zone, []) for zone in zones], zones)
+    for zone, (r, features) in changed.items():
+        _zone_alerts[zone] = features
+        upstream.commit(r)
+    return payload
+
+
+def parse_weather_alerts(zone_features, zones=None):
+    """Build the alerts payload from each zone's list of NWS alert features.
+
+    zones names the zone of each list; every alert records the ones it was listed under.
+    """
+    with metrics.stage('weather-alerts', 'parse'):
+        all_alerts = []
+        seen = {}
+        for i, features in enumerate(zone_features):
+            zone = zones[i] if zones else None
+            for feature in features or []:
+                props = feature.get('properties', {})
+                # The same alert is listed under every zone it covers
+                alert_id = props.get('id') or feature.get('id')
+                if alert_id in seen:
+                    if zone:
+                        seen[alert_id]['zones'].append(zone)
+                    continue
+                alert = {
+                    'id': alert_id,
+                    'event': props.get('event', 'Unknown'),
+                    'headline': props.get('headline', ''),
+                    'description': props.get('description', '')[:500],
+                    'severity': props.get('severity', 'Unknown'),
+                    'urgency': props.get('urgency', 'Unknown'),
+                    'areas': props.get('areaDesc', ''),
+                    'effective': props.get('effective', ''),
+                    'expires': props.get('expires', ''),
+                    'zones': [zone] if zone else [],
+                }
+                seen[alert_id] = alert
+                # Map NWS severity to our scale
+                if alert['severity'] in ['Extreme', 'Severe']:
+                    alert['display_severity'] = 'critical'
+                elif alert['severity'] == 'Moderate':
+                    alert['display_severity'] = 'warning'
+                else:
+                    alert['display_severity'] = 'info'
+                all_alerts.append(alert)
+    metrics.RECORDS_PARSED.inc(len(all_alerts), source='weather-alerts')
+
+    return {
+        "alerts": all_alerts,
+        "count": len(all_alerts),
+        "zones": list(zones or []),
+        "source": "National Weather Service",
+        "timestamp": datetime.utcnow().isoformat()
+    }
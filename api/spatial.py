@@ -0,0 +1,93 @@
+"""Vectorized proximity search.
+
+GridIndex buckets points into a lat/lon grid whose cells are at least the
+search radius wide, so every match for a query lies in the 3x3 block of
+cells around it. Candidate pairs for any number of queries are produced
+with array operations (no Python loop per point) and then checked with a
+vectorized haversine.
+
+numpy is imported on first use, so importing haversine_km for plain
+numbers (history, correlation, subscriptions) does not load it.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; arguments broadcast like numpy arrays"""
+    if all(isinstance(v, (int, float)) for v in (lat1, lon1, lat2, lon2)):
+        lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+    import numpy as np
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class GridIndex:
+    def __init__(self, lat, lon, cell_km):
+        import numpy as np
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_km = cell_km
+        # Size lon cells for the northernmost point so they are never too narrow
+        max_lat = np.abs(self.lat).max() if len(self.lat) else 0.0
+        self.dlat = cell_km / KM_PER_DEG_LAT
+        self.dlon = cell_km / (KM_PER_DEG_LAT * max(np.cos(np.radians(min(max_lat + self.dlat, 89.0))), 0.01))
+
+        keys = self._keys(self.lat, self.lon)
+        self.order = np.argsort(keys, kind='stable')
+        self.cells, self.starts, self.counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+
+    def _rows_cols(self, lat, lon):
+        import numpy as np
+        return np.floor(lat / self.dlat).astype(np.int64), np.floor(lon / self.dlon).astype(np.int64)
+
+    @staticmethod
+    def _key(rows, cols):
+        return rows * 1_000_000 + cols
+
+    def _keys(self, lat, lon):
+        return self._key(*self._rows_cols(lat, lon))
+
+    def pairs(self, qlat, qlon, radius_km):
+        """(query_idx, point_idx, distance_km) arrays for every point within radius_km"""
+        if radius_km > self.cell_km:
+            raise ValueError("radius larger than the index cell size")
+        import numpy as np
+        qlat = np.atleast_1d(np.asarray(qlat, dtype=float))
+        qlon = np.atleast_1d(np.asarray(qlon, dtype=float))
+        empty = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0))
+        if not len(self.cells) or not len(qlat):
+            return empty
+
+        rows, cols = self._rows_cols(qlat, qlon)
+        q_parts, p_parts = [], []
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                keys = self._key(rows + dr, cols + dc)
+                pos = np.searchsorted(self.cells, keys)
+                pos = np.minimum(pos, len(self.cells) - 1)
+                hit = self.cells[pos] == keys
+                if not hit.any():
+                    continue
+                q = np.nonzero(hit)[0]
+                starts = self.starts[pos[hit]]
+                counts = self.counts[pos[hit]]
+                # Expand each (query, cell) hit into one row per point in the cell
+                q_rep = np.repeat(q, counts)
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                q_parts.append(q_rep)
+                p_parts.append(self.order[np.repeat(starts, counts) + offsets])
+
+        if not q_parts:
+            return empty
+        q_idx = np.concatenate(q_parts)
+        p_idx = np.concatenate(p_parts)
+        dist = haversine_km(qlat[q_idx], qlon[q_idx], self.lat[p_idx], self.lon[p_idx])
+        keep = dist <= radius_km
+        return q_idx[keep], p_idx[keep], dist[keep]
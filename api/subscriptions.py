@@ -0,0 +1,603 @@
+"""Webhook subscriptions to new records of the refresh pipeline.
+
+A subscription names an endpoint url and filters, all optional:
+
+    sources       kinds of record (dispatch, caer, ...)
+    regions       ids of the regions whose records it wants
+    min_severity  info, warning or critical
+    keywords      any of these, matched at the start of a word
+    lat/lon/radius_km
+                  a geofence; records without coordinates never match it
+
+Records are matched without scanning the subscriptions. SubscriptionIndex
+keeps a grid over the geofences (the ~5 km cells of the history store) and
+inverted postings per source, region, severity and keyword; keywords are found with
+one compiled Classifier over every subscribed term. A record's candidates
+are the members of its most selective postings, intersected with the rest.
+
+Matches go into a persistent outbox (SQLite, next to the history) that a
+background thread drains: due deliveries are grouped by endpoint, sent as
+one POST of up to WEBHOOK_BATCH records, and limited to WEBHOOK_RATE
+batches a second per endpoint. Failed batches back off exponentially until
+WEBHOOK_MAX_ATTEMPTS, and a failing endpoint is paused as a whole. Every
+(subscription, record) is delivered once: the outbox keeps delivered rows
+for WEBHOOK_RETENTION seconds and ignores matches it already holds.
+"""
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import unquote, urlsplit
+
+import encoding
+import metrics
+from classify import SEVERITY_RANK, Classifier
+from correlate import record_text
+from history import cell_for, cells_near, records_for
+from shared import STATE_DIR
+from sources import FALLBACKS, fan_out
+from spatial import haversine_km
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get('SUBSCRIPTIONS_DB_PATH', os.path.join(STATE_DIR, 'subscriptions.sqlite3'))
+# Most records in one webhook POST
+WEBHOOK_BATCH = int(os.environ.get('WEBHOOK_BATCH', 50))
+# Batches per second, and burst, allowed to one endpoint
+WEBHOOK_RATE = float(os.environ.get('WEBHOOK_RATE', 2))
+WEBHOOK_BURST = int(os.environ.get('WEBHOOK_BURST', 5))
+# Simultaneous POSTs across all endpoints
+WEBHOOK_MAX_CONCURRENCY = int(os.environ.get('WEBHOOK_MAX_CONCURRENCY', 8))
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+# Attempts before a delivery is given up as dead
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 8))
+# Seconds before the first retry; doubles per attempt up to WEBHOOK_RETRY_MAX
+WEBHOOK_RETRY_BASE = float(os.environ.get('WEBHOOK_RETRY_BASE', 5))
+WEBHOOK_RETRY_MAX = float(os.environ.get('WEBHOOK_RETRY_MAX', 3600))
+# Seconds delivered and dead rows are kept
+WEBHOOK_RETENTION = float(os.environ.get('WEBHOOK_RETENTION', 7 * 86400))
+# Seconds the delivery thread sleeps when nothing is due
+WEBHOOK_POLL = float(os.environ.get('WEBHOOK_POLL', 1.0))
+# Bearer token the subscription routes require; unset disables them
+SUBSCRIPTIONS_TOKEN = os.environ.get('SUBSCRIPTIONS_TOKEN', '')
+# Allow webhooks to loopback and private addresses (local testing only)
+WEBHOOK_ALLOW_PRIVATE = os.environ.get('WEBHOOK_ALLOW_PRIVATE', '0') == '1'
+
+MAX_KEYWORDS = 20
+SOURCES = list(FALLBACKS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY,
+    subscription TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    UNIQUE (subscription, source, key)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+CREATE INDEX IF NOT EXISTS idx_outbox_endpoint ON outbox (endpoint, status, next_attempt);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _strings(data, field):
+    value = data.get(field) or []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"{field} must be a list of strings")
+    return [v.strip() for v in value if v.strip()]
+
+
+class BlockedEndpoint(ValueError):
+    """A webhook url that resolves to a loopback, private or otherwise non-public address"""
+
+
+def check_endpoint(url):
+    """Resolve url's host; an address to connect to, or BlockedEndpoint unless all are public"""
+    host = urlsplit(url).hostname
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise BlockedEndpoint(f"Cannot resolve {host}: {e}")
+    addresses = [ipaddress.ip_address(info[4][0].split('%', 1)[0]) for info in infos]
+    if not WEBHOOK_ALLOW_PRIVATE:
+        for address in addresses:
+            mapped = getattr(address, 'ipv4_mapped', None)
+            if not address.is_global or (mapped is not None and not mapped.is_global):
+                raise BlockedEndpoint(f"{host} resolves to non-public address {address}")
+    return str(addresses[0])
+
+
+def validate(data, known_regions=None):
+    """Normalized subscription fields from a request body; ValueError if malformed"""
+    url = data.get('url')
+    parts = urlsplit(url) if isinstance(url, str) else None
+    if parts is None or parts.scheme not in ('http', 'https') or not parts.netloc:
+        raise ValueError("url must be an http or https URL")
+    check_endpoint(url)
+    sources = _strings(data, 'sources')
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown sources: {', '.join(unknown)}")
+    regions = _strings(data, 'regions')
+    unknown = [r for r in regions if known_regions is not None and r not in known_regions]
+    if unknown:
+        raise ValueError(f"Unknown regions: {', '.join(unknown)}")
+    min_severity = data.get('min_severity')
+    if min_severity is not None and min_severity not in SEVERITY_RANK:
+        raise ValueError("min_severity must be info, warning or critical")
+    keywords = _strings(data, 'keywords')
+    if len(keywords) > MAX_KEYWORDS:
+        raise ValueError(f"At most {MAX_KEYWORDS} keywords")
+
+    lat = lon = radius_km = None
+    if data.get('lat') is not None or data.get('lon') is not None:
+        try:
+            lat, lon = float(data['lat']), float(data['lon'])
+            radius_km = float(data.get('radius_km', 5))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("A geofence needs numeric lat, lon and radius_km")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat/lon out of range")
+        if not 0.1 <= radius_km <= 200:
+            raise ValueError("radius_km must be between 0.1 and 200")
+
+    return {
+        "url": url,
+        "name": str(data.get('name') or ''),
+        "sources": sources,
+        "regions": regions,
+        "min_severity": min_severity,
+        "keywords": keywords,
+        "facility": data.get('facility'),
+        "lat": lat,
+        "lon": lon,
+        "radius_km": radius_km,
+    }
+
+
+class SubscriptionIndex:
+    """Subscriptions indexed by geofence cell, source, severity and keyword"""
+
+    def __init__(self, subscriptions=()):
+        self.subscriptions = {}
+        # Geofences by the history grid cells they cover; fences too big to list are checked one by one
+        self.cells = {}
+        self.wide = set()
+        self.unfenced = set()
+        self.by_source = {}
+        self.any_source = set()
+        self.by_region = {}
+        self.any_region = set()
+        # severity -> subscriptions whose min_severity it meets
+        self.by_severity = {s: set() for s in SEVERITY_RANK}
+        # lowercased keyword -> subscriptions
+        self.by_keyword = {}
+        self.any_keyword = set()
+        self._keywords = None
+        for sub in subscriptions:
+            self.add(sub)
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def add(self, sub):
+        id = sub['id']
+        self.subscriptions[id] = sub
+        if sub['radius_km'] is None:
+            self.unfenced.add(id)
+        else:
+            cells = cells_near(sub['lat'], sub['lon'], sub['radius_km'])
+            if cells is None:
+                self.wide.add(id)
+            for cell in cells or ():
+                self.cells.setdefault(cell, set()).add(id)
+        for source in sub['sources']:
+            self.by_source.setdefault(source, set()).add(id)
+        if not sub['sources']:
+            self.any_source.add(id)
+        for region in sub.get('regions', ()):
+            self.by_region.setdefault(region, set()).add(id)
+        if not sub.get('regions'):
+            self.any_region.add(id)
+        floor = SEVERITY_RANK[sub['min_severity'] or 'info']
+        for severity, rank in SEVERITY_RANK.items():
+            if rank >= floor:
+                self.by_severity[severity].add(id)
+        for keyword in sub['keywords']:
+            self.by_keyword.setdefault(keyword.lower(), set()).add(id)
+        if not sub['keywords']:
+            self.any_keyword.add(id)
+        self._keywords = None
+
+    def remove(self, id):
+        sub = self.subscriptions.pop(id, None)
+        if sub is None:
+            return
+        for postings in [self.unfenced, self.wide, self.any_source, self.any_region, self.any_keyword,
+                         *self.by_severity.values()]:
+            postings.discard(id)
+        if sub['radius_km'] is not None:
+            for cell in cells_near(sub['lat'], sub['lon'], sub['radius_km']) or ():
+                self._discard(self.cells, cell, id)
+        for source in sub['sources']:
+            self._discard(self.by_source, source, id)
+        for region in sub.get('regions', ()):
+            self._discard(self.by_region, region, id)
+        for keyword in sub['keywords']:
+            self._discard(self.by_keyword, keyword.lower(), id)
+        self._keywords = None
+
+    @staticmethod
+    def _discard(index, key, id):
+        postings = index.get(key)
+        if postings is not None:
+            postings.discard(id)
+            if not postings:
+                del index[key]
+
+    @property
+    def keywords(self):
+        # One regex over every subscribed keyword, rebuilt after changes
+        if self._keywords is None:
+            self._keywords = Classifier([(k, 'info', 'prefix') for k in self.by_keyword])
+        return self._keywords
+
+    def match(self, source, severity, lat, lon, text, regions=()):
+        """Ids of the subscriptions a record of the given regions matches"""
+        located = lat is not None and lon is not None
+        # For each filter, the postings whose union passes it
+        filters = [
+            [self.cells.get(cell_for(lat, lon), set()), self.wide, self.unfenced] if located else [self.unfenced],
+            [self.by_source.get(source, set()), self.any_source],
+            [self.by_region[r] for r in regions if r in self.by_region] + [self.any_region],
+            [self.by_severity.get(severity or 'info', set())],
+        ]
+        terms = self.keywords.matches_all(text) if self.by_keyword and text else []
+        filters.append([self.by_keyword[t.lower()] for t in terms] + [self.any_keyword])
+        # Start from the smallest filter and intersect with the others
+        filters.sort(key=lambda postings: sum(map(len, postings)))
+        candidates = set().union(*filters[0])
+        for postings in filters[1:]:
+            if not candidates:
+                break
+            kept = set()
+            for p in postings:
+                kept |= candidates & p
+            candidates = kept
+        matched = []
+        for id in candidates:
+            sub = self.subscriptions[id]
+            if sub['radius_km'] is not None and haversine_km(sub['lat'], sub['lon'], lat, lon) > sub['radius_km']:
+                continue
+            matched.append(id)
+        return matched
+
+
+class SubscriptionStore:
+    """Subscriptions and their webhook outbox, in SQLite"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def revision(self):
+        """Number bumped by every create and delete, from any process"""
+        row = self._connect().execute("SELECT value FROM meta WHERE name = 'revision'").fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, conn):
+        conn.execute("INSERT INTO meta (name, value) VALUES ('revision', 1) "
+                     "ON CONFLICT (name) DO UPDATE SET value = value + 1")
+
+    def create(self, data, known_regions=None):
+        """Store a new subscription; ValueError if data is malformed"""
+        sub = {"id": uuid.uuid4().hex, **validate(data, known_regions), "created_at": datetime.utcnow().isoformat()}
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT INTO subscriptions (id, created_at, data) VALUES (?, ?, ?)',
+                         (sub['id'], time.time(), json.dumps(sub)))
+            self._bump(conn)
+        return sub
+
+    def delete(self, id):
+        """True if the subscription existed"""
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute('DELETE FROM subscriptions WHERE id = ?', (id,)).rowcount
+            conn.execute("DELETE FROM outbox WHERE subscription = ? AND status = 'pending'", (id,))
+            if deleted:
+                self._bump(conn)
+        return bool(deleted)
+
+    def get(self, id):
+        row = self._connect().execute('SELECT data FROM subscriptions WHERE id = ?', (id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, limit=None, offset=0):
+        """Subscriptions, oldest first"""
+        rows = self._connect().execute(
+            'SELECT data FROM subscriptions ORDER BY created_at, id LIMIT ? OFFSET ?',
+            (-1 if limit is None else limit, offset)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def enqueue(self, rows):
+        """Queue (subscription, endpoint, source, key, data) deliveries; ones already held are ignored"""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO outbox (subscription, endpoint, source, key, data, created_at, next_attempt) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', [(*row, now, now) for row in rows])
+            return conn.total_changes - before
+
+    def due_endpoints(self, now):
+        rows = self._connect().execute(
+            "SELECT DISTINCT endpoint FROM outbox WHERE status = 'pending' AND next_attempt <= ?", (now,)).fetchall()
+        return [endpoint for endpoint, in rows]
+
+    def due(self, endpoint, now, limit):
+        """[(seq, subscription, source, key, data)] due for endpoint, oldest first"""
+        return self._connect().execute(
+            "SELECT seq, subscription, source, key, data FROM outbox "
+            "WHERE endpoint = ? AND status = 'pending' AND next_attempt <= ? ORDER BY seq LIMIT ?",
+            (endpoint, now, limit)).fetchall()
+
+    def delivered(self, seqs):
+        conn = self._connect()
+        with conn:
+            conn.execute(f"UPDATE outbox SET status = 'delivered', attempts = attempts + 1, last_error = NULL "
+                         f"WHERE seq IN ({','.join('?' * len(seqs))})", seqs)
+
+    def failed(self, seqs, error, now, permanent=False):
+        """Record a failed attempt; the rows are retried later, or marked dead. Returns how many died"""
+        conn = self._connect()
+        marks = ','.join('?' * len(seqs))
+        with conn:
+            conn.execute(
+                f"UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                f"status = CASE WHEN ? OR attempts + 1 >= ? THEN 'dead' ELSE 'pending' END, "
+                f"next_attempt = ? + MIN(?, ? * (1 << attempts)) WHERE seq IN ({marks})",
+                [error, permanent, WEBHOOK_MAX_ATTEMPTS, now, WEBHOOK_RETRY_MAX, WEBHOOK_RETRY_BASE, *seqs])
+            return conn.execute(f"SELECT COUNT(*) FROM outbox WHERE status = 'dead' AND seq IN ({marks})",
+                                seqs).fetchone()[0]
+
+    def prune(self, before):
+        """Forget delivered and dead rows created before the given time"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM outbox WHERE status != 'pending' AND created_at < ?", (before,))
+
+    def stats(self):
+        conn = self._connect()
+        statuses = {status: {"count": count, "oldest": oldest} for status, count, oldest in conn.execute(
+            'SELECT status, COUNT(*), MIN(created_at) FROM outbox GROUP BY status')}
+        endpoints = conn.execute(
+            "SELECT endpoint, COUNT(*), MIN(created_at), MAX(attempts), MAX(last_error) FROM outbox "
+            "WHERE status = 'pending' GROUP BY endpoint ORDER BY COUNT(*) DESC LIMIT 20").fetchall()
+        subscriptions = conn.execute('SELECT COUNT(*) FROM subscriptions').fetchone()[0]
+        return statuses, endpoints, subscriptions
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Notifier:
+    """Matches new records against the subscriptions and delivers the outbox"""
+
+    def __init__(self, store, rate=WEBHOOK_RATE, burst=WEBHOOK_BURST, batch=WEBHOOK_BATCH):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.batch = batch
+        self.index = None
+        self.revision = None
+        self.buckets = {}
+        # endpoint -> (consecutive failed batches, paused until)
+        self.failing = {}
+        self._queue = queue.Queue()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _current_index(self):
+        # Subscriptions may be created by any worker; rebuild when the store says they changed
+        revision = self.store.revision()
+        with self._lock:
+            if self.index is None or revision != self.revision:
+                self.index = SubscriptionIndex(self.store.list())
+                self.revision = revision
+            return self.index
+
+    def notify(self, source, old, new, feed=None, regions_for=None):
+        """Match the records in payload new that were not in old; queue the deliveries.
+
+        feed names the feed the payloads came from; regions_for(record) gives
+        the ids of the regions a record concerns.
+        """
+        if old is None:
+            # A first snapshot is the baseline, not news
+            return 0
+        index = self._current_index()
+        if not len(index):
+            return 0
+        known = {key for key, *_, record in records_for(source, old) if self._ready(source, record)}
+        rows = []
+        with metrics.stage(source, 'subscriptions'):
+            for key, severity, lat, lon, title, record in records_for(source, new):
+                if key in known or not self._ready(source, record):
+                    continue
+                regions = regions_for(record) if regions_for else []
+                ids = index.match(source, severity, lat, lon, record_text(source, record), regions)
+                if not ids:
+                    continue
+                data = json.dumps({"source": source, "feed": feed, "regions": regions, "key": key,
+                                   "severity": severity, "title": title, "lat": lat, "lon": lon, "record": record})
+                rows.extend((id, index.subscriptions[id]['url'], source, key, data) for id in ids)
+        if rows:
+            metrics.WEBHOOK_DELIVERIES.inc(len(rows), result='matched')
+            self._queue.put(rows)
+            self._wake.set()
+        return len(rows)
+
+    @staticmethod
+    def _ready(source, record):
+        # TCEQ events are news once their report says what happened
+        return source != 'tceq-emissions' or record.get('report') is not None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='webhook-delivery', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        pruned = 0
+        while True:
+            try:
+                self.flush()
+                sent = self.deliver()
+                if time.time() - pruned > 3600:
+                    self.store.prune(time.time() - WEBHOOK_RETENTION)
+                    pruned = time.time()
+            except Exception:
+                logger.exception("Webhook delivery pass failed")
+                sent = 0
+            if not sent:
+                self._wake.wait(min(WEBHOOK_POLL, 1 / self.rate))
+                self._wake.clear()
+
+    def flush(self):
+        """Move queued matches into the outbox"""
+        rows = []
+        while True:
+            try:
+                rows.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if rows:
+            self.store.enqueue(rows)
+
+    def deliver(self):
+        """Send one batch to every endpoint that is due, allowed and not paused; returns batches sent"""
+        now = time.time()
+        batches = []
+        for endpoint in self.store.due_endpoints(now):
+            if self.failing.get(endpoint, (0, 0))[1] > now:
+                continue
+            bucket = self.buckets.get(endpoint)
+            if bucket is None:
+                bucket = self.buckets[endpoint] = TokenBucket(self.rate, self.burst)
+            if not bucket.take():
+                continue
+            batches.append((endpoint, self.store.due(endpoint, now, self.batch)))
+        if not batches:
+            return 0
+
+        for (endpoint, rows), response, error in fan_out(self._post, batches, WEBHOOK_MAX_CONCURRENCY):
+            seqs = [row[0] for row in rows]
+            if error is None and 200 <= response.status < 300:
+                self.store.delivered(seqs)
+                self.failing.pop(endpoint, None)
+                metrics.WEBHOOK_DELIVERIES.inc(len(seqs), result='delivered')
+                continue
+            status = response.status if error is None else None
+            message = str(error) if error is not None else f"HTTP {status}"
+            # Blocked addresses, redirects and other client errors won't go away by retrying
+            permanent = isinstance(error, BlockedEndpoint) or (
+                status is not None and 300 <= status < 500 and status not in (408, 429))
+            dead = self.store.failed(seqs, message, now, permanent)
+            metrics.WEBHOOK_DELIVERIES.inc(dead, result='dead')
+            metrics.WEBHOOK_DELIVERIES.inc(len(seqs) - dead, result='retry')
+            streak = self.failing.get(endpoint, (0, 0))[0] + 1
+            pause = min(WEBHOOK_RETRY_MAX, WEBHOOK_RETRY_BASE * 2 ** (streak - 1))
+            retry_after = response.headers.get('Retry-After') if error is None else None
+            if retry_after and retry_after.isdigit():
+                pause = max(pause, float(retry_after))
+            self.failing[endpoint] = (streak, now + pause)
+            logger.warning("Webhook %s: %s; pausing %.1fs", endpoint, message, pause)
+        return len(batches)
+
+    def _post(self, batch):
+        endpoint, rows = batch
+        # Checked again at delivery, and the POST goes to the address that passed:
+        # resolving the host a second time could give a private one
+        address = check_endpoint(endpoint)
+        # urllib3 loads with the first delivery, not at startup
+        import urllib3
+
+        if self._pool is None:
+            import certifi
+
+            self._pool = urllib3.PoolManager(
+                num_pools=WEBHOOK_MAX_CONCURRENCY, maxsize=WEBHOOK_MAX_CONCURRENCY, ca_certs=certifi.where(),
+                retries=False, timeout=urllib3.Timeout(connect=3.05, read=WEBHOOK_TIMEOUT))
+        parts = urlsplit(endpoint)
+        pool_kwargs = None
+        if parts.scheme == 'https':
+            # The certificate is still verified for the host name, not the address
+            pool_kwargs = {'server_hostname': parts.hostname, 'assert_hostname': parts.hostname}
+        pool = self._pool.connection_from_host(
+            address, parts.port or (443 if parts.scheme == 'https' else 80), parts.scheme, pool_kwargs)
+        headers = {'Host': parts.netloc.rpartition('@')[2], 'Content-Type': 'application/json'}
+        if parts.username is not None:
+            headers['Authorization'] = urllib3.make_headers(
+                basic_auth=f"{unquote(parts.username)}:{unquote(parts.password or '')}")['authorization']
+        deliveries = [
+            {"id": seq, "subscription": subscription, **json.loads(data)}
+            for seq, subscription, source, key, data in rows
+        ]
+        body = encoding.dumps({"deliveries": deliveries, "count": len(deliveries)})
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        return pool.urlopen('POST', path, body=body, headers=headers, redirect=False)
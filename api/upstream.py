@@ -0,0 +1,163 @@
+"""Shared HTTP client for every upstream host.
+
+Each host gets its own keep-alive requests.Session with a bounded connection
+pool, so refreshes reuse TCP/TLS connections instead of handshaking on every
+call. Transient failures are retried with jittered exponential backoff.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import metrics
+import recorder
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 15))
+RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+BACKOFF = float(os.environ.get('UPSTREAM_BACKOFF', 0.5))
+BACKOFF_JITTER = float(os.environ.get('UPSTREAM_BACKOFF_JITTER', 0.5))
+# Max open connections per host; extra callers block until one is free
+POOL_SIZE = int(os.environ.get('UPSTREAM_POOL_SIZE', 4))
+# Send every request to <UPSTREAM_STUB_URL>/<host>/<path> instead (offline benchmarks)
+STUB_URL = os.environ.get('UPSTREAM_STUB_URL', '').rstrip('/')
+# Append every response to this archive (see recorder.py)
+RECORD_PATH = os.environ.get('UPSTREAM_RECORD_PATH')
+# Answer from this archive instead of the network
+REPLAY_PATH = os.environ.get('UPSTREAM_REPLAY_PATH')
+REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED', 1))
+REPLAY_START = os.environ.get('REPLAY_START')
+
+_sessions = {}
+_lock = threading.Lock()
+
+_recorder = recorder.ArchiveWriter(RECORD_PATH) if RECORD_PATH else None
+
+# Returned by a source fetch when upstream has nothing new since the last parse
+UNCHANGED = object()
+
+# full url -> (ETag, Last-Modified, body hash) of the last response that was parsed
+_validators = {}
+_local = threading.local()
+replay = recorder.Replay(REPLAY_PATH, REPLAY_SPEED, REPLAY_START) if REPLAY_PATH else None
+
+
+def _make_session():
+    # requests loads with the first fetch; /api/health and static routes never need it
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF,
+        backoff_jitter=BACKOFF_JITTER,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET', 'HEAD'],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def session_for(url):
+    """Return the pooled session for the host in url"""
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _make_session()
+    return session
+
+
+def get(url, params=None, headers=None, read_timeout=None):
+    """GET url through the host's pooled session"""
+    import requests
+
+    timeout = (CONNECT_TIMEOUT, read_timeout or READ_TIMEOUT)
+    host = urlsplit(url).netloc
+    if replay is not None or _recorder is not None:
+        # Recordings are keyed by the full URL, query string included
+        full_url = requests.Request('GET', url, params=params).prepare().url
+    if replay is not None:
+        return replay.get(full_url)
+    if STUB_URL:
+        url = f"{STUB_URL}/{url.split('://', 1)[1]}"
+    try:
+        r = session_for(url).get(url, params=params, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        metrics.UPSTREAM_RESPONSES.inc(host=host, status='error')
+        raise
+    metrics.UPSTREAM_RESPONSES.inc(host=host, status=r.status_code)
+    if _recorder is not None:
+        _recorder.write(full_url, r)
+    return r
+
+
+def get_changed(url, params=None, headers=None, read_timeout=None, normalize=None):
+    """GET url, or None if it has not changed since the last commit() for it.
+
+    Sends the stored ETag/Last-Modified as a conditional GET; hosts that
+    ignore them still cost only a hash of the (normalized) body.
+    """
+    import requests
+
+    if is_unconditional():
+        r = get(url, params=params, headers=headers, read_timeout=read_timeout)
+        r.fingerprint = None
+        return r
+    full_url = requests.Request('GET', url, params=params).prepare().url
+    known = _validators.get(full_url)
+    headers = dict(headers or {})
+    if known:
+        etag, last_modified, _ = known
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    r = get(url, params=params, headers=headers, read_timeout=read_timeout)
+    if r.status_code == 304 and known:
+        metrics.CACHE_REQUESTS.inc(cache='upstream', result='not_modified')
+        return None
+    body = normalize(r.content) if normalize else r.content
+    r.fingerprint = (full_url, r.headers.get('ETag'), r.headers.get('Last-Modified'), hashlib.sha1(body).hexdigest())
+    if known and known[2] == r.fingerprint[3]:
+        metrics.CACHE_REQUESTS.inc(cache='upstream', result='unchanged')
+        return None
+    metrics.CACHE_REQUESTS.inc(cache='upstream', result='changed')
+    return r
+
+
+def commit(response):
+    """Remember a get_changed() response once it has been parsed successfully"""
+    if response.fingerprint is None:
+        return
+    full_url, etag, last_modified, digest = response.fingerprint
+    _validators[full_url] = (etag, last_modified, digest)
+
+
+@contextmanager
+def unconditional(enabled=True):
+    """Fetch and parse everything in this thread, leaving the change state alone"""
+    previous = is_unconditional()
+    _local.unconditional = enabled
+    try:
+        yield
+    finally:
+        _local.unconditional = previous
+
+
+def is_unconditional():
+    return getattr(_local, 'unconditional', False)
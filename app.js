@@ -22,6 +22,9 @@ let facilities = [];
 let plumeLayer = null;
 let showPlumes = false;
 
+// ETag of the last bundled snapshot we rendered
+let lastSnapshotEtag = null;
+
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
     initMap();
@@ -30,6 +33,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // Auto-refresh
     setInterval(fetchAllData, REFRESH_INTERVAL);
 
+    // Push updates: refresh as soon as the backend reports a change
+    connectStream();
+
     // Manual refresh button
     document.getElementById('refresh-btn').addEventListener('click', () => {
         fetchAllData();
@@ -111,16 +117,63 @@ function initMap() {
     fetchFacilities();
 }
 
-// Fetch all data sources
+// Fetch all data sources in one round trip via the bundled snapshot.
+// The browser revalidates with If-None-Match, so an unchanged cycle is a 304.
 async function fetchAllData() {
     updateTimestamp();
-    await Promise.all([
-        fetchWind(),
-        fetchCAER(),
-        fetchDispatch(),
-        fetchWeatherAlerts(),
-        fetchTCEQEmissions()
-    ]);
+    try {
+        const response = await fetch(`${API_BASE_URL}/snapshot`, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+
+        const etag = response.headers.get('ETag');
+        if (etag && etag === lastSnapshotEtag) {
+            return;
+        }
+
+        const snapshot = await response.json();
+        const sources = snapshot.sources;
+        await Promise.all([
+            fetchWind(sources['wind']),
+            fetchCAER(sources['caer']),
+            fetchDispatch(sources['dispatch']),
+            fetchWeatherAlerts(sources['weather-alerts']),
+            fetchTCEQEmissions(sources['tceq-emissions'])
+        ]);
+        lastSnapshotEtag = etag;
+    } catch (error) {
+        // Older backends without /snapshot: fall back to one request per source
+        console.error('Snapshot fetch error:', error);
+        await Promise.all([
+            fetchWind(),
+            fetchCAER(),
+            fetchDispatch(),
+            fetchWeatherAlerts(),
+            fetchTCEQEmissions()
+        ]);
+    }
+}
+
+// Listen for change events and refresh immediately instead of waiting for
+// the next poll. The browser reconnects (with Last-Event-ID) on its own.
+const STREAM_EVENTS = ['dispatch.delta', 'caer.new', 'wind.update', 'nws.alert', 'tceq.event', 'reset'];
+let streamRefreshTimer = null;
+
+function connectStream() {
+    if (!window.EventSource) return;
+
+    const stream = new EventSource(`${API_BASE_URL}/stream`);
+    STREAM_EVENTS.forEach(type => {
+        stream.addEventListener(type, () => {
+            // Coalesce bursts of events into a single refresh
+            clearTimeout(streamRefreshTimer);
+            streamRefreshTimer = setTimeout(fetchAllData, 250);
+        });
+    });
+    stream.onerror = (error) => {
+        console.error('Stream error:', error);
+    };
 }
 
 // Update timestamp
@@ -131,10 +184,12 @@ function updateTimestamp() {
 }
 
 // Fetch Wind Data
-async function fetchWind() {
+async function fetchWind(data) {
     try {
-        const response = await fetch(`${API_BASE_URL}/wind`);
-        const data = await response.json();
+        if (!data) {
+            const response = await fetch(`${API_BASE_URL}/wind`);
+            data = await response.json();
+        }
 
         if (data.error) {
             throw new Error(data.error);
@@ -150,7 +205,8 @@ async function fetchWind() {
         const alertDiv = document.getElementById('wind-alert');
         if (data.is_risk) {
             alertDiv.className = 'wind-alert risk';
-            alertDiv.textContent = `⚠ PLUME RISK: Wind from ${data.direction}. Industrial emissions may drift toward residential areas.`;
+            const areas = (data.risk_areas || []).join(', ') || 'residential areas';
+            alertDiv.textContent = `⚠ PLUME RISK: Wind from ${data.direction}. Industrial emissions may drift toward ${areas}.`;
         } else {
             alertDiv.className = 'wind-alert clear';
             alertDiv.textContent = `✓ WIND CLEAR: Wind from ${data.direction}. Plumes dispersing away from residential zones.`;
@@ -169,10 +225,12 @@ async function fetchWind() {
 }
 
 // Fetch CAER Messages
-async function fetchCAER() {
+async function fetchCAER(data) {
     try {
-        const response = await fetch(`${API_BASE_URL}/caer`);
-        const data = await response.json();
+        if (!data) {
+            const response = await fetch(`${API_BASE_URL}/caer`);
+            data = await response.json();
+        }
 
         if (data.error) {
             throw new Error(data.error);
@@ -204,15 +262,17 @@ async function fetchCAER() {
 }
 
 // Fetch Dispatch Log
-async function fetchDispatch() {
+async function fetchDispatch(data) {
     try {
-        const response = await fetch(`${API_BASE_URL}/dispatch`);
+        if (!data) {
+            const response = await fetch(`${API_BASE_URL}/dispatch`);
 
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}`);
-        }
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
 
-        const data = await response.json();
+            data = await response.json();
+        }
 
         console.log('Dispatch data:', data); // Debug log
 
@@ -615,10 +675,12 @@ function getRadioFeedForIncident(incident) {
 // WEATHER ALERTS FUNCTIONS
 // ============================================
 
-async function fetchWeatherAlerts() {
+async function fetchWeatherAlerts(data) {
     try {
-        const response = await fetch(`${API_BASE_URL}/weather-alerts`);
-        const data = await response.json();
+        if (!data) {
+            const response = await fetch(`${API_BASE_URL}/weather-alerts`);
+            data = await response.json();
+        }
 
         const container = document.getElementById('weather-alerts');
         const countEl = document.getElementById('weather-count');
@@ -655,10 +717,12 @@ async function fetchWeatherAlerts() {
 // TCEQ EMISSIONS FUNCTIONS
 // ============================================
 
-async function fetchTCEQEmissions() {
+async function fetchTCEQEmissions(data) {
     try {
-        const response = await fetch(`${API_BASE_URL}/tceq-emissions`);
-        const data = await response.json();
+        if (!data) {
+            const response = await fetch(`${API_BASE_URL}/tceq-emissions`);
+            data = await response.json();
+        }
 
         const container = document.getElementById('tceq-events');
         const countEl = document.getElementById('tceq-count');